@@ -1,45 +1,161 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
+from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import uvicorn
 import os
+import json
+import shutil
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from datetime import datetime
 
 from app.services.plant_analysis import PlantAnalysisService
 from app.services.agro_gpt import agro_gpt_service  # Импортируем готовый экземпляр
-from app.services.yield_prediction import YieldPredictionService
+from app.services.yield_prediction import YieldPredictionService, YIELD_CROPS, MAX_SCENARIOS
+from app.services.yield_refresh import HarvestFeedbackStore, YieldModelRefresher
+from app.services.chat_partitions import ChatLogMaintainer
+from app.services.orthomosaic import OrthomosaicAnalyzer
+from app.services.job_queue import FINISHED_STATUSES, JOB_STATUSES, JobQueue
+from app.services.job_worker import JOB_HANDLERS
 from app.utils.response_formatter import ResponseFormatter
+from app.utils.file_utils import FileManager, UploadLimitMiddleware, UploadTooLargeError
+from app.utils.validation import InputValidator
+from app.utils.admission import AdmissionController, AdmissionControlMiddleware
+from app.utils.coalescing import RequestCoalescer, normalize_text
+from app.utils.http_cache import CompressionMiddleware, PrecompressedBody
+from app.utils.static_assets import FrontendStaticFiles
+from app.utils.prefork import memory_report
+from app.utils.parquet_export import (
+    EXPORT_CHUNK_SIZE, MESSAGES_SCHEMA, PREDICTIONS_SCHEMA, export_filename, stream_parquet
+)
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Фоновое дообучение моделей урожайности по отзывам фермеров
+YIELD_REFRESH_ENABLED = os.getenv("YIELD_REFRESH_ENABLED", "true").lower() == "true"
+
+# Фоновое архивирование и сжатие месячных партиций журнала чата
+CHAT_MAINTENANCE_ENABLED = os.getenv("CHAT_MAINTENANCE_ENABLED", "true").lower() == "true"
+
+# Продакшн-режим: собранный фронтенд (Vite dist/) раздается этим же процессом
+SERVE_FRONTEND = os.getenv("SERVE_FRONTEND", "false").lower() == "true"
+FRONTEND_DIST_DIR = os.getenv(
+    "FRONTEND_DIST_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "frontend", "dist")
+)
+
+# Разрешенные источники CORS; пустой список отключает CORS (фронтенд с того же origin)
+ALLOWED_ORIGINS = [
+    origin.strip()
+    for origin in os.getenv("ALLOWED_ORIGINS", "http://localhost:5173,http://127.0.0.1:5173,http://localhost:3000").split(",")
+    if origin.strip()
+]
+
+# Культуры, доступные для прогнозирования
+AVAILABLE_CROPS = [
+    {"id": "пшеница", "name": "Пшеница", "category": "зерновые"},
+    {"id": "кукуруза", "name": "Кукуруза", "category": "зерновые"},
+    {"id": "рис", "name": "Рис", "category": "зерновые"},
+    {"id": "картофель", "name": "Картофель", "category": "овощи"},
+    {"id": "ячмень", "name": "Ячмень", "category": "зерновые"},
+    {"id": "соя", "name": "Соя", "category": "бобовые"},
+    {"id": "томат", "name": "Томат", "category": "овощи"},
+    {"id": "огурец", "name": "Огурец", "category": "овощи"}
+]
+
+# Неизменяемые ответы (список культур, тексты базы знаний), сжатые один раз при старте
+static_bodies: Dict[str, PrecompressedBody] = {}
+
+def build_static_bodies() -> Dict[str, PrecompressedBody]:
+    bodies = {'crops': PrecompressedBody.from_json({
+        "status": "success",
+        "data": AVAILABLE_CROPS,
+        "count": len(AVAILABLE_CROPS)
+    })}
+    for key, data in agro_gpt_service.response_generator.static_texts().items():
+        bodies[f'kb/{key}'] = PrecompressedBody.from_json({"status": "success", "data": data})
+    return bodies
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    static_bodies.update(build_static_bodies())
+    logger.info(f"Precompressed {len(static_bodies)} static responses, welcome: {static_bodies['kb/welcome'].sizes()}")
+    
+    # Фоновые задачи стартуют в воркере, а не при импорте модуля
+    if YIELD_REFRESH_ENABLED:
+        yield_refresher.start()
+    if CHAT_MAINTENANCE_ENABLED:
+        chat_maintainer.start()
+    yield
+    await chat_maintainer.stop()
+    await yield_refresher.stop()
+
 app = FastAPI(
     title="Agro AI Platform API",
     description="Интеллектуальная платформа для агрономов с AI-функциями",
     version="2.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
+# Контроль допуска для дорогих маршрутов (добавляется до CORS, чтобы отказы получали CORS заголовки)
+admission_controller = AdmissionController()
+app.add_middleware(AdmissionControlMiddleware, controller=admission_controller)
+
+# Лимит размера загружаемого изображения (по умолчанию 10MB)
+MAX_IMAGE_SIZE = int(os.getenv("MAX_IMAGE_SIZE", 10 * 1024 * 1024))
+
+# Лимит размера ортофотоплана (по умолчанию 4GB, файл всегда сбрасывается на диск)
+MAX_ORTHOMOSAIC_SIZE = int(os.getenv("MAX_ORTHOMOSAIC_SIZE", 4 * 1024 * 1024 * 1024))
+ORTHOMOSAIC_FORMATS = ('tiff', 'png', 'jpeg')
+
+# Максимум изображений в одной задаче фонового анализа растений
+MAX_JOB_IMAGES = int(os.getenv("MAX_JOB_IMAGES", "100"))
+
+# Запас на заголовки частей multipart сверх размера файла
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Лимиты тела запроса для маршрутов загрузки проверяются до разбора multipart
+# (добавляется до CORS, чтобы отказ 413 получал CORS заголовки)
+app.add_middleware(UploadLimitMiddleware, limits={
+    "/api/analyze-plant": MAX_IMAGE_SIZE + MULTIPART_OVERHEAD,
+    "/api/analyze-orthomosaic": MAX_ORTHOMOSAIC_SIZE + MULTIPART_OVERHEAD,
+    "/api/jobs/plant-analysis": MAX_JOB_IMAGES * (MAX_IMAGE_SIZE + MULTIPART_OVERHEAD),
+})
+
+# Сжатие ответов gzip/brotli (предсжатые ответы проходят без изменений)
+app.add_middleware(CompressionMiddleware)
+
 # CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:5173", "http://127.0.0.1:5173", "http://localhost:3000"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+if ALLOWED_ORIGINS:
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=ALLOWED_ORIGINS,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["Retry-After", "ETag"],
+    )
 
 # Инициализация сервисов
 plant_service = PlantAnalysisService()
 # agro_gpt_service уже импортирован как готовый экземпляр
 yield_service = YieldPredictionService()
 response_formatter = ResponseFormatter()
+file_manager = FileManager()
+feedback_store = HarvestFeedbackStore()
+yield_refresher = YieldModelRefresher(yield_service.model, feedback_store)
+chat_maintainer = ChatLogMaintainer(agro_gpt_service.database.partitions)
+orthomosaic_analyzer = OrthomosaicAnalyzer(plant_service.classifier)
+coalescer = RequestCoalescer()
+job_queue = JobQueue()
 
 # Модели запросов
 class YieldPredictionRequest(BaseModel):
@@ -50,8 +166,30 @@ class YieldPredictionRequest(BaseModel):
     area: float
     fertilizer_used: bool
 
+class ScenarioRange(BaseModel):
+    min: float
+    max: float
+    steps: int = 10
+
+class YieldScenarioRequest(YieldPredictionRequest):
+    soil_quality_range: Optional[ScenarioRange] = None
+    rainfall_range: Optional[ScenarioRange] = None
+    temperature_range: Optional[ScenarioRange] = None
+    fertilizer_options: Optional[List[bool]] = None
+    compare_crops: Optional[List[str]] = None
+    engine: str = "forest"
+
+class YieldBatchRequest(BaseModel):
+    items: List[YieldPredictionRequest]
+    engine: str = "forest"
+
+class YieldFeedbackRequest(YieldPredictionRequest):
+    actual_yield: float
+
 class ChatRequest(BaseModel):
     message: str
+    session_id: str = "default"
+    # Не используется: история сессии хранится на сервере, пересылать ее не нужно
     conversation_history: Optional[List[Dict[str, Any]]] = None
 
 class BatchAnalysisRequest(BaseModel):
@@ -59,7 +197,7 @@ class BatchAnalysisRequest(BaseModel):
     analysis_type: str = "quick"
 
 # Эндпоинты
-@app.get("/")
+@app.get("/api")
 async def root():
     """Корневой эндпоинт"""
     return {
@@ -69,8 +207,27 @@ async def root():
         "timestamp": datetime.now().isoformat(),
         "endpoints": {
             "plant_analysis": "/api/analyze-plant",
+            "orthomosaic_analysis": "/api/analyze-orthomosaic",
             "yield_prediction": "/api/predict-yield", 
+            "yield_scenarios": "/api/predict-yield/scenarios",
+            "yield_batch": "/api/predict-yield/batch",
+            "yield_feedback": "/api/yield-feedback",
             "agro_chat": "/api/chat",
+            "chat_history": "/api/chat/history/{session_id}",
+            "chat_search": "/api/chat/search",
+            "chat_storage": "/api/chat/storage",
+            "export": "/api/export/{dataset}",
+            "jobs": "/api/jobs",
+            "job_status": "/api/jobs/{job_id}",
+            "job_result": "/api/jobs/{job_id}/result",
+            "analytics": "/api/analytics/top-crops",
+            "admission_stats": "/api/admission/stats",
+            "coalescing_stats": "/api/coalescing/stats",
+            "workers_memory": "/api/workers/memory",
+            "yield_cache_stats": "/api/predict-yield/cache",
+            "yield_surrogate_stats": "/api/predict-yield/surrogate",
+            "kb_welcome": "/api/kb/welcome",
+            "kb_region": "/api/kb/regions/{region}",
             "health": "/health"
         }
     }
@@ -106,14 +263,29 @@ async def analyze_plant(
                 detail="Файл должен быть изображением (JPEG, PNG, etc.)"
             )
         
-        # Чтение файла
-        image_data = await image.read()
-        
-        if len(image_data) > 10 * 1024 * 1024:  # 10MB limit
-            raise HTTPException(status_code=400, detail="Размер файла не должен превышать 10MB")
+        # Проверка размера, SHA-256 и формата загрузки (тело сверх лимита отклонено до разбора)
+        try:
+            upload = await file_manager.stream_upload(image, max_size=MAX_IMAGE_SIZE)
+        except UploadTooLargeError:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Размер файла не должен превышать {MAX_IMAGE_SIZE // (1024 * 1024)}MB"
+            )
         
-        # Анализ растения
-        result = await plant_service.analyze_image(image_data)
+        try:
+            image_format = InputValidator.detect_image_format(upload.header)
+            if image_format is None:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Неподдерживаемый формат изображения"
+                )
+            
+            # Анализ растения (декодер читает буфер загрузки без копирования)
+            result = await plant_service.analyze_image(upload.buffer())
+            result['analysis_details']['image_format'] = image_format
+            result['analysis_details']['image_sha256'] = upload.sha256
+        finally:
+            upload.close()
         
         # Форматирование ответа
         formatted_response = response_formatter.format_plant_analysis(result)
@@ -133,8 +305,93 @@ async def analyze_plant(
             content=error_response
         )
 
+@app.post("/api/analyze-orthomosaic")
+async def analyze_orthomosaic(image: UploadFile = File(...)):
+    """
+    Потоковый анализ ортофотоплана с дрона: тепловая карта состояния
+    посевов по фрагментам в формате NDJSON (строка на полосу фрагментов)
+    """
+    try:
+        logger.info(f"Orthomosaic analysis request: {image.filename}")
+        
+        try:
+            upload = await file_manager.stream_upload(image, max_size=MAX_ORTHOMOSAIC_SIZE, spool_threshold=0)
+        except UploadTooLargeError:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Размер файла не должен превышать {MAX_ORTHOMOSAIC_SIZE // (1024 * 1024)}MB"
+            )
+        
+        try:
+            image_format = InputValidator.detect_image_format(upload.header)
+            if image_format not in ORTHOMOSAIC_FORMATS:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Ортофотоплан должен быть в формате GeoTIFF/TIFF, PNG или JPEG"
+                )
+            
+            # Заголовок растра разбирается до начала ответа, чтобы ошибки вернулись кодом 400
+            events = orthomosaic_analyzer.analyze(upload.file, image_format)
+            meta = await run_in_threadpool(next, events)
+        except ValueError as e:
+            upload.close()
+            raise HTTPException(status_code=400, detail=str(e))
+        except BaseException:
+            upload.close()
+            raise
+        
+        def stream_heatmap():
+            try:
+                yield json.dumps(meta, ensure_ascii=False) + "\n"
+                for event in events:
+                    yield json.dumps(event, ensure_ascii=False) + "\n"
+            except Exception as e:
+                # Статус 200 уже отправлен: клиент узнает об ошибке по последней строке, а не по обрыву
+                logger.error(f"Orthomosaic stream error: {str(e)}")
+                yield json.dumps({"type": "error", "message": str(e)}, ensure_ascii=False) + "\n"
+            finally:
+                events.close()
+                upload.close()
+        
+        return StreamingResponse(stream_heatmap(), media_type="application/x-ndjson")
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Orthomosaic analysis error: {str(e)}")
+        return JSONResponse(
+            status_code=500,
+            content=response_formatter.format_error(f"Ошибка при анализе ортофотоплана: {str(e)}")
+        )
+
+# Допустимые диапазоны параметров прогноза урожайности
+YIELD_INPUT_LIMITS = {
+    'soil_quality': (1, 10, "Качество почвы должно быть от 1 до 10"),
+    'rainfall': (0, 500, "Осадки должны быть от 0 до 500 мм"),
+    'temperature': (-10, 50, "Температура должна быть от -10 до 50°C"),
+}
+
+# Движки пакетного расчета: лес целиком или таблица суррогата (build_yield_surrogate.py)
+YIELD_ENGINES = ('forest', 'surrogate')
+
+def _validate_yield_request(request: YieldPredictionRequest) -> List[str]:
+    """Проверка параметров прогноза урожайности"""
+    validation_errors = []
+    
+    for field, (low, high, message) in YIELD_INPUT_LIMITS.items():
+        if getattr(request, field) < low or getattr(request, field) > high:
+            validation_errors.append(message)
+    
+    if request.area <= 0 or request.area > 10000:
+        validation_errors.append("Площадь должна быть от 0.1 до 10000 гектар")
+    
+    if request.crop_type.strip().lower() not in YIELD_CROPS:
+        validation_errors.append(f"Культура должна быть одной из: {', '.join(YIELD_CROPS)}")
+    
+    return validation_errors
+
 @app.post("/api/predict-yield")
-async def predict_yield(request: YieldPredictionRequest):
+async def predict_yield(request: YieldPredictionRequest, background_tasks: BackgroundTasks):
     """
     Прогноз урожайности на основе параметров
     """
@@ -142,36 +399,27 @@ async def predict_yield(request: YieldPredictionRequest):
         logger.info(f"Yield prediction request for: {request.crop_type}")
         
         # Валидация входных данных
-        validation_errors = []
-        
-        if request.soil_quality < 1 or request.soil_quality > 10:
-            validation_errors.append("Качество почвы должно быть от 1 до 10")
-        
-        if request.rainfall < 0 or request.rainfall > 500:
-            validation_errors.append("Осадки должны быть от 0 до 500 мм")
-            
-        if request.temperature < -10 or request.temperature > 50:
-            validation_errors.append("Температура должна быть от -10 до 50°C")
-            
-        if request.area <= 0 or request.area > 10000:
-            validation_errors.append("Площадь должна быть от 0.1 до 10000 гектар")
+        validation_errors = _validate_yield_request(request)
         
         if validation_errors:
             raise HTTPException(status_code=400, detail="; ".join(validation_errors))
         
-        # Прогнозирование
-        prediction = yield_service.predict_yield(
-            crop_type=request.crop_type,
-            soil_quality=request.soil_quality,
-            rainfall=request.rainfall,
-            temperature=request.temperature,
-            area=request.area,
-            fertilizer_used=request.fertilizer_used
-        )
+        # Прогнозирование (одинаковые одновременные запросы выполняются один раз)
+        inputs = yield_service.quantize_inputs(**request.model_dump())
+        prediction = await coalescer.run('predict_yield', inputs, lambda: run_in_threadpool(
+            yield_service.predict_yield, **inputs
+        ))
         
         # Форматирование ответа
         formatted_response = response_formatter.format_yield_prediction(prediction)
         
+        # Журнал прогнозов для выгрузки пишется после ответа; в журнал идут входы
+        # фермера, а не округленный ключ кэша
+        background_tasks.add_task(
+            agro_gpt_service.database.save_prediction,
+            request.model_dump(), prediction, yield_service.model.model_versions.get(inputs['crop_type'])
+        )
+        
         logger.info(f"Yield prediction completed: {prediction['predicted_yield']} т/га")
         return formatted_response
         
@@ -187,6 +435,161 @@ async def predict_yield(request: YieldPredictionRequest):
             content=error_response
         )
 
+def _scenario_params(request: YieldScenarioRequest) -> Dict[str, Any]:
+    """Проверка запроса сценариев; параметры для predict_scenarios или HTTPException(400)"""
+    validation_errors = _validate_yield_request(request)
+    
+    if request.engine not in YIELD_ENGINES:
+        validation_errors.append(f"Движок расчета должен быть одним из: {', '.join(YIELD_ENGINES)}")
+    
+    ranges = {}
+    for field in YIELD_INPUT_LIMITS:
+        scenario_range = getattr(request, f"{field}_range")
+        if scenario_range is None:
+            continue
+        
+        low, high, message = YIELD_INPUT_LIMITS[field]
+        if scenario_range.min > scenario_range.max:
+            validation_errors.append(f"Диапазон {field}: min больше max")
+        elif scenario_range.min < low or scenario_range.max > high:
+            validation_errors.append(f"Диапазон {field}: {message.lower()}")
+        if scenario_range.steps < 1 or scenario_range.steps > 100:
+            validation_errors.append(f"Диапазон {field}: steps должен быть от 1 до 100")
+        
+        ranges[field] = (scenario_range.min, scenario_range.max, scenario_range.steps)
+    
+    # Культуры для сравнения: без повторов и только с собственной моделью
+    crops = list(dict.fromkeys(crop.strip().lower() for crop in [request.crop_type, *(request.compare_crops or [])]))
+    unknown = [crop for crop in crops[1:] if crop not in YIELD_CROPS]
+    if unknown:
+        validation_errors.append(f"Культуры для сравнения должны быть из: {', '.join(YIELD_CROPS)} (получено: {', '.join(unknown)})")
+    
+    # Размер сетки проверяется до постановки задачи в очередь, а не в воркере;
+    # каждая культура считается по всей сетке заново
+    scenario_count = len(set(request.fertilizer_options or [])) or 1
+    for _, _, steps in ranges.values():
+        scenario_count *= max(steps, 1)
+    if scenario_count * len(crops) > MAX_SCENARIOS:
+        validation_errors.append(
+            f"Слишком много сценариев: {scenario_count} × {len(crops)} культур (максимум {MAX_SCENARIOS})"
+        )
+    
+    if validation_errors:
+        raise HTTPException(status_code=400, detail="; ".join(validation_errors))
+    
+    return {
+        'crop_type': crops[0],
+        'soil_quality': request.soil_quality,
+        'rainfall': request.rainfall,
+        'temperature': request.temperature,
+        'area': request.area,
+        'fertilizer_used': request.fertilizer_used,
+        'ranges': ranges,
+        'fertilizer_options': request.fertilizer_options,
+        'compare_crops': crops[1:],
+        'engine': request.engine
+    }
+
+def _validate_batch_request(request: YieldBatchRequest):
+    if request.engine not in YIELD_ENGINES:
+        raise HTTPException(status_code=400, detail=f"Движок расчета должен быть одним из: {', '.join(YIELD_ENGINES)}")
+    if not request.items or len(request.items) > MAX_SCENARIOS:
+        raise HTTPException(status_code=400, detail=f"Число полей должно быть от 1 до {MAX_SCENARIOS}")
+    
+    validation_errors = []
+    for index, item in enumerate(request.items):
+        validation_errors.extend(f"Поле {index}: {error}" for error in _validate_yield_request(item))
+    if validation_errors:
+        raise HTTPException(status_code=400, detail="; ".join(validation_errors[:20]))
+
+@app.post("/api/predict-yield/scenarios")
+def predict_yield_scenarios(request: YieldScenarioRequest):
+    """
+    Анализ "что если": сетка сценариев по осадкам, температуре, почве и удобрениям
+    """
+    try:
+        scenarios = yield_service.predict_scenarios(**_scenario_params(request))
+        
+        logger.info(f"Yield scenarios completed: {scenarios['scenario_count']} scenarios in {scenarios['elapsed_ms']} ms")
+        return {
+            "status": "success",
+            "timestamp": datetime.now().isoformat(),
+            "data": scenarios
+        }
+    
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Yield scenarios error: {str(e)}")
+        return JSONResponse(
+            status_code=500,
+            content=response_formatter.format_error(f"Ошибка при расчете сценариев: {str(e)}")
+        )
+
+@app.post("/api/predict-yield/batch")
+def predict_yield_batch(request: YieldBatchRequest):
+    """
+    Пакетный прогноз урожайности (среднее и std по деревьям) для многих полей;
+    engine="surrogate" считает по предвычисленным таблицам без обхода леса
+    """
+    try:
+        _validate_batch_request(request)
+        
+        result = yield_service.predict_batch([item.model_dump() for item in request.items], request.engine)
+        
+        logger.info(f"Yield batch completed: {len(request.items)} fields in {result['elapsed_ms']} ms ({result['engines']})")
+        return {
+            "status": "success",
+            "timestamp": datetime.now().isoformat(),
+            "data": result
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Yield batch error: {str(e)}")
+        return JSONResponse(
+            status_code=500,
+            content=response_formatter.format_error(f"Ошибка пакетного прогноза: {str(e)}")
+        )
+
+@app.post("/api/yield-feedback")
+def submit_yield_feedback(request: YieldFeedbackRequest):
+    """
+    Фактический урожай от фермера: наблюдение сохраняется и используется при дообучении модели
+    """
+    try:
+        validation_errors = _validate_yield_request(request)
+        
+        if request.actual_yield < 0 or request.actual_yield > 100:
+            validation_errors.append("Фактическая урожайность должна быть от 0 до 100 т/га")
+        
+        if validation_errors:
+            raise HTTPException(status_code=400, detail="; ".join(validation_errors))
+        
+        feedback_store.append({**request.model_dump(), 'fertilizer_used': int(request.fertilizer_used)})
+        
+        logger.info(f"Yield feedback saved for: {request.crop_type}")
+        return {
+            "status": "success",
+            "timestamp": datetime.now().isoformat(),
+            "data": {
+                "crop_type": request.crop_type.strip().lower(),
+                "model_version": yield_service.model.model_versions.get(request.crop_type.strip().lower())
+            }
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Yield feedback error: {str(e)}")
+        return JSONResponse(
+            status_code=500,
+            content=response_formatter.format_error(f"Ошибка при сохранении данных урожая: {str(e)}")
+        )
+
 @app.post("/api/chat")
 async def chat_with_agrogpt(request: ChatRequest):
     """
@@ -202,11 +605,22 @@ async def chat_with_agrogpt(request: ChatRequest):
         if len(request.message) > 1000:
             raise HTTPException(status_code=400, detail="Сообщение слишком длинное")
         
-        # Генерация ответа с использованием готового экземпляра
-        response = await agro_gpt_service.process_message(
-            user_message=request.message,
-            session_id="default"  # или можно передавать из запроса
+        session_id = request.session_id.strip() or "default"
+        if len(session_id) > 128:
+            raise HTTPException(status_code=400, detail="Слишком длинный идентификатор сессии")
+        
+        # Генерация ответа с использованием готового экземпляра. Одинаковые одновременные
+        # вопросы разных сессий получают один ответ, если у них совпадает контекст, меняющий
+        # ответ (культура и регион из истории, стадия приветствия); сессия в ключ не входит.
+        # Разбор сообщения и запись хода выполняются для каждой сессии отдельно
+        turn = await agro_gpt_service.prepare_turn(request.message, session_id)
+        answer, context_updates = await coalescer.run(
+            'chat',
+            {'message': normalize_text(request.message), **agro_gpt_service.answer_context(turn)},
+            lambda: agro_gpt_service.generate_answer(turn)
         )
+        # Запись в партицию и агрегаты (BEGIN IMMEDIATE, ожидание блокировки) - не в event loop
+        response = await run_in_threadpool(agro_gpt_service.finish_turn, turn, answer, context_updates)
         
         # Форматирование ответа
         formatted_response = {
@@ -235,6 +649,340 @@ async def chat_with_agrogpt(request: ChatRequest):
             content=error_response
         )
 
+@app.get("/api/chat/history/{session_id}")
+def get_chat_history(session_id: str, limit: int = 50, before: Optional[int] = None):
+    """
+    История сообщений сессии (от новых к старым).
+    Для следующей страницы передайте next_cursor в параметре before
+    """
+    if limit < 1 or limit > 200:
+        raise HTTPException(status_code=400, detail="Параметр limit должен быть от 1 до 200")
+    
+    try:
+        page = agro_gpt_service.database.get_session_messages(
+            session_id=session_id,
+            limit=limit,
+            before_id=before
+        )
+        return {
+            "status": "success",
+            "data": page
+        }
+    except Exception as e:
+        logger.error(f"Chat history error: {str(e)}")
+        return JSONResponse(
+            status_code=500,
+            content=response_formatter.format_error(f"Ошибка при чтении истории: {str(e)}")
+        )
+
+@app.get("/api/chat/search")
+def search_chat_messages(q: str, session_id: Optional[str] = None, limit: int = 20,
+                         before: Optional[int] = None):
+    """
+    Полнотекстовый поиск по вопросам и ответам для агрономов
+    """
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Поисковый запрос не может быть пустым")
+    
+    if limit < 1 or limit > 100:
+        raise HTTPException(status_code=400, detail="Параметр limit должен быть от 1 до 100")
+    
+    try:
+        page = agro_gpt_service.database.search_messages(
+            query_text=q,
+            session_id=session_id,
+            limit=limit,
+            before_id=before
+        )
+        return {
+            "status": "success",
+            "data": page
+        }
+    except Exception as e:
+        logger.error(f"Chat search error: {str(e)}")
+        return JSONResponse(
+            status_code=500,
+            content=response_formatter.format_error(f"Ошибка поиска: {str(e)}")
+        )
+
+@app.get("/api/chat/storage")
+def get_chat_storage():
+    """
+    Месячные партиции журнала чата: диапазоны message_id, число сообщений,
+    размер файлов, статус (active/archived) и время последнего сжатия
+    """
+    try:
+        partitions = agro_gpt_service.database.partitions.stats()
+        return {
+            "status": "success",
+            "timestamp": datetime.now().isoformat(),
+            "data": {
+                "partitions": partitions,
+                "active_messages": sum(p['rows'] for p in partitions if p['status'] == 'active'),
+                "retention_months": chat_maintainer.retention_months
+            }
+        }
+    except Exception as e:
+        logger.error(f"Chat storage error: {str(e)}")
+        return JSONResponse(
+            status_code=500,
+            content=response_formatter.format_error(f"Ошибка чтения каталога партиций: {str(e)}")
+        )
+
+EXPORT_DATASETS = {
+    'messages': (MESSAGES_SCHEMA, agro_gpt_service.database.iter_messages),
+    'predictions': (PREDICTIONS_SCHEMA, agro_gpt_service.database.iter_predictions),
+}
+
+def _parse_export_date(value: Optional[str], name: str) -> Optional[str]:
+    if value is None:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d')
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Параметр {name} должен быть датой в формате YYYY-MM-DD")
+
+def _parse_export_request(dataset: str, since: Optional[str], until: Optional[str]):
+    if dataset not in EXPORT_DATASETS:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Неизвестный набор данных: {dataset}. Доступны: {', '.join(EXPORT_DATASETS)}"
+        )
+    since = _parse_export_date(since, 'since')
+    until = _parse_export_date(until, 'until')
+    if since and until and since >= until:
+        raise HTTPException(status_code=400, detail="Параметр since должен быть раньше until")
+    return since, until
+
+@app.get("/api/export/{dataset}")
+def export_dataset(dataset: str, since: Optional[str] = None, until: Optional[str] = None):
+    """
+    Выгрузка журнала чата (messages) или прогнозов урожайности (predictions)
+    в Parquet за период [since, until). Файл формируется потоково по группам
+    строк, поэтому память сервера не зависит от объема журнала
+    """
+    since, until = _parse_export_request(dataset, since, until)
+    
+    schema, iter_chunks = EXPORT_DATASETS[dataset]
+    logger.info(f"Export {dataset}: since={since}, until={until}")
+    return StreamingResponse(
+        stream_parquet(iter_chunks(EXPORT_CHUNK_SIZE, since, until), schema),
+        media_type="application/vnd.apache.parquet",
+        headers={"Content-Disposition": f'attachment; filename="{export_filename(dataset, since, until)}"'}
+    )
+
+def _job_response(job_id: str) -> Dict[str, Any]:
+    return {
+        "status": "success",
+        "timestamp": datetime.now().isoformat(),
+        "data": {
+            **job_queue.get(job_id),
+            "status_url": f"/api/jobs/{job_id}",
+            "result_url": f"/api/jobs/{job_id}/result"
+        }
+    }
+
+@app.post("/api/jobs/yield-scenarios", status_code=202)
+def submit_yield_scenarios_job(request: YieldScenarioRequest, priority: int = 0):
+    """Фоновый расчет сценариев урожайности: сразу возвращает job_id, результат - /api/jobs/{job_id}/result"""
+    params = _scenario_params(request)
+    params['ranges'] = {name: list(values) for name, values in params['ranges'].items()}
+    return _job_response(job_queue.submit('yield_scenarios', params, priority))
+
+@app.post("/api/jobs/yield-batch", status_code=202)
+def submit_yield_batch_job(request: YieldBatchRequest, priority: int = 0):
+    """Фоновый пакетный прогноз урожайности с прогрессом по частям пакета"""
+    _validate_batch_request(request)
+    params = {'items': [item.model_dump() for item in request.items], 'engine': request.engine}
+    return _job_response(job_queue.submit('yield_batch', params, priority))
+
+@app.post("/api/jobs/export/{dataset}", status_code=202)
+def submit_export_job(dataset: str, since: Optional[str] = None, until: Optional[str] = None, priority: int = 0):
+    """
+    Фоновая выгрузка в Parquet: файл сохраняется воркером и отдается через /api/jobs/{job_id}/result.
+    Воркер читает базу чата этого узла по абсолютному пути из задачи
+    """
+    since, until = _parse_export_request(dataset, since, until)
+    database = agro_gpt_service.database
+    params = {
+        'dataset': dataset,
+        'since': since,
+        'until': until,
+        'database': os.path.abspath(database.db_path),
+        'partitions_dir': os.path.abspath(database.partitions.partitions_dir)
+    }
+    return _job_response(job_queue.submit('export', params, priority))
+
+@app.post("/api/jobs/plant-analysis", status_code=202)
+async def submit_plant_analysis_job(images: List[UploadFile] = File(...), priority: int = 0):
+    """
+    Фоновый анализ пачки изображений растений: файлы сохраняются в каталог
+    задачи (общий для узлов с воркерами), анализ выполняют воркеры очереди
+    """
+    if not images or len(images) > MAX_JOB_IMAGES:
+        raise HTTPException(status_code=400, detail=f"Число изображений должно быть от 1 до {MAX_JOB_IMAGES}")
+    
+    job_id = job_queue.new_job_id()
+    job_dir = job_queue.job_dir(job_id)
+    os.makedirs(job_dir, exist_ok=True)
+    files = []
+    try:
+        for index, image in enumerate(images):
+            try:
+                upload = await file_manager.stream_upload(image, max_size=MAX_IMAGE_SIZE)
+            except UploadTooLargeError:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"{image.filename}: размер файла не должен превышать {MAX_IMAGE_SIZE // (1024 * 1024)}MB"
+                )
+            
+            try:
+                image_format = InputValidator.detect_image_format(upload.header)
+                if image_format is None:
+                    raise HTTPException(status_code=400, detail=f"{image.filename}: неподдерживаемый формат изображения")
+                
+                filename = f"{index:04d}.{image_format}"
+                with open(os.path.join(job_dir, filename), 'wb') as f:
+                    await run_in_threadpool(shutil.copyfileobj, upload.buffer(), f)
+                files.append({'file': filename, 'filename': image.filename, 'sha256': upload.sha256})
+            finally:
+                upload.close()
+        
+        # Запись в очередь блокирует (BEGIN IMMEDIATE, ожидание блокировки файла) - не в event loop
+        await run_in_threadpool(job_queue.submit, 'plant_analysis', {'files': files}, priority, job_id=job_id)
+        return await run_in_threadpool(_job_response, job_id)
+    
+    except BaseException:
+        shutil.rmtree(job_dir, ignore_errors=True)
+        raise
+
+@app.get("/api/jobs")
+def list_jobs(status: Optional[str] = None, kind: Optional[str] = None, limit: int = 50):
+    """Последние задачи очереди и число задач по статусам"""
+    if status is not None and status not in JOB_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Статус должен быть одним из: {', '.join(JOB_STATUSES)}")
+    if kind is not None and kind not in JOB_HANDLERS:
+        raise HTTPException(status_code=400, detail=f"Тип задачи должен быть одним из: {', '.join(JOB_HANDLERS)}")
+    if limit < 1 or limit > 500:
+        raise HTTPException(status_code=400, detail="Параметр limit должен быть от 1 до 500")
+    
+    return {
+        "status": "success",
+        "timestamp": datetime.now().isoformat(),
+        "data": {
+            "jobs": job_queue.list_jobs(status, kind, limit),
+            "counts": job_queue.counts()
+        }
+    }
+
+@app.get("/api/jobs/{job_id}")
+def get_job(job_id: str):
+    """Статус и прогресс задачи (для опроса клиентом)"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return {
+        "status": "success",
+        "timestamp": datetime.now().isoformat(),
+        "data": job
+    }
+
+@app.get("/api/jobs/{job_id}/result")
+def get_job_result(job_id: str):
+    """Результат выполненной задачи; для выгрузки - файл Parquet"""
+    job = job_queue.get(job_id, include_result=True)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    if job['status'] != 'succeeded':
+        detail = f"Задача в статусе {job['status']}"
+        if job['error']:
+            detail += f": {job['error']}"
+        raise HTTPException(status_code=409, detail=detail)
+    
+    if job['kind'] == 'export':
+        return FileResponse(
+            os.path.join(job_queue.job_dir(job_id), job['result']['file']),
+            media_type="application/vnd.apache.parquet",
+            filename=job['result']['file']
+        )
+    return {
+        "status": "success",
+        "timestamp": datetime.now().isoformat(),
+        "data": job['result']
+    }
+
+@app.delete("/api/jobs/{job_id}")
+def cancel_job(job_id: str):
+    """Отмена задачи: из очереди - сразу, выполняющейся - при следующем продлении аренды воркером"""
+    previous_status = job_queue.cancel(job_id)
+    if previous_status is None:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    if previous_status in FINISHED_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Задача уже завершена: {previous_status}")
+    return {
+        "status": "success",
+        "timestamp": datetime.now().isoformat(),
+        "data": job_queue.get(job_id)
+    }
+
+@app.get("/api/analytics/top-crops")
+def get_top_crops(region: Optional[str] = None, days: int = 30, limit: int = 10):
+    """
+    Самые обсуждаемые культуры (например, в Чуйской области за 30 дней)
+    """
+    if days < 1 or days > 366:
+        raise HTTPException(status_code=400, detail="Параметр days должен быть от 1 до 366")
+    
+    if limit < 1 or limit > 50:
+        raise HTTPException(status_code=400, detail="Параметр limit должен быть от 1 до 50")
+    
+    # Регионы в агрегатах хранятся в нижнем регистре: 'чуйская', 'ошская', ...
+    region_key = region.strip().lower() if region else None
+    
+    try:
+        crops = agro_gpt_service.database.get_top_crops(region=region_key, days=days, limit=limit)
+        return {
+            "status": "success",
+            "data": {
+                "region": region_key,
+                "days": days,
+                "crops": crops
+            }
+        }
+    except Exception as e:
+        logger.error(f"Top crops analytics error: {str(e)}")
+        return JSONResponse(
+            status_code=500,
+            content=response_formatter.format_error(f"Ошибка аналитики: {str(e)}")
+        )
+
+@app.get("/api/analytics/intents")
+def get_intent_analytics(region: Optional[str] = None, days: int = 30):
+    """
+    Распределение вопросов по темам за период
+    """
+    if days < 1 or days > 366:
+        raise HTTPException(status_code=400, detail="Параметр days должен быть от 1 до 366")
+    
+    region_key = region.strip().lower() if region else None
+    
+    try:
+        intents = agro_gpt_service.database.get_intent_counts(region=region_key, days=days)
+        return {
+            "status": "success",
+            "data": {
+                "region": region_key,
+                "days": days,
+                "intents": intents
+            }
+        }
+    except Exception as e:
+        logger.error(f"Intent analytics error: {str(e)}")
+        return JSONResponse(
+            status_code=500,
+            content=response_formatter.format_error(f"Ошибка аналитики: {str(e)}")
+        )
+
 @app.post("/api/batch-analysis")
 async def batch_analyze_plants(request: BatchAnalysisRequest):
     """
@@ -247,23 +995,28 @@ async def batch_analyze_plants(request: BatchAnalysisRequest):
         if len(request.images) > 10:
             raise HTTPException(status_code=400, detail="Максимум 10 изображений за раз")
         
+        # Изображения анализируются параллельно в пуле потоков сервиса
+        # В реальном проекте здесь будет обработка base64
+        analyses = await asyncio.gather(
+            *(plant_service.analyze_image(image_data.encode()) for image_data in request.images),
+            return_exceptions=True
+        )
+        
         results = []
-        for i, image_data in enumerate(request.images):
-            try:
-                # Декодирование base64 и анализ
-                # В реальном проекте здесь будет обработка base64
-                result = await plant_service.analyze_image(image_data.encode())
+        for i, result in enumerate(analyses):
+            # CancelledError - BaseException, а не Exception: отмененный анализ тоже ошибка
+            if isinstance(result, BaseException):
+                results.append({
+                    "image_index": i, 
+                    "status": "error",
+                    "error": str(result) or type(result).__name__
+                })
+            else:
                 results.append({
                     "image_index": i,
                     "status": "success",
                     "result": result
                 })
-            except Exception as e:
-                results.append({
-                    "image_index": i, 
-                    "status": "error",
-                    "error": str(e)
-                })
         
         return {
             "status": "completed",
@@ -280,26 +1033,91 @@ async def batch_analyze_plants(request: BatchAnalysisRequest):
         logger.error(f"Batch analysis error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/crops")
-async def get_available_crops():
-    """Получить список доступных культур для прогнозирования"""
-    crops = [
-        {"id": "пшеница", "name": "Пшеница", "category": "зерновые"},
-        {"id": "кукуруза", "name": "Кукуруза", "category": "зерновые"},
-        {"id": "рис", "name": "Рис", "category": "зерновые"},
-        {"id": "картофель", "name": "Картофель", "category": "овощи"},
-        {"id": "ячмень", "name": "Ячмень", "category": "зерновые"},
-        {"id": "соя", "name": "Соя", "category": "бобовые"},
-        {"id": "томат", "name": "Томат", "category": "овощи"},
-        {"id": "огурец", "name": "Огурец", "category": "овощи"}
-    ]
-    
+@app.get("/api/admission/stats")
+async def get_admission_stats():
+    """
+    Состояние контроля допуска: лимиты параллелизма, задержки и отказы по маршрутам
+    """
+    return {
+        "status": "success",
+        "timestamp": datetime.now().isoformat(),
+        "data": admission_controller.snapshot()
+    }
+
+@app.get("/api/coalescing/stats")
+async def get_coalescing_stats():
+    """
+    Статистика объединения одинаковых одновременных запросов по маршрутам
+    """
+    return {
+        "status": "success",
+        "timestamp": datetime.now().isoformat(),
+        "data": coalescer.snapshot()
+    }
+
+@app.get("/api/workers/memory")
+def get_workers_memory():
+    """
+    Память мастера и воркеров при запуске через serve.py: USS воркера - его
+    собственные страницы, остальное общее с мастером (copy-on-write)
+    """
+    report = memory_report()
+    if report is None:
+        raise HTTPException(status_code=404, detail="Сервер запущен без prefork-лаунчера (serve.py)")
     return {
         "status": "success",
-        "data": crops,
-        "count": len(crops)
+        "timestamp": datetime.now().isoformat(),
+        "data": {**report, "pid": os.getpid()}
     }
 
+@app.get("/api/predict-yield/cache")
+async def get_yield_cache_stats():
+    """
+    Кэш прогнозов урожайности: размер, попадания и сбросы при смене версии модели
+    """
+    return {
+        "status": "success",
+        "timestamp": datetime.now().isoformat(),
+        "data": {
+            **yield_service.cache.stats(),
+            "decimals": yield_service.cache_decimals,
+            "model_versions": yield_service.model.model_versions
+        }
+    }
+
+@app.get("/api/predict-yield/surrogate")
+async def get_yield_surrogate_stats():
+    """
+    Таблицы суррогата урожайности: сетка, размер, ошибка относительно леса и актуальность версии
+    """
+    return {
+        "status": "success",
+        "timestamp": datetime.now().isoformat(),
+        "data": yield_service.surrogate.stats(yield_service.model.model_versions)
+    }
+
+@app.get("/api/kb/welcome")
+async def get_kb_welcome(request: Request):
+    """Приветствие с описанием возможностей помощника (кэшируемый ответ)"""
+    return static_bodies['kb/welcome'].respond(request)
+
+@app.get("/api/kb/regions/{region}")
+async def get_kb_region(region: str, request: Request):
+    """Справка по области Кыргызстана (кэшируемый ответ)"""
+    body = static_bodies.get(f'kb/regions/{region.strip().lower()}')
+    if body is None:
+        raise HTTPException(status_code=404, detail="Область не найдена")
+    return body.respond(request)
+
+@app.get("/api/crops")
+async def get_available_crops(request: Request):
+    """Получить список доступных культур для прогнозирования"""
+    return static_bodies['crops'].respond(request)
+
+# Без фронтенда корень отдает описание API; с фронтендом "/" занят index.html
+if not SERVE_FRONTEND:
+    app.add_api_route("/", root, methods=["GET"])
+
 # Глобальный обработчик ошибок
 @app.exception_handler(500)
 async def internal_server_error_handler(request, exc):
@@ -324,6 +1142,10 @@ async def not_found_handler(request, exc):
         }
     )
 
+# Монтируется последним: API маршруты выше имеют приоритет
+if SERVE_FRONTEND:
+    app.mount("/", FrontendStaticFiles(directory=FRONTEND_DIST_DIR), name="frontend")
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
@@ -3,17 +3,27 @@ import random
 import re
 import json
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, NamedTuple, Optional, Tuple
+from collections import OrderedDict, deque
 from datetime import datetime, timedelta
 from enum import Enum
 import asyncio
+import threading
 from dataclasses import dataclass
 import sqlite3
 import os
+import fcntl
 from http.server import HTTPServer, BaseHTTPRequestHandler
 import urllib.parse as urlparse
 from concurrent.futures import ThreadPoolExecutor
 
+from app.utils.text_normalizer import STOPWORDS, TokenNormalizer
+from app.utils.bm25 import BM25Index, stem
+from app.utils.intent_classifier import IntentClassifier
+from app.services.chat_partitions import (
+    CHAT_ARCHIVE_DIR, CHAT_PARTITIONS_DIR, ChatLogReader, MessagePartitions, current_month
+)
+
 # Настройка логирования
 logging.basicConfig(
     level=logging.INFO,
@@ -25,6 +35,24 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# История разговора в памяти: кольцевой буфер последних ходов сессии и LRU по сессиям
+HISTORY_TURNS_PER_SESSION = int(os.getenv("HISTORY_TURNS_PER_SESSION", 16))
+HISTORY_MAX_SESSIONS = int(os.getenv("HISTORY_MAX_SESSIONS", 5000))
+
+# Уточняющий вопрос без культуры или региона берет их из последних N ходов
+FOLLOWUP_LOOKBACK_TURNS = 3
+
+# Поиск по базе знаний для вопросов, не попавших в правила: минимальный BM25 score ответа
+KB_MIN_SCORE = float(os.getenv("KB_MIN_SCORE", 4.0))
+KB_TOP_K = 3
+
+# Обученный классификатор интентов (train_intent_model.py); без файла работают только правила.
+# Ниже порога уверенности решение остается за правилами
+INTENT_MODEL_PATH = os.getenv(
+    "INTENT_MODEL_PATH", os.path.join(os.getenv("MODELS_DIR", "models"), "intent", "intent_model.npz")
+)
+INTENT_MIN_CONFIDENCE = float(os.getenv("INTENT_MIN_CONFIDENCE", 0.5))
+
 class Intent(Enum):
     PLANT_CARE = "plant_care"
     DISEASE_HELP = "disease_help" 
@@ -41,6 +69,63 @@ class Intent(Enum):
     GENERAL = "general"
     KYRGYZSTAN_SPECIFIC = "kyrgyzstan_specific"
 
+# Словарь нормализации: каноническая форма -> леммы и синонимы (русские, кыргызские, латиницей).
+# Словоформы, транслитерация и индекс опечаток порождаются из него при старте.
+# Для ключевых слов каноническая форма - основа, которую распознают правила интентов
+AGRO_LEXICON = {
+    'region': {
+        'чуйская': ['чуй', 'чүй', 'бишкек', 'токмак', 'токмок', 'кара балта', 'кант', 'сокулук'],
+        'иссык-кульская': ['иссык куль', 'ысык көл', 'иссыккуль', 'каракол', 'чолпон ата', 'балыкчы', 'тюп'],
+        'ошская': ['ош', 'узген', 'өзгөн', 'кара суу', 'ноокат', 'араван'],
+        'джалал-абадская': ['джалал абад', 'жалал абад', 'майлуу суу', 'кок жангак', 'токтогул', 'базар коргон'],
+        'нарынская': ['нарын', 'ат башы', 'кочкор', 'кочкорка'],
+        'таласская': ['талас', 'кара буура', 'манас', 'бакай ата'],
+        'баткенская': ['баткен', 'исфана', 'кызыл кия', 'сулюкта'],
+    },
+    'crop': {
+        'томат': ['помидор', 'помидорка', 'томаты'],
+        'картофель': ['картошка', 'картөшкө', 'картофан'],
+        'огурец': ['огурчик', 'бадыраң', 'бадыран'],
+        'капуста': ['капуста', 'капустка'],
+        'морковь': ['морковка', 'сабиз'],
+        'перец': ['перчик', 'калемпир'],
+        'баклажан': ['синенький'],
+        'лук': ['лучок', 'пияз'],
+        'чеснок': ['сарымсак'],
+        'редис': ['редиска'],
+        'клубника': ['земляника', 'виктория', 'кулпунай'],
+        'малина': ['малинка'],
+        'смородина': ['карагат'],
+        'виноград': ['жүзүм', 'жузум'],
+        'яблоня': ['яблоко', 'яблок', 'апорт', 'алма'],
+        'груша': ['алмурут'],
+        'абрикос': ['урюк', 'өрүк'],
+        'пшеница': ['буудай'],
+    },
+    'pest': {
+        'тля': ['тли'],
+        'клещ': ['паутинный клещ'],
+        'гусеницы': ['гусеница', 'листовертка'],
+        'слизни': ['слизень', 'слизняк'],
+        'мухи': ['муха', 'морковная муха', 'луковая муха'],
+        'колорадский жук': ['колорадский', 'колорадка', 'колорады'],
+    },
+    'keyword': {
+        'полив': ['поливать', 'поливка', 'орошение', 'сугаруу', 'суғаруу'],
+        'удобрени': ['удобрение', 'удобрять', 'подкормка', 'подкормить', 'подкармливать', 'жер семирткич'],
+        'вредител': ['вредитель', 'насекомое', 'зыянкеч'],
+        'болезн': ['болезнь', 'заболевание', 'оору'],
+        'посадк': ['посадка', 'сажать', 'посадить', 'рассада', 'посев', 'отургузуу'],
+        'обрезк': ['обрезка', 'обрезать'],
+        'хранен': ['хранение', 'хранить', 'сактоо'],
+        'урожай': ['урожайность', 'уборка', 'түшүм'],
+        'почв': ['почва', 'грунт', 'топурак'],
+        'погод': ['погода', 'температура', 'заморозки', 'аба ырайы'],
+        'кредит': ['субсидия', 'господдержка', 'поддержка', 'насыя'],
+        'привет': ['здравствуйте', 'салам', 'саламатсызбы', 'ассаламу алейкум'],
+    },
+}
+
 @dataclass
 class UserEntity:
     crops: List[str]
@@ -50,8 +135,17 @@ class UserEntity:
     soil_type: Optional[str]
 
 class AgroDatabase:
-    def __init__(self, db_path: str = "agro_gpt.db"):
+    """
+    Основная база (сессии, агрегаты, каталог партиций) и журнал сообщений
+    в месячных партициях (app/services/chat_partitions.py)
+    """
+    
+    def __init__(self, db_path: str = "agro_gpt.db", partitions_dir: Optional[str] = CHAT_PARTITIONS_DIR,
+                 archive_dir: Optional[str] = CHAT_ARCHIVE_DIR):
         self.db_path = db_path
+        self.partitions = MessagePartitions(db_path, partitions_dir, archive_dir)
+        self.log_reader = ChatLogReader(db_path, self.partitions)
+        self.fts_enabled = self.partitions.fts_enabled
         self._init_database()
     
     def _init_database(self):
@@ -66,43 +160,391 @@ class AgroDatabase:
                     )
                 ''')
                 
-                conn.execute('''
-                    CREATE TABLE IF NOT EXISTS messages (
-                        message_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        session_id TEXT,
-                        user_message TEXT,
-                        bot_response TEXT,
-                        intent TEXT,
-                        entities TEXT,
-                        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (session_id) REFERENCES sessions (session_id)
-                    )
-                ''')
+                self.partitions.init_catalog(conn)
+                self.partitions.upgrade_partitions(conn)
+                
+                legacy = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages'"
+                ).fetchone() is not None
+                
+                self._init_rollups(conn, backfill=legacy)
+                self._init_prediction_log(conn)
+                if legacy:
+                    self._migrate_legacy_messages(conn)
                 
                 conn.commit()
                 logger.info("База данных инициализирована успешно")
         except Exception as e:
             logger.error(f"Ошибка инициализации базы данных: {e}")
     
+    def _migrate_legacy_messages(self, conn: sqlite3.Connection):
+        """Разовый перенос таблицы messages из основной базы в месячные партиции (message_id сохраняются)"""
+        os.makedirs(self.partitions.partitions_dir, exist_ok=True)
+        with open(os.path.join(self.partitions.partitions_dir, '.migration.lock'), 'w') as lock_file:
+            # Воркеры стартуют одновременно: переносит один, остальные ждут и видят готовый результат
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages'").fetchone():
+                self._move_legacy_messages(conn)
+    
+    def _move_legacy_messages(self, conn: sqlite3.Connection):
+        months = conn.execute('''
+            SELECT strftime('%Y-%m', COALESCE(timestamp, CURRENT_TIMESTAMP)) AS month,
+                   MIN(message_id), MAX(message_id), COUNT(*)
+            FROM messages GROUP BY month ORDER BY month
+        ''').fetchall()
+        
+        for month, first_id, last_id, rows in months:
+            path = self.partitions.ensure(conn, month)
+            conn.commit()
+            conn.execute("ATTACH DATABASE ? AS part", (path,))
+            try:
+                cursor = conn.execute('''
+                    INSERT OR IGNORE INTO part.messages
+                        (message_id, session_id, user_message, bot_response, intent, entities, timestamp)
+                    SELECT message_id, session_id, user_message, bot_response, intent, entities, timestamp
+                    FROM main.messages
+                    WHERE strftime('%Y-%m', COALESCE(timestamp, CURRENT_TIMESTAMP)) = ?
+                ''', (month,))
+                self.partitions.record_write(conn, month, first_id, last_id, cursor.rowcount)
+                conn.commit()
+            finally:
+                conn.execute("DETACH DATABASE part")
+            logger.info(f"Перенесено {rows} сообщений в партицию {month}")
+        
+        for statement in (
+            "DROP TRIGGER IF EXISTS messages_fts_insert",
+            "DROP TRIGGER IF EXISTS messages_fts_delete",
+            "DROP TRIGGER IF EXISTS messages_fts_update",
+            "DROP TABLE IF EXISTS messages_fts",
+            "DROP TABLE messages",
+        ):
+            conn.execute(statement)
+    
+    def _init_rollups(self, conn: sqlite3.Connection, backfill: bool):
+        """Таблицы почасовых агрегатов использования вместо счетчиков в памяти процесса"""
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'usage_intent_hourly'"
+        ).fetchone()
+        
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS usage_intent_hourly (
+                region TEXT NOT NULL,
+                hour TEXT NOT NULL,
+                intent TEXT NOT NULL,
+                messages INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (region, hour, intent)
+            ) WITHOUT ROWID
+        ''')
+        
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS usage_crop_hourly (
+                region TEXT NOT NULL,
+                hour TEXT NOT NULL,
+                intent TEXT NOT NULL,
+                crop TEXT NOT NULL,
+                mentions INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (region, hour, intent, crop)
+            ) WITHOUT ROWID
+        ''')
+        
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_usage_crop_hourly_hour
+            ON usage_crop_hourly (hour, crop)
+        ''')
+        
+        # Разовое заполнение агрегатов по сообщениям, сохраненным до их появления
+        if not exists and backfill:
+            conn.execute('''
+                INSERT INTO usage_intent_hourly (region, hour, intent, messages)
+                SELECT COALESCE(json_extract(entities, '$.location'), ''),
+                       strftime('%Y-%m-%d %H:00:00', timestamp),
+                       COALESCE(intent, ''),
+                       COUNT(*)
+                FROM messages
+                WHERE json_valid(entities)
+                GROUP BY 1, 2, 3
+            ''')
+            
+            conn.execute('''
+                INSERT INTO usage_crop_hourly (region, hour, intent, crop, mentions)
+                SELECT COALESCE(json_extract(m.entities, '$.location'), ''),
+                       strftime('%Y-%m-%d %H:00:00', m.timestamp),
+                       COALESCE(m.intent, ''),
+                       crop.value,
+                       COUNT(DISTINCT m.message_id)
+                FROM messages m, json_each(m.entities, '$.crops') AS crop
+                WHERE json_valid(m.entities)
+                GROUP BY 1, 2, 3, 4
+            ''')
+    
+    def _init_prediction_log(self, conn: sqlite3.Connection):
+        """Журнал прогнозов урожайности (входы, результат, версия модели) для офлайн-анализа"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS yield_predictions (
+                prediction_id INTEGER PRIMARY KEY,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                crop_type TEXT NOT NULL,
+                soil_quality REAL,
+                rainfall REAL,
+                temperature REAL,
+                area REAL,
+                fertilizer_used INTEGER,
+                predicted_yield REAL,
+                lower REAL,
+                upper REAL,
+                confidence REAL,
+                model_version TEXT
+            )
+        ''')
+    
     def save_message(self, session_id: str, user_message: str, bot_response: str, 
-                    intent: str, entities: Dict):
-        """Сохранение сообщения в базу данных"""
+                    intent: str, entities: Dict, intent_source: Optional[str] = None,
+                    intent_confidence: Optional[float] = None) -> Optional[int]:
+        """
+        Сохранение сообщения в партицию текущего месяца; возвращает message_id.
+        intent_source ('model' или 'rules') и уверенность модели нужны, чтобы
+        не обучать классификатор на ошибках правил и собственных догадках
+        """
         try:
             safe_entities = self._make_json_safe(entities)
+            month = current_month()
             
             with sqlite3.connect(self.db_path) as conn:
-                conn.execute('''
-                    INSERT OR IGNORE INTO sessions (session_id) VALUES (?)
-                ''', (session_id,))
-                
-                conn.execute('''
-                    INSERT INTO messages (session_id, user_message, bot_response, intent, entities)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (session_id, user_message, bot_response, intent, json.dumps(safe_entities, ensure_ascii=False)))
+                path = self.partitions.ensure(conn, month)
                 conn.commit()
+                
+                # Основная база и партиция пишутся одной транзакцией через ATTACH
+                conn.execute("ATTACH DATABASE ? AS part", (path,))
+                try:
+                    conn.execute("BEGIN IMMEDIATE")
+                    conn.execute('''
+                        INSERT OR IGNORE INTO sessions (session_id) VALUES (?)
+                    ''', (session_id,))
+                    
+                    message_id = self.partitions.next_message_id(conn)
+                    conn.execute('''
+                        INSERT INTO part.messages (message_id, session_id, user_message, bot_response, intent, entities,
+                                                   intent_source, intent_confidence)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', (message_id, session_id, user_message, bot_response, intent,
+                          json.dumps(safe_entities, ensure_ascii=False), intent_source, intent_confidence))
+                    self.partitions.record_write(conn, month, message_id, message_id, 1)
+                    
+                    # Почасовые агрегаты обновляются в той же транзакции, что и вставка сообщения
+                    self._update_rollups(conn, intent, safe_entities)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    conn.execute("DETACH DATABASE part")
+                
                 logger.info(f"Сообщение сохранено для сессии {session_id}")
+                return message_id
         except Exception as e:
             logger.error(f"Ошибка сохранения в базу данных: {e}")
+            return None
+    
+    def save_prediction(self, inputs: Dict[str, Any], prediction: Dict[str, Any], model_version: Optional[str]):
+        """Запись прогноза урожайности в журнал"""
+        try:
+            interval = prediction.get('prediction_interval', {})
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute('''
+                    INSERT INTO yield_predictions (crop_type, soil_quality, rainfall, temperature, area,
+                                                   fertilizer_used, predicted_yield, lower, upper, confidence,
+                                                   model_version)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (inputs['crop_type'], inputs['soil_quality'], inputs['rainfall'], inputs['temperature'],
+                      inputs['area'], int(bool(inputs['fertilizer_used'])), prediction.get('predicted_yield'),
+                      interval.get('lower'), interval.get('upper'), prediction.get('confidence'), model_version))
+        except Exception as e:
+            logger.error(f"Ошибка сохранения прогноза: {e}")
+    
+    def _update_rollups(self, conn: sqlite3.Connection, intent: str, entities: Dict):
+        """Инкрементальное обновление почасовых агрегатов (час × интент × культура × регион)"""
+        region = entities.get('location') or ''
+        
+        conn.execute('''
+            INSERT INTO usage_intent_hourly (region, hour, intent, messages)
+            VALUES (?, strftime('%Y-%m-%d %H:00:00', 'now'), ?, 1)
+            ON CONFLICT (region, hour, intent) DO UPDATE SET messages = messages + 1
+        ''', (region, intent))
+        
+        crops = set(entities.get('crops') or [])
+        if crops:
+            conn.executemany('''
+                INSERT INTO usage_crop_hourly (region, hour, intent, crop, mentions)
+                VALUES (?, strftime('%Y-%m-%d %H:00:00', 'now'), ?, ?, 1)
+                ON CONFLICT (region, hour, intent, crop) DO UPDATE SET mentions = mentions + 1
+            ''', [(region, intent, crop) for crop in crops])
+    
+    def get_top_crops(self, region: Optional[str] = None, days: int = 30, limit: int = 10) -> List[Dict[str, Any]]:
+        """Самые упоминаемые культуры за период (по агрегатам, без чтения messages)"""
+        query = '''
+            SELECT crop, SUM(mentions) AS mentions
+            FROM usage_crop_hourly
+            WHERE hour >= strftime('%Y-%m-%d %H:00:00', 'now', ?)
+        '''
+        params: List[Any] = [f'-{days} days']
+        
+        if region is not None:
+            query += ' AND region = ?'
+            params.append(region)
+        
+        query += ' GROUP BY crop ORDER BY mentions DESC, crop LIMIT ?'
+        params.append(limit)
+        
+        with sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute(query, params).fetchall()
+        
+        return [{'crop': crop, 'mentions': mentions} for crop, mentions in rows]
+    
+    def get_intent_counts(self, region: Optional[str] = None, days: Optional[int] = None) -> Dict[str, int]:
+        """Количество сообщений по интентам за период (по агрегатам)"""
+        query = 'SELECT intent, SUM(messages) FROM usage_intent_hourly WHERE 1 = 1'
+        params: List[Any] = []
+        
+        if days is not None:
+            query += " AND hour >= strftime('%Y-%m-%d %H:00:00', 'now', ?)"
+            params.append(f'-{days} days')
+        
+        if region is not None:
+            query += ' AND region = ?'
+            params.append(region)
+        
+        query += ' GROUP BY intent ORDER BY 2 DESC'
+        
+        with sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute(query, params).fetchall()
+        
+        return {intent: count for intent, count in rows}
+    
+    def get_crop_counts(self) -> Dict[str, int]:
+        """Количество упоминаний культур за все время (по агрегатам)"""
+        with sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute('''
+                SELECT crop, SUM(mentions) FROM usage_crop_hourly
+                GROUP BY crop ORDER BY 2 DESC
+            ''').fetchall()
+        
+        return {crop: count for crop, count in rows}
+    
+    def iter_messages(self, chunk_size: int = 50000, since: Optional[str] = None,
+                      until: Optional[str] = None) -> Iterator[List[tuple]]:
+        """Выгрузка журнала кусками от старых к новым; since/until - даты YYYY-MM-DD (until не включается)"""
+        return self.log_reader.iter_messages(chunk_size, since, until)
+    
+    def iter_predictions(self, chunk_size: int = 50000, since: Optional[str] = None,
+                         until: Optional[str] = None) -> Iterator[List[tuple]]:
+        """Выгрузка журнала прогнозов кусками с keyset по prediction_id"""
+        return self.log_reader.iter_predictions(chunk_size, since, until)
+    
+    def get_session_messages(self, session_id: str, limit: int = 50,
+                             before_id: Optional[int] = None) -> Dict[str, Any]:
+        """История сессии от новых к старым с keyset-пагинацией по message_id"""
+        query = '''
+            SELECT message_id, session_id, user_message, bot_response, intent, entities, timestamp
+            FROM messages
+            WHERE session_id = ?
+        '''
+        params: List[Any] = [session_id]
+        
+        if before_id is not None:
+            query += ' AND message_id < ?'
+            params.append(before_id)
+        
+        query += ' ORDER BY message_id DESC'
+        
+        rows = self.partitions.query(query, params, limit + 1, before_id, sqlite3.Row)
+        return self._paginate(rows, limit)
+    
+    def get_recent_turns(self, session_id: str, limit: int) -> List[Tuple[int, str, Dict]]:
+        """Последние ходы сессии (message_id, intent, entities) от старых к новым"""
+        rows = self.partitions.query('''
+            SELECT message_id, intent, entities FROM messages
+            WHERE session_id = ?
+            ORDER BY message_id DESC
+        ''', [session_id], limit)
+        
+        turns = []
+        for message_id, intent, entities in reversed(rows):
+            try:
+                turns.append((message_id, intent, json.loads(entities) if entities else {}))
+            except json.JSONDecodeError:
+                turns.append((message_id, intent, {}))
+        return turns
+    
+    def get_labeled_messages(self, min_confidence: float, limit: Optional[int] = None) -> List[Tuple[str, str]]:
+        """
+        Пары (сообщение, интент) из журнала, где интент выбрала модель с уверенностью
+        не ниже min_confidence, новые первыми. Метки правил и записи без источника
+        (до его журналирования) не возвращаются
+        """
+        rows = self.partitions.query('''
+            SELECT message_id, user_message, intent FROM messages
+            WHERE user_message IS NOT NULL AND intent IS NOT NULL
+              AND intent_source = 'model' AND intent_confidence >= ?
+            ORDER BY message_id DESC
+        ''', [min_confidence], limit)
+        return [(message, intent) for _, message, intent in rows]
+    
+    def search_messages(self, query_text: str, session_id: Optional[str] = None,
+                        limit: int = 20, before_id: Optional[int] = None) -> Dict[str, Any]:
+        """Полнотекстовый поиск по сообщениям (новые первыми, keyset по message_id)"""
+        if not self.fts_enabled:
+            raise RuntimeError("Full-text search is not available (SQLite built without FTS5)")
+        
+        match_query = self._build_match_query(query_text)
+        if not match_query:
+            return {'messages': [], 'next_cursor': None}
+        
+        query = '''
+            SELECT m.message_id, m.session_id, m.user_message, m.bot_response,
+                   m.intent, m.entities, m.timestamp,
+                   snippet(messages_fts, -1, '[', ']', '…', 12) AS snippet
+            FROM messages_fts
+            JOIN messages m ON m.message_id = messages_fts.rowid
+            WHERE messages_fts MATCH ?
+        '''
+        params: List[Any] = [match_query]
+        
+        if session_id is not None:
+            query += ' AND m.session_id = ?'
+            params.append(session_id)
+        
+        if before_id is not None:
+            query += ' AND messages_fts.rowid < ?'
+            params.append(before_id)
+        
+        query += ' ORDER BY messages_fts.rowid DESC'
+        
+        rows = self.partitions.query(query, params, limit + 1, before_id, sqlite3.Row)
+        return self._paginate(rows, limit)
+    
+    @staticmethod
+    def _build_match_query(query_text: str) -> str:
+        """Безопасный запрос FTS5: каждое слово как префиксный термин, все слова обязательны"""
+        tokens = re.findall(r'\w+', query_text.lower())
+        return ' '.join(f'"{token}"*' for token in tokens)
+    
+    def _paginate(self, rows: List[sqlite3.Row], limit: int) -> Dict[str, Any]:
+        """Формирование страницы и курсора на следующую"""
+        has_more = len(rows) > limit
+        
+        messages = []
+        for row in rows[:limit]:
+            message = dict(row)
+            try:
+                message['entities'] = json.loads(message['entities']) if message['entities'] else {}
+            except json.JSONDecodeError:
+                message['entities'] = {}
+            messages.append(message)
+        
+        return {
+            'messages': messages,
+            'next_cursor': messages[-1]['message_id'] if has_more else None
+        }
     
     def _make_json_safe(self, obj):
         """Рекурсивно преобразует объекты в JSON-безопасные"""
@@ -414,6 +856,65 @@ class AdvancedAgroKnowledgeBase:
             }
         }
 
+    PASSAGE_ASPECTS = {
+        'watering': "полив",
+        'fertilizer': "удобрения и подкормка",
+        'pests': "вредители",
+        'diseases': "болезни",
+        'harvest': "сбор урожая",
+        'planting': "посадка",
+        'pruning': "обрезка и формирование",
+        'storage': "хранение",
+        'kyrgyzstan_specific': "сорта и регионы Кыргызстана"
+    }
+    
+    ADVICE_TOPICS = {
+        'pest_control': "Защита от вредителей",
+        'disease_control': "Лечение болезней",
+        'soil_improvement': "Улучшение почвы",
+        'companion_planting': "Совместные посадки",
+        'kyrgyzstan_specific': "Кыргызстан"
+    }
+    
+    def passages(self) -> List[Dict[str, str]]:
+        """Отрывки базы знаний для поискового индекса: культура × тема, общие советы, области"""
+        passages = []
+        for crop, aspects in self.crop_data.items():
+            for aspect, text in aspects.items():
+                passages.append({
+                    'title': f"{crop.capitalize()}: {self.PASSAGE_ASPECTS.get(aspect, aspect)}",
+                    'text': text,
+                    'source': f"crop_data/{crop}/{aspect}"
+                })
+        
+        for topic, entries in self.general_advice.items():
+            for key, text in entries.items():
+                passages.append({
+                    'title': f"{self.ADVICE_TOPICS.get(topic, topic)}: {key.replace('_', ' ')}",
+                    'text': text,
+                    'source': f"general_advice/{topic}/{key}"
+                })
+        
+        for region, info in self.kyrgyzstan_regions.items():
+            passages.append({
+                'title': f"{region.capitalize()} область",
+                'text': f"Климат: {info['climate']}. Почвы: {info['soil']}. Специализация: {info['specialization']}. "
+                        f"Вода: {info['water']}. Рынки: {info['markets']}.\n{info.get('soil_details', '')}",
+                'source': f"kyrgyzstan_regions/{region}"
+            })
+        return passages
+
+class KnowledgeRetriever:
+    """BM25 поиск по отрывкам базы знаний; индекс строится один раз при старте"""
+    
+    def __init__(self, passages: List[Dict[str, str]], analyzer):
+        self.passages = passages
+        self.analyzer = analyzer
+        self.index = BM25Index([analyzer(f"{passage['title']} {passage['text']}") for passage in passages])
+    
+    def search(self, query: str, k: int = KB_TOP_K) -> List[Tuple[Dict[str, str], float]]:
+        return [(self.passages[doc_id], score) for doc_id, score in self.index.search(self.analyzer(query), k)]
+
 class AgroMLService:
     def __init__(self):
         self.disease_patterns = {
@@ -482,7 +983,6 @@ class AgroContextManager:
             'conversation_stage': 'greeting',
             'user_experience': 'beginner',
             'last_intent': None,
-            'message_history': [],
             'last_activity': datetime.now(),
             'session_start': datetime.now()
         }
@@ -496,33 +996,172 @@ class AgroContextManager:
         """Обновление контекста"""
         session_id = self._ensure_string_session_id(session_id)
         context = self.get_context(session_id)
-        
-        if 'message_history' not in context:
-            context['message_history'] = []
-        
         context.update(updates)
         context['last_activity'] = datetime.now()
         self.contexts[session_id] = context
 
-class AgroResponseGenerator:
-    def __init__(self, knowledge_base: AdvancedAgroKnowledgeBase, ml_service: AgroMLService):
-        self.kb = knowledge_base
-        self.ml = ml_service
+class TurnRecord(NamedTuple):
+    """Компактная запись хода: ссылка на строку messages и коды интента и сущностей"""
+    message_id: int
+    intent: int
+    crops: Tuple[int, ...]
+    pests: Tuple[int, ...]
+    location: int
+
+class ChatTurn(NamedTuple):
+    """Разобранное сообщение сессии до генерации ответа"""
+    session_id: str
+    user_message: str
+    intent: Intent
+    entities: Dict
+    response_entities: Dict
+    context: Dict
+    intent_source: str
+    intent_confidence: Optional[float]
+
+class ConversationHistory:
+    """
+    История разговоров в памяти: кольцевой буфер (deque с maxlen) последних
+    ходов на сессию и LRU по сессиям, поэтому память ограничена
+    turns_per_session × max_sessions записей. Буфер сессии один раз заполняется
+    из таблицы messages при промахе, дальше ходы добавляются без чтения базы.
+    Вызывается из потоков пула: LRU защищен блокировкой, чтение базы - вне ее
+    """
+    
+    # Интенты, где уточняющий вопрос без культуры относится к культуре из истории
+    CROP_FOLLOWUP_INTENTS = {
+        Intent.PLANT_CARE, Intent.DISEASE_HELP, Intent.WATERING, Intent.FERTILIZER,
+        Intent.PEST_CONTROL, Intent.HARVEST_TIPS, Intent.PLANTING, Intent.PRUNING,
+        Intent.STORAGE, Intent.COMPANION_PLANTING
+    }
+    LOCATION_FOLLOWUP_INTENTS = {Intent.SOIL_ADVICE, Intent.KYRGYZSTAN_SPECIFIC, Intent.WEATHER}
+    
+    def __init__(self, database: AgroDatabase, turns_per_session: int = HISTORY_TURNS_PER_SESSION,
+                 max_sessions: int = HISTORY_MAX_SESSIONS):
+        self.database = database
+        self.turns_per_session = turns_per_session
+        self.max_sessions = max_sessions
+        self.sessions: "OrderedDict[str, deque]" = OrderedDict()
+        self.lock = threading.Lock()
         
-    def generate_response(self, intent: Intent, entities: Dict, context: Dict, user_message: str = "") -> str:
-        """Умная генерация ответов на основе интента и сущностей"""
+        # Коды интентов и сущностей: в записях хранятся int вместо строк
+        self.intents = list(Intent)
+        self.intent_codes = {intent.value: code for code, intent in enumerate(self.intents)}
+        self.entity_names: List[str] = []
+        self.entity_codes: Dict[str, int] = {}
         
-        crops = entities.get('crops', [])
-        symptoms = entities.get('symptoms', [])
-        pests = entities.get('pests', [])
+        self.hits = 0
+        self.hydrations = 0
+        self.evictions = 0
+    
+    def _entity_code(self, name: str) -> int:
+        code = self.entity_codes.get(name)
+        if code is None:
+            code = self.entity_codes[name] = len(self.entity_names)
+            self.entity_names.append(name)
+        return code
+    
+    def _make_record(self, message_id: Optional[int], intent: str, entities: Dict) -> TurnRecord:
         location = entities.get('location')
-        message_lower = user_message.lower()
+        return TurnRecord(
+            message_id if message_id is not None else -1,
+            self.intent_codes.get(intent, self.intent_codes[Intent.GENERAL.value]),
+            tuple(self._entity_code(crop) for crop in entities.get('crops') or []),
+            tuple(self._entity_code(pest) for pest in entities.get('pests') or []),
+            self._entity_code(location) if location else -1
+        )
+    
+    def get(self, session_id: str) -> deque:
+        """Буфер сессии; при промахе заполняется из базы"""
+        with self.lock:
+            buffer = self.sessions.get(session_id)
+            if buffer is not None:
+                self.sessions.move_to_end(session_id)
+                self.hits += 1
+                return buffer
         
-        if intent == Intent.GENERAL:
-            if not crops:
-                # Детальное описание возможностей при первом приветствии
-                if context.get('conversation_stage') == 'greeting':
-                    welcome_message = """🇰🇬 Ассалому алейкум! Я ваш агрономический помощник для Кыргызстана! 
+        turns = []
+        try:
+            turns = self.database.get_recent_turns(session_id, self.turns_per_session)
+        except Exception as e:
+            logger.error(f"Ошибка загрузки истории сессии {session_id}: {e}")
+        
+        with self.lock:
+            # Сессию мог загрузить параллельный запрос, пока шло чтение базы
+            buffer = self.sessions.get(session_id)
+            if buffer is not None:
+                self.sessions.move_to_end(session_id)
+                return buffer
+            
+            buffer = deque(
+                (self._make_record(message_id, intent, entities) for message_id, intent, entities in turns),
+                maxlen=self.turns_per_session
+            )
+            self.hydrations += 1
+            self.sessions[session_id] = buffer
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+                self.evictions += 1
+            return buffer
+    
+    def append(self, session_id: str, message_id: Optional[int], intent: Intent, entities: Dict):
+        buffer = self.get(session_id)
+        with self.lock:
+            # Ход уже попал в буфер, если сессия была загружена из базы после сохранения сообщения
+            if message_id is not None and buffer and buffer[-1].message_id >= message_id:
+                return
+            buffer.append(self._make_record(message_id, intent.value, entities))
+    
+    def resolve_followup(self, session_id: str, intent: Intent, entities: Dict) -> Dict:
+        """
+        Сущности для ответа: уточняющий вопрос ("а как его поливать?") получает
+        культуру, вредителей или регион из последних ходов сессии
+        """
+        needs_crop = intent in self.CROP_FOLLOWUP_INTENTS and not entities.get('crops')
+        needs_location = intent in self.LOCATION_FOLLOWUP_INTENTS and not entities.get('location')
+        if not needs_crop and not needs_location:
+            return entities
+        
+        resolved = dict(entities)
+        recent = list(self.get(session_id))[-FOLLOWUP_LOOKBACK_TURNS:]
+        for record in reversed(recent):
+            if needs_crop and record.crops:
+                resolved['crops'] = [self.entity_names[code] for code in record.crops]
+                if not entities.get('pests') and record.pests:
+                    resolved['pests'] = [self.entity_names[code] for code in record.pests]
+                needs_crop = False
+            if needs_location and record.location >= 0:
+                resolved['location'] = self.entity_names[record.location]
+                needs_location = False
+        
+        resolved['from_history'] = [key for key in ('crops', 'pests', 'location') if resolved.get(key) != entities.get(key)]
+        return resolved if resolved['from_history'] else entities
+    
+    def turns(self, session_id: str) -> List[Dict[str, Any]]:
+        """Ходы сессии в читаемом виде (от старых к новым)"""
+        return [
+            {
+                'message_id': record.message_id,
+                'intent': self.intents[record.intent].value,
+                'crops': [self.entity_names[code] for code in record.crops],
+                'pests': [self.entity_names[code] for code in record.pests],
+                'location': self.entity_names[record.location] if record.location >= 0 else None
+            }
+            for record in self.get(session_id)
+        ]
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'sessions': len(self.sessions),
+            'turns': sum(len(buffer) for buffer in self.sessions.values()),
+            'max_turns': self.turns_per_session * self.max_sessions,
+            'hits': self.hits,
+            'hydrations': self.hydrations,
+            'evictions': self.evictions
+        }
+
+class AgroResponseGenerator:
+    WELCOME_MESSAGE = """🇰🇬 Ассалому алейкум! Я ваш агрономический помощник для Кыргызстана! 
 
 🌱 **Чем я могу вам помочь:**
 
@@ -566,6 +1205,67 @@ class AgroResponseGenerator:
 
 Спрашивайте - помогу с вашим вопросом! 😊"""
 
+    def __init__(self, knowledge_base: AdvancedAgroKnowledgeBase, ml_service: AgroMLService,
+                 retriever: Optional[KnowledgeRetriever] = None):
+        self.kb = knowledge_base
+        self.ml = ml_service
+        self.retriever = retriever
+    
+    def answer_from_kb(self, user_message: str) -> Optional[str]:
+        """Ответ из найденных отрывков базы знаний, если совпадение достаточно сильное"""
+        if self.retriever is None or not user_message:
+            return None
+        
+        hits = self.retriever.search(user_message)
+        if not hits or hits[0][1] < KB_MIN_SCORE:
+            return None
+        
+        best_score = hits[0][1]
+        parts = [f"📚 {passage['title']}:\n{passage['text']}" for passage, score in hits[:2] if score >= best_score * 0.6]
+        return "\n\n".join(parts)
+    
+    def region_overview(self, location: str) -> str:
+        """Справка по области: климат, почвы, специализация, вода и рынки"""
+        region_info = self.kb.kyrgyzstan_regions[location]
+        return f"🌄 {location.capitalize()} область:\n" \
+               f"🌤️ Климат: {region_info['climate']}\n" \
+               f"🌱 Почвы: {region_info['soil']}\n" \
+               f"🎯 Специализация: {region_info['specialization']}\n" \
+               f"💧 Водные ресурсы: {region_info['water']}\n" \
+               f"🏪 Рынки сбыта: {region_info['markets']}"
+    
+    def static_texts(self) -> Dict[str, Dict[str, str]]:
+        """Неизменяемые тексты базы знаний (приветствие и справки по областям)"""
+        texts = {'welcome': {'text': self.WELCOME_MESSAGE}}
+        for location, region_info in self.kb.kyrgyzstan_regions.items():
+            texts[f'regions/{location}'] = {
+                'region': location,
+                'overview': self.region_overview(location),
+                'soil_details': region_info.get('soil_details', region_info['soil'])
+            }
+        return texts
+    
+    def generate_response(self, intent: Intent, entities: Dict, context: Dict, user_message: str = "") -> str:
+        """Умная генерация ответов на основе интента и сущностей"""
+        
+        crops = entities.get('crops', [])
+        symptoms = entities.get('symptoms', [])
+        pests = entities.get('pests', [])
+        location = entities.get('location')
+        message_lower = user_message.lower()
+        
+        if intent == Intent.GENERAL:
+            # Вопрос мимо правил: сначала ищем ответ в базе знаний
+            kb_answer = self.answer_from_kb(user_message)
+            if kb_answer:
+                context['conversation_stage'] = 'active'
+                return kb_answer
+            
+            if not crops:
+                # Детальное описание возможностей при первом приветствии
+                if context.get('conversation_stage') == 'greeting':
+                    welcome_message = self.WELCOME_MESSAGE
+
                     # Обновляем контекст чтобы больше не показывать полное описание
                     context['conversation_stage'] = 'active'
                     return welcome_message
@@ -588,13 +1288,7 @@ class AgroResponseGenerator:
                 return region_info.get('soil_details', f"🌱 Почвы {location.capitalize()} области:\n{region_info.get('soil', 'Информация уточняется')}")
             
             if location and location in self.kb.kyrgyzstan_regions:
-                region_info = self.kb.kyrgyzstan_regions[location]
-                return f"🌄 {location.capitalize()} область:\n" \
-                       f"🌤️ Климат: {region_info['climate']}\n" \
-                       f"🌱 Почвы: {region_info['soil']}\n" \
-                       f"🎯 Специализация: {region_info['specialization']}\n" \
-                       f"💧 Водные ресурсы: {region_info['water']}\n" \
-                       f"🏪 Рынки сбыта: {region_info['markets']}"
+                return self.region_overview(location)
             
             # УЛУЧШЕННАЯ обработка запросов о сортах
             if any(word in message_lower for word in ['сорт', 'сорта', 'местный сорт', 'какие сорта']):
@@ -766,7 +1460,8 @@ class AgroResponseGenerator:
                    "• Горные районы: прохладно, возможны заморозки летом"
         
         else:
-            return "Могу помочь с вопросами по сельскому хозяйству Кыргызстана. Уточните, что именно вас интересует."
+            return self.answer_from_kb(user_message) or \
+                "Могу помочь с вопросами по сельскому хозяйству Кыргызстана. Уточните, что именно вас интересует."
 
 # Остальной код остается без изменений (AdvancedAgroGPTService, AgroGPTApiHandler, run_server)
 # ... [Здесь должен быть остальной код из предыдущей версии] ...
@@ -776,14 +1471,18 @@ class AdvancedAgroGPTService:
         self.knowledge_base = AdvancedAgroKnowledgeBase()
         self.ml_service = AgroMLService()
         self.context_manager = AgroContextManager()
-        self.response_generator = AgroResponseGenerator(self.knowledge_base, self.ml_service)
+        self.normalizer = TokenNormalizer(AGRO_LEXICON)
+        self.retriever = KnowledgeRetriever(self.knowledge_base.passages(), self.retrieval_tokens)
+        self.response_generator = AgroResponseGenerator(self.knowledge_base, self.ml_service, self.retriever)
         self.database = AgroDatabase()
+        self.history = ConversationHistory(self.database)
+        self.intent_classifier = self._load_intent_classifier(INTENT_MODEL_PATH)
         
+        # Счетчики процесса; статистика по интентам и культурам хранится в агрегатах базы
         self.usage_stats = {
             'total_requests': 0,
-            'intents_count': {},
-            'common_crops': {},
-            'start_time': datetime.now().isoformat()
+            'start_time': datetime.now().isoformat(),
+            'intent_sources': {'model': 0, 'rules': 0}
         }
         
         logger.info("AgroGPT Service для Кыргызстана инициализирован")
@@ -791,47 +1490,9 @@ class AdvancedAgroGPTService:
     async def process_message(self, user_message: str, session_id: str = None, user_id: str = None) -> Dict[str, Any]:
         """Асинхронная обработка сообщения пользователя"""
         try:
-            self.usage_stats['total_requests'] += 1
-            
-            if session_id is None:
-                session_id = "default"
-            session_id = str(session_id)
-            
-            # Получаем контекст ДО анализа интента
-            context = self.context_manager.get_context(session_id)
-            
-            intent = await self._analyze_intent_advanced(user_message)
-            entities = await self._extract_entities_advanced(user_message)
-            
-            # Если это первое сообщение "привет" или подобное, устанавливаем стадию greeting
-            if intent == Intent.GENERAL and not any(word in user_message.lower() for word in ['регион', 'культур', 'удобрени', 'полив']):
-                if context.get('conversation_stage') != 'active':
-                    context['conversation_stage'] = 'greeting'
-            
-            self._update_context(session_id, intent, entities, context)
-            
-            response = self.response_generator.generate_response(intent, entities, context, user_message)
-            
-            self.database.save_message(
-                session_id=session_id,
-                user_message=user_message,
-                bot_response=response,
-                intent=intent.value,
-                entities=entities
-            )
-            
-            self._update_stats(intent, entities)
-            
-            safe_context = self._make_context_json_safe(context)
-            
-            return {
-                'response': response,
-                'intent': intent.value,
-                'entities': entities,
-                'context': safe_context,
-                'session_id': session_id,
-                'timestamp': datetime.now().isoformat()
-            }
+            turn = await self.prepare_turn(user_message, session_id)
+            response, context_updates = await self.generate_answer(turn)
+            return await asyncio.to_thread(self.finish_turn, turn, response, context_updates)
             
         except Exception as e:
             logger.error(f"Ошибка обработки сообщения: {e}", exc_info=True)
@@ -841,10 +1502,121 @@ class AdvancedAgroGPTService:
                 'session_id': session_id
             }
     
-    async def _analyze_intent_advanced(self, message: str) -> Intent:
-        """Продвинутый анализ намерения"""
-        message_lower = message.lower().strip()
+    async def prepare_turn(self, user_message: str, session_id: str = None) -> ChatTurn:
+        """Интент, сущности и контекст сессии - все, от чего зависит ответ"""
+        self.usage_stats['total_requests'] += 1
+        
+        if session_id is None:
+            session_id = "default"
+        session_id = str(session_id)
+        
+        # Получаем контекст ДО анализа интента
+        context = self.context_manager.get_context(session_id)
+        
+        intent, intent_source, intent_confidence = await self._analyze_intent_advanced(user_message)
+        entities = await self._extract_entities_advanced(user_message)
+        
+        # Если это первое сообщение "привет" или подобное, устанавливаем стадию greeting
+        if intent == Intent.GENERAL and not any(word in user_message.lower() for word in ['регион', 'культур', 'удобрени', 'полив']):
+            if context.get('conversation_stage') != 'active':
+                context['conversation_stage'] = 'greeting'
+        
+        self._update_context(session_id, intent, entities, context)
+        
+        # Уточняющие вопросы опираются на историю сессии; в базу пишутся сущности самого сообщения.
+        # При промахе история читается из партиций, поэтому - в потоке, не в event loop
+        response_entities = await asyncio.to_thread(self.history.resolve_followup, session_id, intent, entities)
+        return ChatTurn(session_id, user_message, intent, entities, response_entities, context,
+                        intent_source, intent_confidence)
+    
+    @staticmethod
+    def answer_context(turn: ChatTurn) -> Dict[str, Any]:
+        """
+        Контекст сессии, меняющий ответ на тот же текст: сущности из истории
+        и стадия разговора для приветствий. Остальное ответ берет из самого сообщения
+        """
+        answer_context = {name: turn.response_entities[name] for name in turn.response_entities.get('from_history', [])}
+        if turn.intent == Intent.GENERAL:
+            answer_context['conversation_stage'] = turn.context.get('conversation_stage')
+        return answer_context
+    
+    async def generate_answer(self, turn: ChatTurn) -> Tuple[str, Dict[str, Any]]:
+        """
+        Ответ на разобранное сообщение. Генератор работает с копией контекста,
+        изменения возвращаются отдельно: один ответ может достаться нескольким сессиям
+        """
+        context = dict(turn.context)
+        response = self.response_generator.generate_response(turn.intent, turn.response_entities, context, turn.user_message)
+        return response, {key: value for key, value in context.items() if turn.context.get(key) != value}
+    
+    def finish_turn(self, turn: ChatTurn, response: str, context_updates: Dict[str, Any]) -> Dict[str, Any]:
+        """Запись хода в контекст, базу и историю своей сессии (блокирует: вызывать из потока)"""
+        turn.context.update(context_updates)
+        
+        message_id = self.database.save_message(
+            session_id=turn.session_id,
+            user_message=turn.user_message,
+            bot_response=response,
+            intent=turn.intent.value,
+            entities=turn.entities,
+            intent_source=turn.intent_source,
+            intent_confidence=turn.intent_confidence
+        )
+        self.history.append(turn.session_id, message_id, turn.intent, turn.entities)
+        
+        safe_context = self._make_context_json_safe(turn.context)
+        
+        return {
+            'response': response,
+            'intent': turn.intent.value,
+            'entities': turn.response_entities,
+            'context': safe_context,
+            'session_id': turn.session_id,
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    def retrieval_tokens(self, text: str) -> List[str]:
+        """Термины для BM25: сущности приводятся к канонической форме, остальные слова - к основе"""
+        terms = []
+        for token in self.normalizer.tokenize(text):
+            if len(token) <= 2 or token in STOPWORDS:
+                continue
+            entity = self.normalizer.lookup(token)
+            words = entity[1].split() if entity else [token]
+            terms.extend(stem(word) for word in words)
+        return terms
+    
+    @staticmethod
+    def _load_intent_classifier(path: str) -> Optional[IntentClassifier]:
+        if not os.path.exists(path):
+            logger.info("Модель интентов не найдена, используются правила")
+            return None
+        try:
+            classifier = IntentClassifier.load(path)
+            unknown = set(classifier.labels) - {intent.value for intent in Intent}
+            if unknown:
+                raise ValueError(f"неизвестные интенты {sorted(unknown)}")
+            logger.info(f"Модель интентов загружена: {path}")
+            return classifier
+        except Exception as e:
+            logger.error(f"Ошибка загрузки модели интентов: {e}")
+            return None
+    
+    async def _analyze_intent_advanced(self, message: str) -> Tuple[Intent, str, Optional[float]]:
+        """Продвинутый анализ намерения: (интент, источник 'model'/'rules', уверенность модели)"""
+        # К тексту дописываются канонические формы: "паливать" и "suguruu" дают "полив"
+        message_lower = self.normalizer.canonical_text(message)
         
+        if self.intent_classifier is not None:
+            label, confidence = self.intent_classifier.predict(message_lower)
+            if confidence >= INTENT_MIN_CONFIDENCE:
+                self.usage_stats['intent_sources']['model'] += 1
+                return Intent(label), 'model', float(confidence)
+        self.usage_stats['intent_sources']['rules'] += 1
+        return self._rule_intent(message_lower), 'rules', None
+    
+    def _rule_intent(self, message_lower: str) -> Intent:
+        """Интент по ключевым словам (порядок правил важен)"""
         # УЛУЧШЕННОЕ распознавание регионов - даже по коротким запросам
         if any(word in message_lower for word in ['чуй', 'бишкек', 'токмак', 'кара балта']):
             return Intent.KYRGYZSTAN_SPECIFIC
@@ -926,60 +1698,11 @@ class AdvancedAgroGPTService:
                 
             message_lower = message.lower()
             
-            # Регионы Кыргызстана
-            kyrgyz_regions = {
-                'чуйская': ['чуйск', 'чуйской', 'бишкек', 'токмак', 'кара балта', 'чуй'],
-                'иссык-кульская': ['иссык куль', 'иссыккуль', 'каракол', 'чолпон ата', 'балыкчы'],
-                'ошская': ['ошск', 'ошской', 'ош', 'узген', 'кара суу'],
-                'джалал-абадская': ['джалал абад', 'джалалабад', 'майлуу суу', 'кок жангак'],
-                'нарынская': ['нарынск', 'нарынской', 'нарын', 'ат башы', 'кочкор'],
-                'таласская': ['таласск', 'таласской', 'талас', 'кара буура', 'манас'],
-                'баткенская': ['баткенск', 'баткенской', 'баткен', 'исфана', 'кызыл кия']
-            }
-            
-            for region_name, patterns in kyrgyz_regions.items():
-                if any(pattern in message_lower for pattern in patterns):
-                    entities['location'] = region_name
-                    break
-            
-            crop_patterns = {
-                'томат': ['томат', 'помидор', 'помидоры', 'томаты'],
-                'картофель': ['картофел', 'картошк', 'картофели', 'картофеля'],
-                'огурец': ['огурец', 'огурц', 'огурцы', 'огурцов'],
-                'капуста': ['капуст', 'капусту', 'капустой'],
-                'морковь': ['морков', 'морковь', 'моркови', 'морковку'],
-                'перец': ['перец', 'перца', 'перцы'],
-                'баклажан': ['баклажан', 'баклажаны', 'баклажанов', 'синенькие'],
-                'лук': ['лук', 'лука', 'луком'],
-                'чеснок': ['чеснок', 'чеснока', 'чеснок'],
-                'редис': ['редис', 'редиска', 'редиски'],
-                'клубника': ['клубник', 'земляник', 'виктори'],
-                'малина': ['малин', 'малины', 'малину'],
-                'смородина': ['смородин', 'смородина', 'смородины'],
-                'виноград': ['виноград', 'винограда', 'виноградом'],
-                'яблоня': ['яблон', 'яблони', 'яблок', 'апорт'],
-                'груша': ['груш', 'груши', 'грушу'],
-                'абрикос': ['абрикос', 'абрикосы', 'урюк'],
-                'пшеница': ['пшениц', 'пшеницы', 'пшеницу']
-            }
-            
-            for crop_name, patterns in crop_patterns.items():
-                if any(pattern in message_lower for pattern in patterns):
-                    if crop_name not in entities['crops']:
-                        entities['crops'].append(crop_name)
-            
-            pest_patterns = {
-                'тля': ['тля', 'тли', 'тлю'],
-                'клещ': ['клещ', 'клещи', 'паутинный'],
-                'гусеницы': ['гусениц', 'гусеницы', 'листовертк'],
-                'слизни': ['слизн', 'слизняк', 'слизней'],
-                'мухи': ['мух', 'мухи', 'морковная мух', 'луковая мух'],
-                'колорадский жук': ['колорадск', 'колорадский', 'колорады']
-            }
-            
-            for pest_name, patterns in pest_patterns.items():
-                if any(pattern in message_lower for pattern in patterns):
-                    entities['pests'].append(pest_name)
+            # Регионы, культуры и вредители - по нормализованным токенам (словоформы, опечатки, транслит)
+            found = self.normalizer.entities(message)
+            entities['location'] = (found.get('region') or [None])[0]
+            entities['crops'] = found.get('crop', [])
+            entities['pests'] = found.get('pest', [])
             
             symptom_patterns = [
                 'желте', 'сохнет', 'пятн', 'гнил', 'увяда', 'плесень', 
@@ -1058,16 +1781,14 @@ class AdvancedAgroGPTService:
         
         self.context_manager.update_context(session_id, updates)
     
-    def _update_stats(self, intent: Intent, entities: Dict):
-        """Обновление статистики"""
-        intent_str = intent.value
-        self.usage_stats['intents_count'][intent_str] = self.usage_stats['intents_count'].get(intent_str, 0) + 1
-        
-        for crop in entities['crops']:
-            self.usage_stats['common_crops'][crop] = self.usage_stats['common_crops'].get(crop, 0) + 1
-    
     def get_usage_statistics(self) -> Dict:
-        return self.usage_stats
+        return {
+            **self.usage_stats,
+            'intents_count': self.database.get_intent_counts(),
+            'common_crops': self.database.get_crop_counts(),
+            'history': self.history.stats(),
+            'intent_model': self.intent_classifier.info() if self.intent_classifier is not None else None
+        }
     
     def get_session_context(self, session_id: str) -> Dict:
         context = self.context_manager.get_context(session_id)
@@ -0,0 +1,481 @@
+import os
+import gzip
+import time
+import fcntl
+import shutil
+import sqlite3
+import asyncio
+import threading
+import logging
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Каталоги месячных партиций журнала чата и архивов (по умолчанию <база>_partitions и <база>_archive)
+CHAT_PARTITIONS_DIR = os.getenv("CHAT_PARTITIONS_DIR")
+CHAT_ARCHIVE_DIR = os.getenv("CHAT_ARCHIVE_DIR")
+
+# Сколько месяцев партиции остаются доступными для запросов (0 - хранить все)
+CHAT_RETENTION_MONTHS = int(os.getenv("CHAT_RETENTION_MONTHS", "12"))
+
+# Период фонового обслуживания и простой партиции перед VACUUM (секунды)
+CHAT_MAINTENANCE_INTERVAL = int(os.getenv("CHAT_MAINTENANCE_INTERVAL", "3600"))
+CHAT_PARTITION_IDLE_SECONDS = int(os.getenv("CHAT_PARTITION_IDLE_SECONDS", "3600"))
+
+PARTITION_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS messages (
+        message_id INTEGER PRIMARY KEY,
+        session_id TEXT,
+        user_message TEXT,
+        bot_response TEXT,
+        intent TEXT,
+        entities TEXT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        intent_source TEXT,
+        intent_confidence REAL
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, message_id)',
+    'CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages (timestamp)',
+]
+
+# Столбцы, добавленные после первых партиций: в старые файлы дописываются при старте
+PARTITION_ADDED_COLUMNS = [('intent_source', 'TEXT'), ('intent_confidence', 'REAL')]
+
+FULLTEXT_SCHEMA = [
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+        user_message,
+        bot_response,
+        content='messages',
+        content_rowid='message_id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts (rowid, user_message, bot_response)
+        VALUES (new.message_id, new.user_message, new.bot_response);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+        INSERT INTO messages_fts (messages_fts, rowid, user_message, bot_response)
+        VALUES ('delete', old.message_id, old.user_message, old.bot_response);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE ON messages BEGIN
+        INSERT INTO messages_fts (messages_fts, rowid, user_message, bot_response)
+        VALUES ('delete', old.message_id, old.user_message, old.bot_response);
+        INSERT INTO messages_fts (rowid, user_message, bot_response)
+        VALUES (new.message_id, new.user_message, new.bot_response);
+    END
+    ''',
+]
+
+def current_month() -> str:
+    """Месяц партиции для новых сообщений (UTC, как CURRENT_TIMESTAMP в SQLite)"""
+    return datetime.now(timezone.utc).strftime('%Y-%m')
+
+def shift_month(month: str, months: int) -> str:
+    year, number = map(int, month.split('-'))
+    index = year * 12 + number - 1 + months
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+class MessagePartitions:
+    """
+    Журнал сообщений по месячным файлам SQLite. Каталог партиций (месяц,
+    файл, диапазон message_id, число строк, статус) хранится в основной базе;
+    message_id сквозной и растет со временем, поэтому диапазоны партиций
+    не пересекаются и запросы идут от новых партиций к старым
+    """
+    
+    def __init__(self, db_path: str, partitions_dir: Optional[str] = CHAT_PARTITIONS_DIR,
+                 archive_dir: Optional[str] = CHAT_ARCHIVE_DIR):
+        base_name = os.path.splitext(os.path.abspath(db_path))[0]
+        self.db_path = db_path
+        self.partitions_dir = partitions_dir or f"{base_name}_partitions"
+        self.archive_dir = archive_dir or f"{base_name}_archive"
+        self.fts_enabled = self._fts_available()
+        self._initialized: set = set()
+        self._local = threading.local()
+        
+        # Соединения SQLite нельзя переносить через fork: воркер открывает свои
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_readers)
+    
+    def _reset_readers(self):
+        self._local = threading.local()
+    
+    @staticmethod
+    def _fts_available() -> bool:
+        try:
+            with sqlite3.connect(':memory:') as conn:
+                conn.execute('CREATE VIRTUAL TABLE probe USING fts5(text)')
+            return True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"FTS5 недоступен, поиск по сообщениям отключен: {e}")
+            return False
+    
+    def init_catalog(self, conn: sqlite3.Connection):
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS message_partitions (
+                month TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                min_message_id INTEGER,
+                max_message_id INTEGER,
+                rows INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'active',
+                last_write_at TIMESTAMP,
+                compacted_at TIMESTAMP,
+                archive_path TEXT
+            )
+        ''')
+    
+    def upgrade_partitions(self, conn: sqlite3.Connection):
+        """Недостающие столбцы в существующих партициях (PARTITION_ADDED_COLUMNS)"""
+        rows = conn.execute("SELECT month, path FROM message_partitions WHERE status = 'active'").fetchall()
+        for month, path in rows:
+            if not os.path.exists(path):
+                continue
+            with sqlite3.connect(path) as partition:
+                existing = {row[1] for row in partition.execute('PRAGMA table_info(messages)')}
+                for name, column_type in PARTITION_ADDED_COLUMNS:
+                    if existing and name not in existing:
+                        partition.execute(f'ALTER TABLE messages ADD COLUMN {name} {column_type}')
+                        logger.info(f"Партиция {month}: добавлен столбец {name}")
+    
+    def path_for(self, month: str) -> str:
+        return os.path.join(self.partitions_dir, f"messages_{month.replace('-', '_')}.db")
+    
+    def ensure(self, conn: sqlite3.Connection, month: str) -> str:
+        """Файл партиции месяца со схемой и запись в каталоге"""
+        path = self.path_for(month)
+        if month not in self._initialized or not os.path.exists(path):
+            os.makedirs(self.partitions_dir, exist_ok=True)
+            with sqlite3.connect(path) as partition:
+                for statement in PARTITION_SCHEMA + (FULLTEXT_SCHEMA if self.fts_enabled else []):
+                    partition.execute(statement)
+            conn.execute(
+                'INSERT OR IGNORE INTO message_partitions (month, path) VALUES (?, ?)', (month, path)
+            )
+            self._initialized.add(month)
+        return path
+    
+    def next_message_id(self, conn: sqlite3.Connection) -> int:
+        """Сквозной message_id; вызывается внутри пишущей транзакции основной базы"""
+        return conn.execute(
+            'SELECT COALESCE(MAX(max_message_id), 0) + 1 FROM message_partitions'
+        ).fetchone()[0]
+    
+    def record_write(self, conn: sqlite3.Connection, month: str, first_id: int, last_id: int, rows: int):
+        conn.execute('''
+            UPDATE message_partitions
+            SET rows = rows + ?,
+                min_message_id = COALESCE(MIN(min_message_id, ?), ?),
+                max_message_id = MAX(COALESCE(max_message_id, 0), ?),
+                last_write_at = CURRENT_TIMESTAMP
+            WHERE month = ?
+        ''', (rows, first_id, first_id, last_id, month))
+    
+    def active(self, before_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Доступные для чтения партиции от новых к старым"""
+        query = '''
+            SELECT month, path, min_message_id, max_message_id FROM message_partitions
+            WHERE status = 'active' AND rows > 0
+        '''
+        params: List[Any] = []
+        if before_id is not None:
+            query += ' AND min_message_id < ?'
+            params.append(before_id)
+        query += ' ORDER BY max_message_id DESC'
+        
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            return [dict(row) for row in conn.execute(query, params)]
+    
+    def _reader(self, path: str) -> sqlite3.Connection:
+        """Соединение только для чтения, кэшируемое в потоке (открытие файла дороже запроса по индексу)"""
+        readers = getattr(self._local, 'readers', None)
+        if readers is None:
+            readers = self._local.readers = {}
+        
+        conn = readers.get(path)
+        if conn is None:
+            # mode=ro: партиция, ушедшая в архив во время запроса, не создается заново
+            conn = readers[path] = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        return conn
+    
+    def _drop_readers(self, active_paths: set):
+        readers = getattr(self._local, 'readers', {})
+        for path in [path for path in readers if path not in active_paths]:
+            readers.pop(path).close()
+    
+    def query(self, sql: str, params: List[Any], limit: Optional[int], before_id: Optional[int] = None,
+              row_factory: Optional[Callable] = None) -> List[Any]:
+        """
+        Запрос ко всем партициям от новых к старым; первый столбец результата -
+        message_id, строки каждой партиции отсортированы по нему по убыванию.
+        Обход останавливается, как только следующая партиция не может дать
+        строк новее уже собранных limit
+        """
+        partitions = self.active(before_id)
+        if before_id is None:
+            self._drop_readers({partition['path'] for partition in partitions})
+        
+        rows: List[Any] = []
+        for partition in partitions:
+            if limit is not None and len(rows) >= limit and partition['max_message_id'] < rows[limit - 1][0]:
+                break
+            
+            try:
+                conn = self._reader(partition['path'])
+                conn.row_factory = row_factory
+                rows.extend(conn.execute(
+                    sql + (' LIMIT ?' if limit is not None else ''),
+                    params + ([limit] if limit is not None else [])
+                ).fetchall())
+            except sqlite3.OperationalError as e:
+                logger.warning(f"Партиция {partition['month']} недоступна: {e}")
+                self._drop_readers(set())
+                continue
+            
+            rows.sort(key=lambda row: row[0], reverse=True)
+        
+        return rows if limit is None else rows[:limit]
+    
+    def iter_chunks(self, columns: str, chunk_size: int, where: str = '', params: Sequence[Any] = (),
+                    first_month: Optional[str] = None, last_month: Optional[str] = None) -> Iterator[List[tuple]]:
+        """
+        Куски строк messages от старых партиций к новым с keyset по message_id
+        (первый столбец columns). Каждый кусок - отдельный запрос, поэтому
+        память не зависит от размера журнала; архивные партиции не читаются
+        """
+        partitions = sorted(self.active(), key=lambda partition: partition['min_message_id'])
+        for partition in partitions:
+            if (first_month and partition['month'] < first_month) or (last_month and partition['month'] > last_month):
+                continue
+            
+            # Генератор может продолжаться в другом потоке пула, соединение свое
+            conn = sqlite3.connect(f"file:{partition['path']}?mode=ro", uri=True, check_same_thread=False)
+            try:
+                last_id = 0
+                while True:
+                    rows = conn.execute(
+                        f"SELECT {columns} FROM messages WHERE message_id > ? {where} ORDER BY message_id LIMIT ?",
+                        [last_id, *params, chunk_size]
+                    ).fetchall()
+                    if not rows:
+                        break
+                    yield rows
+                    last_id = rows[-1][0]
+                    if len(rows) < chunk_size:
+                        break
+            finally:
+                conn.close()
+    
+    def archive_expired(self, retention_months: int = CHAT_RETENTION_MONTHS) -> List[str]:
+        """Партиции старше срока хранения сжимаются в архив и удаляются из рабочего каталога"""
+        if retention_months <= 0:
+            return []
+        
+        cutoff = shift_month(current_month(), -retention_months)
+        with sqlite3.connect(self.db_path) as conn:
+            expired = conn.execute('''
+                SELECT month, path FROM message_partitions
+                WHERE status = 'active' AND month < ?
+                ORDER BY month
+            ''', (cutoff,)).fetchall()
+        
+        archived = []
+        for month, path in expired:
+            archive_path = os.path.join(self.archive_dir, f"{os.path.basename(path)}.gz")
+            if os.path.exists(path):
+                os.makedirs(self.archive_dir, exist_ok=True)
+                with open(path, 'rb') as source, gzip.open(f"{archive_path}.tmp", 'wb') as target:
+                    shutil.copyfileobj(source, target, 1024 * 1024)
+                os.replace(f"{archive_path}.tmp", archive_path)
+            
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute('''
+                    UPDATE message_partitions SET status = 'archived', archive_path = ?
+                    WHERE month = ?
+                ''', (archive_path, month))
+            
+            if os.path.exists(path):
+                os.remove(path)
+            self._initialized.discard(month)
+            archived.append(month)
+            logger.info(f"Партиция {month} перенесена в архив: {archive_path}")
+        
+        return archived
+    
+    def compact_idle(self, idle_seconds: int = CHAT_PARTITION_IDLE_SECONDS) -> List[str]:
+        """
+        ANALYZE, VACUUM и слияние сегментов FTS для закрытых месяцев без записей
+        дольше idle_seconds. Новые сообщения пишутся в партицию текущего месяца,
+        поэтому обслуживание старых файлов не блокирует вставки
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            candidates = conn.execute('''
+                SELECT month, path FROM message_partitions
+                WHERE status = 'active' AND month < ?
+                  AND (last_write_at IS NULL OR last_write_at <= datetime('now', ?))
+                  AND (compacted_at IS NULL OR compacted_at < last_write_at)
+                ORDER BY month
+            ''', (current_month(), f'-{idle_seconds} seconds')).fetchall()
+        
+        compacted = []
+        for month, path in candidates:
+            if not os.path.exists(path):
+                continue
+            
+            start = time.perf_counter()
+            size_before = os.path.getsize(path)
+            with sqlite3.connect(path) as partition:
+                partition.execute('ANALYZE')
+                if self.fts_enabled:
+                    partition.execute("INSERT INTO messages_fts (messages_fts) VALUES ('optimize')")
+                partition.commit()
+                partition.execute('VACUUM')
+            
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute(
+                    'UPDATE message_partitions SET compacted_at = CURRENT_TIMESTAMP WHERE month = ?', (month,)
+                )
+            compacted.append(month)
+            logger.info(f"Партиция {month} сжата за {time.perf_counter() - start:.1f} с: "
+                        f"{size_before / 1024 / 1024:.1f} → {os.path.getsize(path) / 1024 / 1024:.1f} МБ")
+        
+        return compacted
+    
+    def stats(self) -> List[Dict[str, Any]]:
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            partitions = [dict(row) for row in conn.execute('SELECT * FROM message_partitions ORDER BY month')]
+        
+        for partition in partitions:
+            path = partition['archive_path'] if partition['status'] == 'archived' else partition['path']
+            partition['size_bytes'] = os.path.getsize(path) if path and os.path.exists(path) else 0
+        return partitions
+
+class ChatLogReader:
+    """
+    Выгрузка журналов основной базы чата кусками: сообщения из партиций и
+    прогнозы урожайности. Только чтение и без сервиса чата, поэтому воркер
+    выгрузки не создает на своем узле ни базы, ни каталогов
+    """
+    
+    def __init__(self, db_path: str, partitions: MessagePartitions):
+        self.db_path = db_path
+        self.partitions = partitions
+    
+    @classmethod
+    def open(cls, db_path: str, partitions_dir: Optional[str] = None) -> 'ChatLogReader':
+        """Читатель существующей базы: отсутствие файла - ошибка, а не пустая выгрузка"""
+        if not os.path.isfile(db_path):
+            raise FileNotFoundError(f"База чата {db_path} недоступна на этом узле")
+        return cls(db_path, MessagePartitions(db_path, partitions_dir))
+    
+    def iter_messages(self, chunk_size: int, since: Optional[str] = None,
+                      until: Optional[str] = None) -> Iterator[List[tuple]]:
+        where, params = self._period_filter('timestamp', since, until)
+        return self.partitions.iter_chunks(
+            'message_id, session_id, user_message, bot_response, intent, entities, timestamp',
+            chunk_size, where, params,
+            first_month=since[:7] if since else None,
+            last_month=until[:7] if until else None
+        )
+    
+    def iter_predictions(self, chunk_size: int, since: Optional[str] = None,
+                         until: Optional[str] = None) -> Iterator[List[tuple]]:
+        where, params = self._period_filter('created_at', since, until)
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+        try:
+            last_id = 0
+            while True:
+                rows = conn.execute(f'''
+                    SELECT prediction_id, created_at, crop_type, soil_quality, rainfall, temperature, area,
+                           fertilizer_used, predicted_yield, lower, upper, confidence, model_version
+                    FROM yield_predictions
+                    WHERE prediction_id > ? {where}
+                    ORDER BY prediction_id LIMIT ?
+                ''', [last_id, *params, chunk_size]).fetchall()
+                if not rows:
+                    break
+                yield [row[:7] + (bool(row[7]),) + row[8:] for row in rows]
+                last_id = rows[-1][0]
+                if len(rows) < chunk_size:
+                    break
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def _period_filter(column: str, since: Optional[str], until: Optional[str]) -> Tuple[str, List[Any]]:
+        where, params = '', []
+        if since:
+            where += f' AND {column} >= ?'
+            params.append(since)
+        if until:
+            where += f' AND {column} < ?'
+            params.append(until)
+        return where, params
+
+class ChatLogMaintainer:
+    """
+    Фоновое обслуживание журнала чата: архивирование партиций старше срока
+    хранения и сжатие простаивающих. Работу выполняет один воркер
+    (под файловой блокировкой), в потоке, не занимая event loop
+    """
+    
+    def __init__(self, partitions: MessagePartitions, interval: int = CHAT_MAINTENANCE_INTERVAL,
+                 retention_months: int = CHAT_RETENTION_MONTHS, idle_seconds: int = CHAT_PARTITION_IDLE_SECONDS):
+        self.partitions = partitions
+        self.interval = interval
+        self.retention_months = retention_months
+        self.idle_seconds = idle_seconds
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        """Запуск фонового цикла в текущем event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Обслуживание журнала чата запущено (каждые {self.interval} с)")
+    
+    async def stop(self):
+        """Остановка фонового цикла"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.maintain_once()
+            except Exception as e:
+                logger.error(f"Ошибка обслуживания журнала чата: {str(e)}")
+    
+    async def maintain_once(self) -> Dict[str, List[str]]:
+        return await asyncio.to_thread(self._maintain_locked)
+    
+    def _maintain_locked(self) -> Dict[str, List[str]]:
+        os.makedirs(self.partitions.partitions_dir, exist_ok=True)
+        with open(os.path.join(self.partitions.partitions_dir, '.maintenance.lock'), 'w') as lock_file:
+            # Остальные воркеры пропускают цикл
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return {'archived': [], 'compacted': []}
+            
+            return {
+                'archived': self.partitions.archive_expired(self.retention_months),
+                'compacted': self.partitions.compact_idle(self.idle_seconds)
+            }
@@ -0,0 +1,289 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Файл очереди задач; может лежать на сетевой ФС, общей для нескольких узлов
+JOB_QUEUE_DB = os.getenv("JOB_QUEUE_DB", "jobs.db")
+
+# Каталог входных файлов и результатов задач (по умолчанию <база>_files рядом с очередью)
+JOB_FILES_DIR = os.getenv("JOB_FILES_DIR")
+
+# Аренда задачи воркером (секунды): без продления задача возвращается в очередь
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "60"))
+
+# Сколько раз задача выдается заново после потери воркера
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+# Завершенные задачи и их файлы хранятся столько дней
+JOB_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", "7"))
+
+# Ожидание блокировки файла базы другими процессами и узлами (секунды)
+JOB_BUSY_TIMEOUT = float(os.getenv("JOB_BUSY_TIMEOUT", "30"))
+
+JOB_STATUSES = ('queued', 'running', 'succeeded', 'failed', 'cancelled')
+FINISHED_STATUSES = ('succeeded', 'failed', 'cancelled')
+
+JOBS_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS jobs (
+        job_id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        params TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'queued',
+        priority INTEGER NOT NULL DEFAULT 0,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL,
+        progress REAL NOT NULL DEFAULT 0,
+        progress_message TEXT,
+        result TEXT,
+        error TEXT,
+        worker_id TEXT,
+        lease_expires_at REAL,
+        cancel_requested INTEGER NOT NULL DEFAULT 0,
+        created_at REAL NOT NULL,
+        started_at REAL,
+        finished_at REAL,
+        updated_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs(status, priority DESC, created_at);
+    CREATE INDEX IF NOT EXISTS idx_jobs_lease ON jobs(status, lease_expires_at);
+'''
+
+class JobQueue:
+    """
+    Очередь фоновых задач в SQLite с арендой: воркер забирает задачу в
+    транзакции BEGIN IMMEDIATE и продлевает аренду, пока выполняет ее.
+    Задача воркера, пропавшего вместе с узлом, после истечения аренды снова
+    выдается другому. Журнал в режиме DELETE, а не WAL: WAL требует общей
+    памяти и не работает на сетевой ФС; транзакции короткие
+    """
+    
+    def __init__(self, db_path: str = JOB_QUEUE_DB, files_dir: Optional[str] = JOB_FILES_DIR):
+        self.db_path = db_path
+        self.files_dir = files_dir or f"{os.path.splitext(os.path.abspath(db_path))[0]}_files"
+        self._init_database()
+    
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=JOB_BUSY_TIMEOUT, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+    
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+    
+    def _init_database(self):
+        try:
+            with self._connect() as conn:
+                conn.execute('PRAGMA journal_mode=DELETE')
+                conn.executescript(JOBS_SCHEMA)
+            os.makedirs(self.files_dir, exist_ok=True)
+        except Exception as e:
+            raise Exception(f"Job queue init error: {str(e)}")
+    
+    def job_dir(self, job_id: str) -> str:
+        """Каталог файлов задачи (входные изображения, результат выгрузки)"""
+        return os.path.join(self.files_dir, job_id)
+    
+    @staticmethod
+    def new_job_id() -> str:
+        return uuid.uuid4().hex
+    
+    def submit(self, kind: str, params: Dict[str, Any], priority: int = 0,
+               max_attempts: int = JOB_MAX_ATTEMPTS, job_id: Optional[str] = None) -> str:
+        job_id = job_id or self.new_job_id()
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute('''
+                INSERT INTO jobs (job_id, kind, params, priority, max_attempts, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (job_id, kind, json.dumps(params, ensure_ascii=False), priority, max_attempts, now, now))
+        logger.info(f"Задача {job_id} ({kind}) поставлена в очередь")
+        return job_id
+    
+    def claim(self, worker_id: str, kinds: Optional[List[str]] = None,
+              lease_seconds: int = JOB_LEASE_SECONDS) -> Optional[Dict[str, Any]]:
+        """Аренда следующей задачи (по приоритету, затем по времени постановки) или None"""
+        now = time.time()
+        with self._transaction() as conn:
+            self._expire_leases(conn, now)
+            
+            kind_filter = f"AND kind IN ({', '.join('?' * len(kinds))})" if kinds else ''
+            row = conn.execute(f'''
+                SELECT job_id FROM jobs
+                WHERE status = 'queued' {kind_filter}
+                ORDER BY priority DESC, created_at
+                LIMIT 1
+            ''', list(kinds or [])).fetchone()
+            if row is None:
+                return None
+            
+            conn.execute('''
+                UPDATE jobs
+                SET status = 'running', worker_id = ?, lease_expires_at = ?, attempts = attempts + 1,
+                    started_at = COALESCE(started_at, ?), updated_at = ?
+                WHERE job_id = ?
+            ''', (worker_id, now + lease_seconds, now, now, row['job_id']))
+            return self._row_to_job(conn.execute('SELECT * FROM jobs WHERE job_id = ?', (row['job_id'],)).fetchone(),
+                                    include_params=True)
+    
+    @staticmethod
+    def _expire_leases(conn: sqlite3.Connection, now: float):
+        """Задачи с истекшей арендой: снова в очередь, а после max_attempts попыток - ошибка"""
+        conn.execute('''
+            UPDATE jobs
+            SET status = CASE
+                    WHEN cancel_requested THEN 'cancelled'
+                    WHEN attempts >= max_attempts THEN 'failed'
+                    ELSE 'queued'
+                END,
+                error = CASE
+                    WHEN cancel_requested THEN error
+                    WHEN attempts >= max_attempts THEN 'Воркер не продлил аренду: попытки исчерпаны'
+                    ELSE error
+                END,
+                finished_at = CASE WHEN cancel_requested OR attempts >= max_attempts THEN ? ELSE NULL END,
+                worker_id = NULL, lease_expires_at = NULL, updated_at = ?
+            WHERE status = 'running' AND lease_expires_at < ?
+        ''', (now, now, now))
+    
+    def heartbeat(self, job_id: str, worker_id: str, progress: Optional[float] = None,
+                  message: Optional[str] = None, lease_seconds: int = JOB_LEASE_SECONDS) -> Optional[bool]:
+        """
+        Продление аренды и запись прогресса. None - аренда потеряна (задача
+        отдана другому воркеру), True - запрошена отмена, False - продолжать
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            updated = conn.execute('''
+                UPDATE jobs
+                SET lease_expires_at = ?, progress = COALESCE(?, progress),
+                    progress_message = COALESCE(?, progress_message), updated_at = ?
+                WHERE job_id = ? AND worker_id = ? AND status = 'running'
+            ''', (now + lease_seconds, progress, message, now, job_id, worker_id)).rowcount
+            if not updated:
+                return None
+            row = conn.execute('SELECT cancel_requested FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+            return bool(row['cancel_requested'])
+    
+    def finish(self, job_id: str, worker_id: str, status: str, result: Optional[Any] = None,
+               error: Optional[str] = None) -> bool:
+        """Завершение задачи воркером, который ее арендует; False, если аренда потеряна"""
+        now = time.time()
+        with self._transaction() as conn:
+            return conn.execute('''
+                UPDATE jobs
+                SET status = ?, result = ?, error = ?, progress = CASE WHEN ? = 'succeeded' THEN 1 ELSE progress END,
+                    progress_message = CASE WHEN ? = 'succeeded' THEN NULL ELSE progress_message END,
+                    finished_at = ?, updated_at = ?, lease_expires_at = NULL
+                WHERE job_id = ? AND worker_id = ? AND status = 'running'
+            ''', (status, json.dumps(result, ensure_ascii=False) if result is not None else None, error,
+                  status, status, now, now, job_id, worker_id)).rowcount > 0
+    
+    def cancel(self, job_id: str) -> Optional[str]:
+        """
+        Отмена: задача в очереди отменяется сразу, выполняющаяся - при следующем
+        продлении аренды. Возвращает статус задачи до отмены или None
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute('SELECT status FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+            if row is None:
+                return None
+            if row['status'] == 'queued':
+                conn.execute('''
+                    UPDATE jobs SET status = 'cancelled', finished_at = ?, updated_at = ? WHERE job_id = ?
+                ''', (now, now, job_id))
+            elif row['status'] == 'running':
+                conn.execute('UPDATE jobs SET cancel_requested = 1, updated_at = ? WHERE job_id = ?', (now, job_id))
+            return row['status']
+    
+    def get(self, job_id: str, include_result: bool = False) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute('SELECT * FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return self._row_to_job(row, include_result=include_result) if row else None
+    
+    def list_jobs(self, status: Optional[str] = None, kind: Optional[str] = None,
+                  limit: int = 50) -> List[Dict[str, Any]]:
+        where, params = [], []
+        if status:
+            where.append('status = ?')
+            params.append(status)
+        if kind:
+            where.append('kind = ?')
+            params.append(kind)
+        
+        with self._connect() as conn:
+            rows = conn.execute(f'''
+                SELECT * FROM jobs {'WHERE ' + ' AND '.join(where) if where else ''}
+                ORDER BY created_at DESC
+                LIMIT ?
+            ''', params + [limit]).fetchall()
+        return [self._row_to_job(row) for row in rows]
+    
+    def counts(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            rows = conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        counts = {status: 0 for status in JOB_STATUSES}
+        counts.update({status: count for status, count in rows})
+        return counts
+    
+    def purge(self, retention_days: int = JOB_RETENTION_DAYS) -> int:
+        """Удаление завершенных задач старше срока хранения вместе с их файлами"""
+        cutoff = time.time() - retention_days * 86400
+        with self._transaction() as conn:
+            job_ids = [row['job_id'] for row in conn.execute(f'''
+                SELECT job_id FROM jobs
+                WHERE status IN ({', '.join('?' * len(FINISHED_STATUSES))}) AND finished_at < ?
+            ''', list(FINISHED_STATUSES) + [cutoff]).fetchall()]
+            conn.executemany('DELETE FROM jobs WHERE job_id = ?', [(job_id,) for job_id in job_ids])
+        
+        for job_id in job_ids:
+            shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+        return len(job_ids)
+    
+    @staticmethod
+    def _timestamp(value: Optional[float]) -> Optional[str]:
+        return datetime.fromtimestamp(value).isoformat(timespec='seconds') if value else None
+    
+    def _row_to_job(self, row: sqlite3.Row, include_params: bool = False,
+                    include_result: bool = False) -> Dict[str, Any]:
+        job = {
+            'job_id': row['job_id'],
+            'kind': row['kind'],
+            'status': row['status'],
+            'priority': row['priority'],
+            'attempts': row['attempts'],
+            'progress': round(row['progress'], 3),
+            'progress_message': row['progress_message'],
+            'error': row['error'],
+            'worker_id': row['worker_id'],
+            'cancel_requested': bool(row['cancel_requested']),
+            'created_at': self._timestamp(row['created_at']),
+            'started_at': self._timestamp(row['started_at']),
+            'finished_at': self._timestamp(row['finished_at'])
+        }
+        if include_params:
+            job['params'] = json.loads(row['params'])
+        if include_result:
+            job['result'] = json.loads(row['result']) if row['result'] else None
+        return job
@@ -0,0 +1,257 @@
+import os
+import time
+import socket
+import logging
+import threading
+from typing import Dict, Any, Callable, List, Optional
+
+from app.services.job_queue import JOB_LEASE_SECONDS, JOB_RETENTION_DAYS, JobQueue
+
+logger = logging.getLogger(__name__)
+
+# Пауза между опросами пустой очереди (секунды)
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+
+# Период удаления старых завершенных задач воркером (секунды)
+JOB_PURGE_INTERVAL = 3600
+
+# Прогресс пишется в базу не чаще, чем раз в столько секунд
+PROGRESS_WRITE_INTERVAL = 1.0
+
+# Строк пакетного прогноза урожайности на один шаг прогресса
+YIELD_BATCH_CHUNK = 5000
+
+class JobCancelled(Exception):
+    """Отмена задачи запрошена через API"""
+
+class JobLeaseLost(Exception):
+    """Аренда истекла и задача отдана другому воркеру"""
+
+class JobContext:
+    """
+    Контекст выполняющейся задачи для обработчика: параметры, каталог файлов
+    и progress(). Аренду продлевает фоновый поток; progress() только
+    запоминает значение и прерывает обработчик при отмене или потере аренды
+    """
+    
+    def __init__(self, queue: JobQueue, job: Dict[str, Any], worker_id: str, lease_seconds: int):
+        self.queue = queue
+        self.job_id = job['job_id']
+        self.kind = job['kind']
+        self.params = job['params']
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.files_dir = queue.job_dir(self.job_id)
+        self.cancelled = False
+        self.lease_lost = False
+        self._progress: Optional[float] = None
+        self._message: Optional[str] = None
+        self._written_at = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._heartbeat = threading.Thread(target=self._renew_lease, name=f'job-lease-{self.job_id[:8]}', daemon=True)
+    
+    def progress(self, fraction: float, message: Optional[str] = None):
+        with self._lock:
+            self._progress = max(0.0, min(1.0, float(fraction)))
+            self._message = message
+            write = time.monotonic() - self._written_at >= PROGRESS_WRITE_INTERVAL
+        if write:
+            self._write()
+        self.check()
+    
+    def check(self):
+        if self.lease_lost:
+            raise JobLeaseLost(self.job_id)
+        if self.cancelled:
+            raise JobCancelled(self.job_id)
+    
+    def _write(self):
+        with self._lock:
+            progress, message = self._progress, self._message
+            self._written_at = time.monotonic()
+        state = self.queue.heartbeat(self.job_id, self.worker_id, progress, message, self.lease_seconds)
+        if state is None:
+            self.lease_lost = True
+        elif state:
+            self.cancelled = True
+    
+    def _renew_lease(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                self._write()
+            except Exception as e:
+                logger.error(f"Не удалось продлить аренду задачи {self.job_id}: {str(e)}")
+            if self.lease_lost:
+                return
+    
+    def __enter__(self):
+        self._heartbeat.start()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._heartbeat.join()
+
+# Сервисы создаются в процессе воркера при первой задаче своего типа
+_services: Dict[str, Any] = {}
+
+def _service(name: str):
+    if name not in _services:
+        if name == 'yield':
+            from app.services.yield_prediction import YieldPredictionService
+            _services[name] = YieldPredictionService()
+        elif name == 'plant':
+            from app.services.plant_analysis import PlantAnalysisService
+            _services[name] = PlantAnalysisService()
+    elif name == 'yield':
+        # Воркер живет долго: новые версии из манифеста (дообучение, переобучение)
+        # подхватываются перед задачей, иначе результаты расходятся с синхронными маршрутами
+        _services[name].model.reload_changed_models()
+    return _services[name]
+
+def run_yield_scenarios(context: JobContext) -> Dict[str, Any]:
+    params = dict(context.params)
+    params['ranges'] = {name: tuple(values) for name, values in params['ranges'].items()}
+    context.progress(0.0, "Расчет сетки сценариев")
+    return _service('yield').predict_scenarios(**params)
+
+def run_yield_batch(context: JobContext) -> Dict[str, Any]:
+    items, engine = context.params['items'], context.params.get('engine', 'forest')
+    predictions: List[Dict[str, Any]] = []
+    engines: Dict[str, str] = {}
+    start = time.perf_counter()
+    # Одна версия моделей на всю задачу
+    service = _service('yield')
+    for offset in range(0, len(items), YIELD_BATCH_CHUNK):
+        result = service.predict_batch(items[offset:offset + YIELD_BATCH_CHUNK], engine)
+        predictions.extend(result['predictions'])
+        engines.update(result['engines'])
+        context.progress(len(predictions) / len(items), f"Рассчитано {len(predictions)} из {len(items)} полей")
+    return {
+        'predictions': predictions,
+        'engines': engines,
+        'elapsed_ms': round((time.perf_counter() - start) * 1000, 2)
+    }
+
+def run_plant_analysis(context: JobContext) -> Dict[str, Any]:
+    files = context.params['files']
+    results = []
+    for index, entry in enumerate(files):
+        try:
+            with open(os.path.join(context.files_dir, entry['file']), 'rb') as f:
+                result = _service('plant').analyze_image_sync(f)
+            results.append({"image_index": index, "filename": entry.get('filename'), "status": "success",
+                            "result": result})
+        except Exception as e:
+            results.append({"image_index": index, "filename": entry.get('filename'), "status": "error",
+                            "error": str(e)})
+        context.progress((index + 1) / len(files), f"Проанализировано {index + 1} из {len(files)} изображений")
+    
+    return {
+        "results": results,
+        "summary": {
+            "total": len(files),
+            "successful": sum(1 for r in results if r["status"] == "success"),
+            "failed": sum(1 for r in results if r["status"] == "error")
+        }
+    }
+
+def run_export(context: JobContext) -> Dict[str, Any]:
+    from app.services.chat_partitions import ChatLogReader
+    from app.utils.parquet_export import (
+        EXPORT_CHUNK_SIZE, MESSAGES_SCHEMA, PREDICTIONS_SCHEMA, export_filename, export_parquet
+    )
+    
+    dataset, since, until = context.params['dataset'], context.params.get('since'), context.params.get('until')
+    # База чата - файл узла API: путь приходит в задаче, на узле без доступа к нему задача падает
+    if not context.params.get('database'):
+        raise ValueError("В задаче выгрузки не указан путь к базе чата")
+    reader = ChatLogReader.open(context.params['database'], context.params.get('partitions_dir'))
+    if dataset == 'messages':
+        schema, chunks = MESSAGES_SCHEMA, reader.iter_messages(EXPORT_CHUNK_SIZE, since, until)
+        total = sum(p['rows'] for p in reader.partitions.stats() if p['status'] == 'active')
+    else:
+        schema, chunks = PREDICTIONS_SCHEMA, reader.iter_predictions(EXPORT_CHUNK_SIZE, since, until)
+        total = None
+    
+    def reporting(chunks):
+        rows = 0
+        for chunk in chunks:
+            rows += len(chunk)
+            # Для журнала чата доля считается от всех активных сообщений (без фильтра периода)
+            context.progress(rows / total if total else 0.0, f"Выгружено {rows} строк")
+            yield chunk
+    
+    filename = export_filename(dataset, since, until)
+    os.makedirs(context.files_dir, exist_ok=True)
+    report = export_parquet(reporting(chunks), schema, os.path.join(context.files_dir, filename))
+    return {'file': filename, **report}
+
+JOB_HANDLERS: Dict[str, Callable[[JobContext], Any]] = {
+    'yield_scenarios': run_yield_scenarios,
+    'yield_batch': run_yield_batch,
+    'plant_analysis': run_plant_analysis,
+    'export': run_export,
+}
+
+class JobWorker:
+    """Цикл воркера: аренда задачи, выполнение обработчика, запись результата"""
+    
+    def __init__(self, queue: JobQueue, kinds: Optional[List[str]] = None,
+                 lease_seconds: int = JOB_LEASE_SECONDS, poll_interval: float = JOB_POLL_INTERVAL):
+        self.queue = queue
+        self.kinds = kinds or list(JOB_HANDLERS)
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        # Узел и процесс: по worker_id видно, где выполняется задача
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.completed = 0
+    
+    def run(self, stop_event: Optional[threading.Event] = None, max_jobs: Optional[int] = None):
+        logger.info(f"Воркер задач {self.worker_id} запущен: {', '.join(self.kinds)}")
+        next_purge = time.monotonic()
+        while not (stop_event and stop_event.is_set()):
+            if max_jobs is not None and self.completed >= max_jobs:
+                break
+            try:
+                if time.monotonic() >= next_purge:
+                    purged = self.queue.purge(JOB_RETENTION_DAYS)
+                    if purged:
+                        logger.info(f"Удалено завершенных задач: {purged}")
+                    next_purge = time.monotonic() + JOB_PURGE_INTERVAL
+                
+                job = self.queue.claim(self.worker_id, self.kinds, self.lease_seconds)
+            except Exception as e:
+                logger.error(f"Ошибка очереди задач: {str(e)}")
+                job = None
+            
+            if job is None:
+                if stop_event:
+                    stop_event.wait(self.poll_interval)
+                else:
+                    time.sleep(self.poll_interval)
+                continue
+            
+            self.execute(job)
+            self.completed += 1
+        logger.info(f"Воркер задач {self.worker_id} остановлен, выполнено задач: {self.completed}")
+    
+    def execute(self, job: Dict[str, Any]):
+        start = time.perf_counter()
+        context = JobContext(self.queue, job, self.worker_id, self.lease_seconds)
+        logger.info(f"Задача {job['job_id']} ({job['kind']}), попытка {job['attempts']}")
+        try:
+            with context:
+                result = JOB_HANDLERS[job['kind']](context)
+                context.check()
+            self.queue.finish(job['job_id'], self.worker_id, 'succeeded', result=result)
+            logger.info(f"Задача {job['job_id']} выполнена за {time.perf_counter() - start:.1f} с")
+        except JobCancelled:
+            self.queue.finish(job['job_id'], self.worker_id, 'cancelled', error="Отменена по запросу")
+            logger.info(f"Задача {job['job_id']} отменена")
+        except JobLeaseLost:
+            logger.warning(f"Аренда задачи {job['job_id']} потеряна, результат отброшен")
+        except Exception as e:
+            logger.error(f"Задача {job['job_id']} завершилась ошибкой: {str(e)}")
+            self.queue.finish(job['job_id'], self.worker_id, 'failed', error=str(e))
@@ -0,0 +1,95 @@
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Dict, Iterator
+
+import cv2
+import numpy as np
+
+from app.services.plant_analysis import PlantDiseaseClassifier
+from app.utils.image_processing import limit_cv_threads
+from app.utils.raster import RasterReader
+
+logger = logging.getLogger(__name__)
+
+# Размер фрагмента ортофотоплана в пикселях
+ORTHOMOSAIC_TILE_SIZE = int(os.getenv("ORTHOMOSAIC_TILE_SIZE", 512))
+
+# Потоки для анализа фрагментов (OpenCV и NumPy отпускают GIL)
+ORTHOMOSAIC_WORKERS = int(os.getenv("ORTHOMOSAIC_WORKERS", os.cpu_count() or 1))
+
+# Разрешение, до которого сжимается фрагмент перед извлечением признаков
+TILE_ANALYSIS_SIZE = (224, 224)
+
+class OrthomosaicAnalyzer:
+    """
+    Потоковый анализ ортофотоплана по фрагментам. Растр читается полосами
+    высотой в один фрагмент, поэтому память не зависит от высоты растра
+    """
+    
+    def __init__(self, classifier: PlantDiseaseClassifier, tile_size: int = ORTHOMOSAIC_TILE_SIZE,
+                 workers: int = ORTHOMOSAIC_WORKERS):
+        self.classifier = classifier
+        self.tile_size = tile_size
+        self.workers = workers
+        # Параллелизм по фрагментам дает пул; потоки OpenCV ограничены на весь процесс
+        limit_cv_threads()
+    
+    def analyze(self, file: BinaryIO, image_format: str) -> Iterator[Dict[str, Any]]:
+        """
+        Генератор событий: meta, затем строка тепловой карты на каждую
+        полосу фрагментов и итоговая сводка
+        """
+        start = time.perf_counter()
+        reader = RasterReader(file, image_format)
+        
+        try:
+            rows = -(-reader.height // self.tile_size)
+            cols = -(-reader.width // self.tile_size)
+            
+            yield {
+                'type': 'meta',
+                'width': reader.width,
+                'height': reader.height,
+                'tile_size': self.tile_size,
+                'rows': rows,
+                'cols': cols,
+                'read_mode': reader.mode,
+                'geo': reader.geo
+            }
+            
+            status_counts: Dict[str, int] = {}
+            health_sum = 0.0
+            
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for row in range(rows):
+                    band = reader.read_band(row * self.tile_size, self.tile_size)
+                    windows = [band[:, col * self.tile_size:(col + 1) * self.tile_size] for col in range(cols)]
+                    tiles = list(executor.map(self._assess_window, windows))
+                    
+                    for col, tile in enumerate(tiles):
+                        tile['col'] = col
+                        status_counts[tile['status']] = status_counts.get(tile['status'], 0) + 1
+                        health_sum += tile['health_score']
+                    
+                    yield {'type': 'row', 'row': row, 'tiles': tiles}
+            
+            elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+            logger.info(f"Ортофотоплан {reader.width}×{reader.height}: {rows * cols} фрагментов за {elapsed_ms} мс")
+            
+            yield {
+                'type': 'summary',
+                'tiles': rows * cols,
+                'mean_health': round(health_sum / max(rows * cols, 1), 4),
+                'status_counts': status_counts,
+                'elapsed_ms': elapsed_ms
+            }
+        
+        finally:
+            reader.close()
+    
+    def _assess_window(self, window: np.ndarray) -> Dict[str, Any]:
+        rgb = RasterReader.to_rgb(window)
+        resized = cv2.resize(rgb, TILE_ANALYSIS_SIZE, interpolation=cv2.INTER_AREA)
+        return self.classifier.assess_tile(resized)
@@ -3,10 +3,20 @@ import torch.nn as nn
 import numpy as np
 from PIL import Image
 import io
+import os
+import asyncio
 import cv2
-from typing import Dict, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
 import random
-from app.utils.image_processing import ImageProcessor
+from app.utils.image_processing import ImageProcessor, OpenCVImageProcessor, limit_cv_threads
+from app.utils.model_loader import ModelLoader, PLANT_MODEL_QUANTIZED
+
+# Движок обработки изображений: pil или opencv (декодирование в uint8, отпускает GIL)
+IMAGE_ENGINE = os.getenv("IMAGE_ENGINE", "pil")
+
+# Размер пула потоков для анализа изображений
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", os.cpu_count() or 1))
 
 class AdvancedPlantModel(nn.Module):
     def __init__(self, num_features: int = 34, num_classes: int = 5):
@@ -43,44 +53,83 @@ class PlantDiseaseClassifier:
             'nutrient_deficiency': "Обнаружен дефицит питательных веществ."
         }
         
-        # Имитация обученной модели
+        # Имитация обученной модели. В predict() она пока не вызывается: демо-логика
+        # работает на эвристиках по 8 признакам, а модель ждет 34, поэтому
+        # PLANT_MODEL_QUANTIZED влияет только на загрузку модели и проверку паритета
         self.model = self._create_dummy_model()
         
     def _create_dummy_model(self):
-        """Создание демо-модели"""
+        """Создание демо-модели (int8 артефакт при PLANT_MODEL_QUANTIZED; в инференсе не участвует)"""
+        if PLANT_MODEL_QUANTIZED:
+            return ModelLoader().load_plant_model(quantized=True)
         return AdvancedPlantModel()
     
-    def extract_advanced_features(self, image_array: np.ndarray) -> np.ndarray:
-        """Извлечение расширенных признаков"""
+    def extract_advanced_features(self, image_array: np.ndarray, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """Извлечение расширенных признаков (только по пикселям маски листьев, если она задана)"""
         features = []
         
         # Базовые цветовые признаки
-        hsv = cv2.cvtColor((image_array * 255).astype(np.uint8), cv2.COLOR_RGB2HSV)
+        image_u8 = ImageProcessor.to_uint8(image_array)
+        hsv = cv2.cvtColor(image_u8, cv2.COLOR_RGB2HSV)
         
         # Признаки из HSV пространства
-        features.extend(np.mean(hsv, axis=(0, 1)))
-        features.extend(np.std(hsv, axis=(0, 1)))
+        hsv_mean, hsv_std = cv2.meanStdDev(hsv, mask=mask)
+        features.extend(hsv_mean.ravel())
+        features.extend(hsv_std.ravel())
         
         # Текстурные признаки (энергия Лапласиана)
-        gray = cv2.cvtColor((image_array * 255).astype(np.uint8), cv2.COLOR_RGB2GRAY)
-        laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
-        features.append(laplacian_var)
+        gray = cv2.cvtColor(image_u8, cv2.COLOR_RGB2GRAY)
+        _, laplacian_std = cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_64F), mask=mask)
+        features.append(laplacian_std[0, 0] ** 2)
         
         # Признаки формы и контура
-        edges = ImageProcessor.detect_edges(image_array)
-        features.append(np.sum(edges > 0) / edges.size)  # плотность границ
+        edges = ImageProcessor.detect_edges(image_u8)
+        if mask is None:
+            features.append(cv2.countNonZero(edges) / edges.size)  # плотность границ
+        else:
+            features.append(cv2.countNonZero(edges & mask) / max(cv2.countNonZero(mask), 1))
         
         return np.array(features)
     
-    def predict(self, image_array: np.ndarray) -> Tuple[str, float, Dict]:
-        """Предсказание состояния растения"""
+    def assess_tile(self, image_array: np.ndarray) -> Dict:
+        """
+        Детерминированная оценка состояния фрагмента ортофотоплана:
+        доля зеленой растительности и текстурные признаки классификатора
+        """
+        features = self.extract_advanced_features(image_array)
+        
+        # Зеленые пиксели: тон 35-85 (шкала OpenCV 0-180), достаточная насыщенность и яркость
+        hsv = cv2.cvtColor(ImageProcessor.to_uint8(image_array), cv2.COLOR_RGB2HSV)
+        green = cv2.inRange(hsv, (35, 40, 40), (85, 255, 255))
+        green_fraction = float(np.count_nonzero(green)) / green.size
+        
+        if green_fraction >= 0.6:
+            status = 'healthy'
+        elif green_fraction >= 0.3:
+            status = 'stressed'
+        else:
+            status = 'critical'
+        
+        return {
+            'health_score': round(green_fraction, 4),
+            'status': status,
+            'texture': round(float(features[6]), 2),
+            'edge_density': round(float(features[7]), 4)
+        }
+    
+    def predict(self, image_array: np.ndarray, mask: Optional[np.ndarray] = None) -> Tuple[str, float, Dict]:
+        """Предсказание состояния растения (по пикселям листьев, если задана маска)"""
         try:
             # Извлечение признаков
-            features = self.extract_advanced_features(image_array)
+            features = self.extract_advanced_features(image_array, mask)
             
             # Демо-логика предсказания (в реальном проекте здесь будет inference модели)
-            color_mean = np.mean(image_array)
-            color_std = np.std(image_array)
+            # Среднее и std по всем каналам пикселей листьев из поканальных моментов
+            channel_mean, channel_std = cv2.meanStdDev(image_array, mask=mask)
+            if image_array.dtype == np.uint8:
+                channel_mean, channel_std = channel_mean / 255.0, channel_std / 255.0
+            color_mean = float(np.mean(channel_mean))
+            color_std = float(np.sqrt(np.mean(channel_std ** 2 + channel_mean ** 2) - color_mean ** 2))
             
             # Эвристики для разных состояний
             if color_mean > 0.6 and color_std > 0.15:
@@ -102,18 +151,35 @@ class PlantDiseaseClassifier:
             raise Exception(f"Prediction error: {str(e)}")
 
 class PlantAnalysisService:
-    def __init__(self):
+    def __init__(self, engine: str = IMAGE_ENGINE, workers: int = IMAGE_WORKERS):
         self.classifier = PlantDiseaseClassifier()
-        self.image_processor = ImageProcessor()
+        self.image_processor = OpenCVImageProcessor() if engine == 'opencv' else ImageProcessor()
+        self.engine = engine
+        
+        # Анализ выполняется вне event loop; потоки OpenCV ограничены на весь процесс,
+        # чтобы воркеры пула не делили ядра с внутренним параллелизмом OpenCV
+        limit_cv_threads()
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix='plant-analysis'
+        )
         
-    async def analyze_image(self, image_data: bytes) -> Dict:
-        """Основной метод анализа изображения"""
+    async def analyze_image(self, image_data: Union[bytes, BinaryIO]) -> Dict:
+        """Основной метод анализа изображения (в пуле потоков)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.analyze_image_sync, image_data)
+    
+    def analyze_image_sync(self, image_data: Union[bytes, BinaryIO]) -> Dict:
+        """Синхронный анализ изображения в текущем потоке"""
         try:
             # Препроцессинг
             processed_image = self.image_processor.preprocess_image(image_data)
             
+            # Дальше обрабатывается только область листьев (без почвы и фона)
+            roi, leaf_mask, leaf_area_fraction = self.image_processor.vegetation_roi(processed_image)
+            
             # Предсказание
-            disease_type, confidence, features = self.classifier.predict(processed_image)
+            disease_type, confidence, features = self.classifier.predict(roi, leaf_mask)
             
             # Генерация результата
             is_healthy = disease_type == 'healthy'
@@ -133,6 +199,8 @@ class PlantAnalysisService:
                 "analysis_details": {
                     "features_extracted": len(features),
                     "disease_type": disease_type,
+                    "leaf_area_fraction": round(leaf_area_fraction, 4),
+                    "image_engine": self.engine,
                     "timestamp": self._get_timestamp()
                 }
             }
@@ -1,44 +1,123 @@
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Any
-import random
+from typing import Dict, List, Any, Optional, Tuple
+import time
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import LabelEncoder
 import joblib
+import json
 import os
+import logging
+import threading
+from collections import OrderedDict
+
+from app.services.yield_surrogate import YieldSurrogate
+
+logger = logging.getLogger(__name__)
+
+# Порядок признаков в матрице модели
+FEATURE_NAMES = ['soil_quality', 'rainfall', 'temperature', 'area', 'fertilizer']
+
+# Ограничение размера сетки сценариев для одного запроса
+MAX_SCENARIOS = 20000
+
+# Квантили распределения прогноза по деревьям (80% интервал и медиана)
+PREDICTION_QUANTILES = (0.1, 0.5, 0.9)
+
+# Культуры, для которых обучаются модели урожайности
+YIELD_CROPS = ['пшеница', 'кукуруза', 'рис', 'картофель', 'ячмень', 'соя']
+
+# Каталог с артефактами обученных моделей (см. train_yield_models.py)
+YIELD_MODELS_DIR = os.getenv("YIELD_MODELS_DIR", os.path.join(os.getenv("MODELS_DIR", "models"), "yield"))
+
+# Кэш готовых прогнозов: число записей LRU (0 - отключен) и число знаков
+# после запятой, до которого округляются входы (значения слайдеров формы)
+YIELD_CACHE_SIZE = int(os.getenv("YIELD_CACHE_SIZE", "4096"))
+YIELD_CACHE_DECIMALS = int(os.getenv("YIELD_CACHE_DECIMALS", "1"))
+
+# Площадь округляется до значащих цифр, а не знаков после запятой: у мелких
+# участков (0.04 га) абсолютный шаг съел бы все значение
+YIELD_CACHE_AREA_DIGITS = int(os.getenv("YIELD_CACHE_AREA_DIGITS", "3"))
 
 class AdvancedYieldModel:
-    def __init__(self):
+    def __init__(self, models_dir: Optional[str] = YIELD_MODELS_DIR):
         self.crop_models = {}
+        self.model_versions = {}
         self.label_encoder = LabelEncoder()
         self.feature_importance = {}
+        self.models_dir = models_dir
         self._initialize_models()
     
     def _initialize_models(self):
         """Инициализация моделей для разных культур"""
-        crops = ['пшеница', 'кукуруза', 'рис', 'картофель', 'ячмень', 'соя']
-        
-        for crop in crops:
-            # Создание демо-модели Random Forest
-            model = RandomForestRegressor(
-                n_estimators=100,
-                max_depth=10,
-                random_state=42
-            )
+        manifest = self._load_manifest()
+        
+        for crop in YIELD_CROPS:
+            # Обученный артефакт имеет приоритет над демо-моделью
+            if crop in manifest:
+                model = joblib.load(os.path.join(self.models_dir, manifest[crop]['artifact']))
+                self.set_crop_model(crop, model, manifest[crop]['version'])
+                continue
             
-            # Обучение на синтетических данных
-            X_train, y_train = self._generate_training_data(crop)
-            model.fit(X_train, y_train)
+            self.set_crop_model(crop, self.build_synthetic_model(crop), 'synthetic')
+    
+    @classmethod
+    def build_synthetic_model(cls, crop: str) -> RandomForestRegressor:
+        """Демо-модель культуры, обученная на синтетических данных"""
+        # Создание демо-модели Random Forest
+        model = RandomForestRegressor(
+            n_estimators=100,
+            max_depth=10,
+            random_state=42
+        )
+        
+        # Обучение на синтетических данных
+        X_train, y_train = cls._generate_training_data(crop)
+        model.fit(X_train, y_train)
+        
+        return model
+    
+    def _load_manifest(self, models_dir: Optional[str] = None) -> Dict[str, Any]:
+        """Чтение манифеста артефактов моделей (пустой, если моделей нет)"""
+        models_dir = models_dir or self.models_dir
+        if not models_dir:
+            return {}
+        
+        manifest_path = os.path.join(models_dir, 'manifest.json')
+        if not os.path.exists(manifest_path):
+            return {}
+        
+        with open(manifest_path, encoding='utf-8') as f:
+            return json.load(f).get('crops', {})
+    
+    def reload_changed_models(self, models_dir: Optional[str] = None) -> Dict[str, str]:
+        """
+        Загрузка артефактов, версия которых в манифесте отличается от используемой.
+        До подмены прогнозы продолжают считаться старой моделью
+        """
+        models_dir = models_dir or self.models_dir
+        reloaded = {}
+        for crop, entry in self._load_manifest(models_dir).items():
+            if crop not in self.crop_models or entry.get('version') == self.model_versions.get(crop):
+                continue
             
-            self.crop_models[crop] = model
-            self.feature_importance[crop] = dict(zip(
-                ['soil_quality', 'rainfall', 'temperature', 'area', 'fertilizer'],
-                model.feature_importances_
-            ))
+            self.set_crop_model(crop, joblib.load(os.path.join(models_dir, entry['artifact'])), entry['version'])
+            reloaded[crop] = entry['version']
+            logger.info(f"Модель {crop} обновлена до версии {entry['version']}")
+        
+        return reloaded
+    
+    def set_crop_model(self, crop: str, model: RandomForestRegressor, version: str):
+        """Установка модели культуры вместе с версией и важностью признаков"""
+        self.crop_models[crop] = model
+        self.model_versions[crop] = version
+        self.feature_importance[crop] = dict(zip(FEATURE_NAMES, model.feature_importances_))
     
-    def _generate_training_data(self, crop: str, n_samples: int = 1000):
+    @staticmethod
+    def _generate_training_data(crop: str, n_samples: int = 1000, seed: int = 42):
         """Генерация синтетических данных для обучения"""
-        np.random.seed(42)
+        # Локальный генератор, чтобы не сбрасывать глобальное состояние np.random
+        rng = np.random.default_rng(seed)
         
         # Базовые параметры в зависимости от культуры
         crop_params = {
@@ -53,11 +132,11 @@ class AdvancedYieldModel:
         params = crop_params.get(crop, crop_params['пшеница'])
         
         # Генерация признаков
-        soil_quality = np.random.uniform(3, 10, n_samples)
-        rainfall = np.random.uniform(30, 200, n_samples)
-        temperature = np.random.uniform(10, 30, n_samples)
-        area = np.random.uniform(0.5, 5, n_samples)
-        fertilizer = np.random.choice([0, 1], n_samples)
+        soil_quality = rng.uniform(3, 10, n_samples)
+        rainfall = rng.uniform(30, 200, n_samples)
+        temperature = rng.uniform(10, 30, n_samples)
+        area = rng.uniform(0.5, 5, n_samples)
+        fertilizer = rng.choice([0, 1], n_samples)
         
         X = np.column_stack([soil_quality, rainfall, temperature, area, fertilizer])
         
@@ -75,30 +154,115 @@ class AdvancedYieldModel:
         y = base + soil_effect + rain_effect + temp_effect + fertilizer_effect
         
         # Добавление шума
-        y += np.random.normal(0, 0.5, n_samples)
+        y += rng.normal(0, 0.5, n_samples)
         y = np.maximum(0, y)
         
         return X, y
     
     def predict(self, crop_type: str, features: List[float]) -> float:
         """Предсказание урожайности"""
-        if crop_type not in self.crop_models:
-            crop_type = 'пшеница'  # fallback
+        prediction = self.predict_distribution(crop_type, np.array([features]))['mean'][0]
+        return round(float(prediction), 2)
+    
+    def predict_batch(self, crop_type: str, features_matrix: np.ndarray) -> np.ndarray:
+        """Векторизованное предсказание для матрицы признаков (n × 5) одним проходом по деревьям"""
+        return self.predict_distribution(crop_type, features_matrix)['mean']
+    
+    def predict_distribution(self, crop_type: str, features_matrix: np.ndarray,
+                             quantiles: Tuple[float, ...] = PREDICTION_QUANTILES) -> Dict[str, Any]:
+        """
+        Распределение прогноза по деревьям леса: среднее (совпадает с predict леса),
+        стандартное отклонение и квантили для каждой строки за один проход
+        """
+        tree_predictions = self._tree_predictions(crop_type, features_matrix)
         
-        model = self.crop_models[crop_type]
-        features_array = np.array(features).reshape(1, -1)
+        return {
+            'mean': tree_predictions.mean(axis=0),
+            'std': tree_predictions.std(axis=0),
+            'quantiles': dict(zip(quantiles, np.quantile(tree_predictions, quantiles, axis=0)))
+        }
+    
+    def serving_crop(self, crop_type: str) -> str:
+        """Культура, чей лес считает прогноз: неизвестные культуры считаются лесом пшеницы"""
+        crop = crop_type.strip().lower()
+        return crop if crop in self.crop_models else 'пшеница'
+    
+    def _tree_predictions(self, crop_type: str, features_matrix: np.ndarray) -> np.ndarray:
+        """Предсказания каждого дерева: массив (n_trees × n_samples)"""
+        model = self.crop_models[self.serving_crop(crop_type)]
         
-        prediction = model.predict(features_array)[0]
+        # Валидация и приведение к float32 один раз для всех деревьев
+        features_matrix = np.ascontiguousarray(features_matrix, dtype=np.float32)
         
-        # Добавление реалистичного шума
-        prediction += random.uniform(-0.3, 0.3)
-        prediction = max(0, prediction)
+        tree_predictions = np.empty((len(model.estimators_), features_matrix.shape[0]))
+        for i, tree in enumerate(model.estimators_):
+            tree_predictions[i] = tree.predict(features_matrix, check_input=False)
         
-        return round(prediction, 2)
+        return tree_predictions
+
+class PredictionCache:
+    """
+    LRU кэш прогнозов по культуре и округленным входам. Прогноз детерминирован
+    (среднее и квантили по деревьям леса), поэтому ответ зависит только от
+    ключа и версии модели культуры: при смене версии записи культуры сбрасываются
+    """
+    
+    def __init__(self, maxsize: int = YIELD_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+        self.versions: Dict[str, Optional[str]] = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+    
+    def get(self, key: Tuple, version: Optional[str]) -> Optional[Dict[str, Any]]:
+        crop = key[0]
+        with self.lock:
+            if crop in self.versions and self.versions[crop] != version:
+                for stale in [entry for entry in self.entries if entry[0] == crop]:
+                    del self.entries[stale]
+                self.invalidations += 1
+            self.versions[crop] = version
+            
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def put(self, key: Tuple, version: Optional[str], value: Dict[str, Any]):
+        with self.lock:
+            # Модель сменилась, пока считался прогноз - результат не кэшируется
+            if self.maxsize <= 0 or self.versions.get(key[0]) != version:
+                return
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+    
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            requests = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / requests, 3) if requests else None,
+                'invalidations': self.invalidations
+            }
 
 class YieldPredictionService:
-    def __init__(self):
+    def __init__(self, cache_size: int = YIELD_CACHE_SIZE, cache_decimals: int = YIELD_CACHE_DECIMALS,
+                 area_digits: int = YIELD_CACHE_AREA_DIGITS):
         self.model = AdvancedYieldModel()
+        self.cache = PredictionCache(cache_size)
+        self.cache_decimals = cache_decimals
+        self.area_digits = area_digits
+        self.surrogate = YieldSurrogate()
         self.optimal_ranges = {
             'пшеница': {'temp': (15, 25), 'rain': (50, 150), 'soil': (6, 9)},
             'кукуруза': {'temp': (18, 30), 'rain': (60, 180), 'soil': (6, 8)},
@@ -108,9 +272,41 @@ class YieldPredictionService:
             'соя': {'temp': (20, 30), 'rain': (50, 150), 'soil': (6, 7)}
         }
     
+    def quantize_inputs(self, crop_type: str, soil_quality: float, rainfall: float,
+                        temperature: float, area: float, fertilizer_used: bool) -> Dict[str, Any]:
+        """
+        Входы прогноза, округленные до точности кэша: ключ кэша и объединения запросов.
+        Культура приводится к той, чей лес считает прогноз, чтобы кэш сбрасывался
+        вместе с версией именно этой модели
+        """
+        return {
+            'crop_type': self.model.serving_crop(crop_type),
+            'soil_quality': round(float(soil_quality), self.cache_decimals),
+            'rainfall': round(float(rainfall), self.cache_decimals),
+            'temperature': round(float(temperature), self.cache_decimals),
+            'area': float(f"{float(area):.{self.area_digits}g}"),
+            'fertilizer_used': bool(fertilizer_used)
+        }
+    
     def predict_yield(self, crop_type: str, soil_quality: float, rainfall: float, 
                      temperature: float, area: float, fertilizer_used: bool) -> Dict[str, Any]:
-        """Основной метод предсказания урожайности"""
+        """
+        Прогноз урожайности по округленным входам. Полный ответ (интервал,
+        рекомендации, анализ факторов) берется из кэша; возвращаемый словарь
+        общий для одинаковых запросов и не должен изменяться вызывающим кодом
+        """
+        inputs = self.quantize_inputs(crop_type, soil_quality, rainfall, temperature, area, fertilizer_used)
+        key = tuple(inputs.values())
+        version = self.model.model_versions.get(crop_type)
+        
+        prediction = self.cache.get(key, version)
+        if prediction is None:
+            prediction = self._predict_uncached(**inputs)
+            self.cache.put(key, version, prediction)
+        return prediction
+    
+    def _predict_uncached(self, crop_type: str, soil_quality: float, rainfall: float,
+                          temperature: float, area: float, fertilizer_used: bool) -> Dict[str, Any]:
         try:
             # Подготовка признаков
             features = [
@@ -121,13 +317,13 @@ class YieldPredictionService:
                 1 if fertilizer_used else 0
             ]
             
-            # Предсказание
-            predicted_yield = self.model.predict(crop_type, features)
+            # Предсказание с интервалом по деревьям леса
+            distribution = self.model.predict_distribution(crop_type, np.array([features]))
+            predicted_yield = round(float(distribution['mean'][0]), 2)
+            prediction_interval = self._format_interval(distribution, 0)
             
             # Расчет уверенности
-            confidence = self._calculate_confidence(
-                crop_type, soil_quality, rainfall, temperature
-            )
+            confidence = self._calculate_confidence(prediction_interval)
             
             # Генерация рекомендаций
             suggestions = self._generate_suggestions(
@@ -141,6 +337,7 @@ class YieldPredictionService:
             return {
                 "predicted_yield": predicted_yield,
                 "confidence": round(confidence, 3),
+                "prediction_interval": prediction_interval,
                 "suggestions": suggestions,
                 "analysis": factor_analysis,
                 "optimal_ranges": self.optimal_ranges.get(crop_type, {})
@@ -149,36 +346,175 @@ class YieldPredictionService:
         except Exception as e:
             raise Exception(f"Yield prediction failed: {str(e)}")
     
-    def _calculate_confidence(self, crop_type: str, soil: float, rain: float, temp: float) -> float:
-        """Расчет уверенности предсказания"""
-        confidence = 0.7  # базовая уверенность
+    def predict_scenarios(self, crop_type: str, soil_quality: float, rainfall: float,
+                          temperature: float, area: float, fertilizer_used: bool,
+                          ranges: Dict[str, Tuple[float, float, int]],
+                          fertilizer_options: Optional[List[bool]] = None,
+                          compare_crops: Optional[List[str]] = None,
+                          engine: str = 'forest') -> Dict[str, Any]:
+        """
+        Анализ чувствительности "что если": полная сетка сценариев вокруг базового поля,
+        оцениваемая одним векторизованным вызовом на каждую культуру (лесом или таблицей суррогата)
+        """
+        try:
+            start = time.perf_counter()
+            
+            base = {
+                'soil_quality': soil_quality,
+                'rainfall': rainfall,
+                'temperature': temperature,
+                'area': area,
+                'fertilizer': 1.0 if fertilizer_used else 0.0
+            }
+            
+            # Оси сетки: варьируемые параметры в порядке FEATURE_NAMES
+            axes: Dict[str, np.ndarray] = {}
+            for name in FEATURE_NAMES:
+                if name in ranges:
+                    low, high, steps = ranges[name]
+                    axes[name] = np.linspace(low, high, steps)
+            
+            if fertilizer_options:
+                axes['fertilizer'] = np.array(sorted({1.0 if option else 0.0 for option in fertilizer_options}))
+            
+            if not axes:
+                raise ValueError("Не задан ни один диапазон для сценариев")
+            
+            # Каждая культура - отдельный проход по всей сетке, поэтому лимит считается на все культуры
+            crops = list(dict.fromkeys(self.model.serving_crop(crop) for crop in [crop_type, *(compare_crops or [])]))
+            shape = tuple(len(values) for values in axes.values())
+            scenario_count = int(np.prod(shape))
+            if scenario_count * len(crops) > MAX_SCENARIOS:
+                raise ValueError(f"Слишком много сценариев: {scenario_count} × {len(crops)} культур (максимум {MAX_SCENARIOS})")
+            
+            # Матрица сценариев: фиксированные признаки из базы, варьируемые из сетки
+            features_matrix = np.empty((scenario_count, len(FEATURE_NAMES)))
+            grids = dict(zip(axes.keys(), np.meshgrid(*axes.values(), indexing='ij')))
+            for column, name in enumerate(FEATURE_NAMES):
+                features_matrix[:, column] = grids[name].ravel() if name in grids else base[name]
+            
+            base_features = np.array([[base[name] for name in FEATURE_NAMES]])
+            axis_names = list(axes.keys())
+            
+            crops_result = {}
+            for crop in crops:
+                distribution, engine_used = self.predict_distribution(crop, features_matrix, engine)
+                predictions = distribution['mean']
+                surface = predictions.reshape(shape)
+                
+                # Частичная зависимость: среднее по всем остальным осям
+                partial_dependence = {}
+                for axis_index, name in enumerate(axis_names):
+                    other_axes = tuple(i for i in range(len(axis_names)) if i != axis_index)
+                    curve = surface.mean(axis=other_axes) if other_axes else surface
+                    partial_dependence[name] = np.round(curve, 3).tolist()
+                
+                best_index = int(np.argmax(predictions))
+                worst_index = int(np.argmin(predictions))
+                
+                crops_result[crop] = {
+                    'engine': engine_used,
+                    'base_prediction': round(float(self.predict_distribution(crop, base_features, engine)[0]['mean'][0]), 2),
+                    'response_surface': np.round(surface, 2).tolist(),
+                    'uncertainty_surface': np.round(distribution['std'].reshape(shape), 3).tolist(),
+                    'partial_dependence': partial_dependence,
+                    'best_scenario': self._scenario_at(features_matrix, predictions, best_index, axis_names),
+                    'worst_scenario': self._scenario_at(features_matrix, predictions, worst_index, axis_names)
+                }
+            
+            return {
+                'base': {**base, 'fertilizer': bool(base['fertilizer'])},
+                'axes': {name: np.round(values, 3).tolist() for name, values in axes.items()},
+                'scenario_count': scenario_count,
+                'crops': crops_result,
+                'elapsed_ms': round((time.perf_counter() - start) * 1000, 2)
+            }
         
-        # Проверка оптимальных диапазонов
-        optimal = self.optimal_ranges.get(crop_type, {})
+        except ValueError:
+            raise
+        except Exception as e:
+            raise Exception(f"Scenario analysis failed: {str(e)}")
+    
+    def predict_distribution(self, crop_type: str, features_matrix: np.ndarray,
+                             engine: str = 'forest') -> Tuple[Dict[str, np.ndarray], str]:
+        """
+        Среднее и std прогноза для матрицы признаков. Движок 'surrogate' берет
+        актуальную таблицу культуры, без нее расчет выполняет лес
+        """
+        crop_type = self.model.serving_crop(crop_type)
+        if engine == 'surrogate':
+            table = self.surrogate.table_for(crop_type, self.model.model_versions.get(crop_type))
+            if table is not None:
+                mean, std = table.predict(features_matrix)
+                return {'mean': mean, 'std': std}, 'surrogate'
         
-        if optimal:
-            # Проверка температуры
-            temp_min, temp_max = optimal.get('temp', (10, 30))
-            if temp_min <= temp <= temp_max:
-                confidence += 0.1
-            else:
-                confidence -= 0.15
-            
-            # Проверка осадков
-            rain_min, rain_max = optimal.get('rain', (50, 150))
-            if rain_min <= rain <= rain_max:
-                confidence += 0.1
-            else:
-                confidence -= 0.1
-            
-            # Проверка почвы
-            soil_min, soil_max = optimal.get('soil', (5, 8))
-            if soil_min <= soil <= soil_max:
-                confidence += 0.1
-            else:
-                confidence -= 0.1
-        
-        return max(0.3, min(0.95, confidence))
+        distribution = self.model.predict_distribution(crop_type, features_matrix)
+        return {'mean': distribution['mean'], 'std': distribution['std']}, 'forest'
+    
+    def predict_batch(self, items: List[Dict[str, Any]], engine: str = 'forest') -> Dict[str, Any]:
+        """Пакетный прогноз: строки группируются по культурам, каждая группа - один вызов движка"""
+        start = time.perf_counter()
+        predictions: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        engines = {}
+        
+        by_crop: Dict[str, List[int]] = {}
+        for index, item in enumerate(items):
+            by_crop.setdefault(item['crop_type'], []).append(index)
+        
+        for crop, indices in by_crop.items():
+            features_matrix = np.array([
+                [items[i]['soil_quality'], items[i]['rainfall'], items[i]['temperature'], items[i]['area'],
+                 1.0 if items[i]['fertilizer_used'] else 0.0]
+                for i in indices
+            ])
+            distribution, engines[crop] = self.predict_distribution(crop, features_matrix, engine)
+            for row, i in enumerate(indices):
+                predictions[i] = {
+                    'crop_type': crop,
+                    'predicted_yield': round(float(distribution['mean'][row]), 2),
+                    'std': round(float(distribution['std'][row]), 3)
+                }
+        
+        return {
+            'predictions': predictions,
+            'engines': engines,
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 2)
+        }
+    
+    @staticmethod
+    def _scenario_at(features_matrix: np.ndarray, predictions: np.ndarray,
+                     index: int, axis_names: List[str]) -> Dict[str, Any]:
+        """Значения варьируемых параметров и прогноз для одного сценария"""
+        scenario = {
+            name: round(float(features_matrix[index, FEATURE_NAMES.index(name)]), 3)
+            for name in axis_names
+        }
+        if 'fertilizer' in scenario:
+            scenario['fertilizer'] = bool(scenario['fertilizer'])
+        scenario['predicted_yield'] = round(float(predictions[index]), 2)
+        return scenario
+    
+    def _calculate_confidence(self, prediction_interval: Dict[str, float]) -> float:
+        """Расчет уверенности по относительной ширине интервала прогноза"""
+        mean = prediction_interval['mean']
+        if mean <= 0:
+            return 0.3
+        
+        relative_width = (prediction_interval['upper'] - prediction_interval['lower']) / mean
+        return max(0.3, min(0.95, 1 - relative_width))
+    
+    @staticmethod
+    def _format_interval(distribution: Dict[str, Any], index: int) -> Dict[str, float]:
+        """Интервал прогноза для одной строки распределения"""
+        quantiles = distribution['quantiles']
+        return {
+            'mean': round(float(distribution['mean'][index]), 2),
+            'lower': round(float(quantiles[PREDICTION_QUANTILES[0]][index]), 2),
+            'median': round(float(quantiles[PREDICTION_QUANTILES[1]][index]), 2),
+            'upper': round(float(quantiles[PREDICTION_QUANTILES[-1]][index]), 2),
+            'std': round(float(distribution['std'][index]), 3),
+            'level': round(PREDICTION_QUANTILES[-1] - PREDICTION_QUANTILES[0], 2)
+        }
     
     def _generate_suggestions(self, crop_type: str, soil: float, rain: float, 
                             temp: float, yield_value: float, fertilizer: bool) -> List[str]:
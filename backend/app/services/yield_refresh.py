@@ -0,0 +1,193 @@
+import os
+import time
+import fcntl
+import asyncio
+import logging
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Optional
+
+import pandas as pd
+import joblib
+
+from app.services.yield_prediction import AdvancedYieldModel, YIELD_MODELS_DIR
+from app.services.yield_training import (
+    HARVEST_COLUMNS, load_harvest_data, read_manifest, update_manifest, write_model_artifact
+)
+
+logger = logging.getLogger(__name__)
+
+YIELD_FEEDBACK_PATH = os.getenv("YIELD_FEEDBACK_PATH", os.path.join("data", "harvest_feedback.csv"))
+
+# Период проверки новых наблюдений и манифеста (секунды)
+YIELD_REFRESH_INTERVAL = int(os.getenv("YIELD_REFRESH_INTERVAL", "3600"))
+
+# Минимум новых наблюдений культуры для дообучения
+YIELD_REFRESH_MIN_OBSERVATIONS = int(os.getenv("YIELD_REFRESH_MIN_OBSERVATIONS", "20"))
+
+# Сколько деревьев добавляется к лесу при дообучении
+YIELD_REFRESH_TREES = int(os.getenv("YIELD_REFRESH_TREES", "20"))
+
+# base_artifact культуры без обученного артефакта: дообучается демо-модель
+SYNTHETIC_BASE = 'synthetic'
+
+class HarvestFeedbackStore:
+    """Локальное хранилище фактических урожаев (CSV с дозаписью)"""
+    
+    def __init__(self, path: str = YIELD_FEEDBACK_PATH):
+        self.path = path
+    
+    def append(self, observation: Dict[str, Any]):
+        """Дозапись наблюдения; файловая блокировка защищает от параллельных воркеров"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        row = {column: observation[column] for column in HARVEST_COLUMNS}
+        row['crop_type'] = str(row['crop_type']).strip().lower()
+        row['observed_at'] = datetime.now().isoformat()
+        
+        with open(self.path, 'a', encoding='utf-8', newline='') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                pd.DataFrame([row]).to_csv(f, header=f.tell() == 0, index=False)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+    
+    def count_by_crop(self) -> Dict[str, int]:
+        """Число наблюдений по культурам"""
+        if not os.path.exists(self.path):
+            return {}
+        
+        counts: Dict[str, int] = {}
+        for chunk in pd.read_csv(self.path, usecols=['crop_type'], chunksize=100000):
+            for crop, count in chunk['crop_type'].value_counts().items():
+                counts[crop] = counts.get(crop, 0) + int(count)
+        return counts
+
+def refresh_crop_model(crop: str, models_dir: str, feedback_path: str,
+                       extra_trees: int = YIELD_REFRESH_TREES) -> Dict[str, Any]:
+    """
+    Дообучение леса культуры в отдельном процессе: к базовой модели
+    добавляются деревья, обученные на наблюдениях фермеров (warm start)
+    """
+    start = time.perf_counter()
+    manifest = read_manifest(models_dir)
+    entry = manifest['crops'].get(crop, {})
+    
+    # Новые деревья всегда наращиваются на исходной модели, а не на прошлом дообучении:
+    # запись дообучения хранит свою базу, запись полного обучения - только artifact
+    if 'base_artifact' in entry:
+        # None писали прежние версии при дообучении демо-модели
+        base_artifact = entry['base_artifact'] or SYNTHETIC_BASE
+    else:
+        base_artifact = entry.get('artifact') or SYNTHETIC_BASE
+    
+    if base_artifact == SYNTHETIC_BASE:
+        model = AdvancedYieldModel.build_synthetic_model(crop)
+    else:
+        model = joblib.load(os.path.join(models_dir, base_artifact))
+    
+    X, y = load_harvest_data([feedback_path])[crop]
+    
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + extra_trees)
+    model.fit(X, y)
+    model.set_params(warm_start=False)
+    
+    result = write_model_artifact(models_dir, crop, model)
+    result.update({
+        'base_artifact': base_artifact,
+        'feedback_rows': int(len(y)),
+        'refreshed_at': datetime.now().isoformat(),
+        'wall_clock_s': round(time.perf_counter() - start, 3)
+    })
+    return result
+
+class YieldModelRefresher:
+    """
+    Фоновое обновление моделей урожайности. Дообучение выполняет один воркер
+    (под файловой блокировкой) в отдельном процессе, а все воркеры подхватывают
+    новые версии из манифеста и подменяют модели целиком
+    """
+    
+    def __init__(self, model: AdvancedYieldModel, feedback_store: HarvestFeedbackStore,
+                 models_dir: str = YIELD_MODELS_DIR, interval: int = YIELD_REFRESH_INTERVAL,
+                 min_observations: int = YIELD_REFRESH_MIN_OBSERVATIONS):
+        self.model = model
+        self.feedback_store = feedback_store
+        self.models_dir = models_dir
+        self.interval = interval
+        self.min_observations = min_observations
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        """Запуск фонового цикла в текущем event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Обновление моделей урожайности запущено (каждые {self.interval} с)")
+    
+    async def stop(self):
+        """Остановка фонового цикла"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh_once()
+            except Exception as e:
+                logger.error(f"Ошибка обновления моделей урожайности: {str(e)}")
+    
+    async def refresh_once(self) -> Dict[str, Any]:
+        """Один цикл: дообучение (если есть новые наблюдения) и подхват новых версий"""
+        retrained = await self._retrain_pending()
+        reloaded = await self.reload_changed_models()
+        return {'retrained': retrained, 'reloaded': reloaded}
+    
+    async def _retrain_pending(self) -> Dict[str, Any]:
+        os.makedirs(self.models_dir, exist_ok=True)
+        lock_file = open(os.path.join(self.models_dir, '.refresh.lock'), 'w')
+        
+        try:
+            # Остальные воркеры не ждут, а только подхватывают результат
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return {}
+            
+            counts = await asyncio.to_thread(self.feedback_store.count_by_crop)
+            manifest = await asyncio.to_thread(read_manifest, self.models_dir)
+            
+            pending = [
+                crop for crop, count in counts.items()
+                if crop in self.model.crop_models
+                and count - manifest['crops'].get(crop, {}).get('feedback_rows', 0) >= self.min_observations
+            ]
+            if not pending:
+                return {}
+            
+            # Обучение в отдельном процессе не конкурирует с обслуживанием запросов за GIL
+            loop = asyncio.get_running_loop()
+            reports = {}
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+                for crop in pending:
+                    reports[crop] = await loop.run_in_executor(
+                        executor, refresh_crop_model, crop, self.models_dir, self.feedback_store.path
+                    )
+                    logger.info(f"Модель {crop} дообучена на {reports[crop]['feedback_rows']} наблюдениях")
+            
+            await asyncio.to_thread(update_manifest, self.models_dir, reports)
+            return reports
+        finally:
+            lock_file.close()
+    
+    async def reload_changed_models(self) -> Dict[str, str]:
+        """Подхват новых версий из манифеста; загрузка идет в потоке, не занимая event loop"""
+        return await asyncio.to_thread(self.model.reload_changed_models, self.models_dir)
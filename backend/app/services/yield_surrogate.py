@@ -0,0 +1,247 @@
+import os
+import json
+import time
+import fcntl
+import logging
+from datetime import datetime
+from typing import Dict, Any, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Каталог таблиц суррогата (по умолчанию рядом с артефактами моделей урожайности)
+YIELD_SURROGATE_DIR = os.getenv(
+    "YIELD_SURROGATE_DIR",
+    os.path.join(os.getenv("YIELD_MODELS_DIR", os.path.join(os.getenv("MODELS_DIR", "models"), "yield")), "surrogate")
+)
+
+# Число узлов сетки по непрерывным признакам: почва, осадки, температура, площадь
+SURROGATE_GRID_STEPS = (28, 52, 31, 14)
+
+# Строк сетки, оцениваемых лесом за один вызов при построении
+SURROGATE_BUILD_CHUNK = 100000
+
+# Случайных точек для оценки ошибки таблицы относительно леса
+SURROGATE_VALIDATION_SAMPLES = 20000
+
+# Непрерывные признаки в порядке FEATURE_NAMES; пятый признак (удобрения) - индекс 0/1
+CONTINUOUS_FEATURES = 4
+
+def split_ranges(forest) -> np.ndarray:
+    """
+    Диапазон порогов разбиения леса по каждому непрерывному признаку (4 × 2).
+    За пределами диапазона прогноз леса по признаку постоянен, поэтому
+    запросы обрезаются к нему без потери точности
+    """
+    ranges = np.empty((CONTINUOUS_FEATURES, 2))
+    ranges[:, 0], ranges[:, 1] = np.inf, -np.inf
+    for tree in forest.estimators_:
+        feature, threshold = tree.tree_.feature, tree.tree_.threshold
+        for k in range(CONTINUOUS_FEATURES):
+            values = threshold[feature == k]
+            if len(values):
+                ranges[k, 0] = min(ranges[k, 0], values.min())
+                ranges[k, 1] = max(ranges[k, 1], values.max())
+    
+    # Признак без разбиений не влияет на прогноз: достаточно двух одинаковых узлов
+    unused = ~np.isfinite(ranges[:, 0])
+    ranges[unused] = (0.0, 1.0)
+    return ranges
+
+class SurrogateTable:
+    """
+    Таблица прогноза культуры на плотной сетке: массив
+    (удобрения × почва × осадки × температура × площадь × [среднее, std]).
+    Запрос - полилинейная интерполяция по 16 соседним узлам, O(1) на строку
+    """
+    
+    def __init__(self, table: np.ndarray, ranges: np.ndarray, version: Optional[str], report: Optional[Dict] = None):
+        self.table = table
+        self.flat = table.reshape(-1)
+        self.ranges = np.asarray(ranges, dtype=np.float64)
+        self.steps = np.array(table.shape[1:1 + CONTINUOUS_FEATURES])
+        self.scale = (self.steps - 1) / (self.ranges[:, 1] - self.ranges[:, 0])
+        self.strides = np.array(table.strides[:1 + CONTINUOUS_FEATURES]) // table.itemsize
+        self.version = version
+        self.report = report or {}
+    
+    def predict(self, features_matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(среднее, std) для матрицы признаков n × 5"""
+        features_matrix = np.asarray(features_matrix, dtype=np.float64)
+        n = features_matrix.shape[0]
+        
+        offset = (features_matrix[:, CONTINUOUS_FEATURES] >= 0.5).astype(np.int64) * self.strides[0]
+        fractions = []
+        for k in range(CONTINUOUS_FEATURES):
+            low, high = self.ranges[k]
+            position = (np.clip(features_matrix[:, k], low, high) - low) * self.scale[k]
+            index = np.minimum(position.astype(np.int64), self.steps[k] - 2)
+            offset += index * self.strides[k + 1]
+            fractions.append(position - index)
+        
+        mean, std = np.zeros(n), np.zeros(n)
+        for corner in range(1 << CONTINUOUS_FEATURES):
+            weight = np.ones(n)
+            corner_offset = offset.copy()
+            for k in range(CONTINUOUS_FEATURES):
+                if corner >> k & 1:
+                    weight *= fractions[k]
+                    corner_offset += self.strides[k + 1]
+                else:
+                    weight *= 1 - fractions[k]
+            mean += weight * self.flat[corner_offset]
+            std += weight * self.flat[corner_offset + 1]
+        return mean, std
+    
+    @classmethod
+    def build(cls, model, crop: str, steps: Sequence[int] = SURROGATE_GRID_STEPS,
+              chunk_size: int = SURROGATE_BUILD_CHUNK) -> 'SurrogateTable':
+        """Табулирование леса культуры на сетке внутри диапазона его порогов"""
+        ranges = split_ranges(model.crop_models[crop])
+        axes = [np.linspace(low, high, count) for (low, high), count in zip(ranges, steps)]
+        grids = np.meshgrid(*axes, indexing='ij')
+        
+        table = np.empty((2,) + tuple(steps) + (2,), dtype=np.float32)
+        for fertilizer in (0, 1):
+            features_matrix = np.column_stack([grid.ravel() for grid in grids] + [np.full(grids[0].size, fertilizer)])
+            values = table[fertilizer].reshape(-1, 2)
+            for start in range(0, len(features_matrix), chunk_size):
+                distribution = model.predict_distribution(crop, features_matrix[start:start + chunk_size])
+                values[start:start + chunk_size, 0] = distribution['mean']
+                values[start:start + chunk_size, 1] = distribution['std']
+        
+        return cls(table, ranges, model.model_versions.get(crop))
+    
+    def evaluate(self, model, crop: str, samples: int = SURROGATE_VALIDATION_SAMPLES, seed: int = 0) -> Dict[str, Any]:
+        """
+        Ошибка таблицы относительно леса на случайных точках внутри диапазона
+        порогов (снаружи интерполяция совпадает с лесом); скорость обоих способов
+        """
+        rng = np.random.default_rng(seed)
+        features_matrix = np.column_stack(
+            [rng.uniform(low, high, samples) for low, high in self.ranges] + [rng.integers(0, 2, samples)]
+        )
+        
+        start = time.perf_counter()
+        expected = model.predict_distribution(crop, features_matrix)['mean']
+        forest_seconds = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        predicted, _ = self.predict(features_matrix)
+        table_seconds = time.perf_counter() - start
+        
+        errors = np.abs(predicted - expected)
+        return {
+            'samples': samples,
+            'max_abs_error': round(float(errors.max()), 4),
+            'p99_abs_error': round(float(np.percentile(errors, 99)), 4),
+            'mean_abs_error': round(float(errors.mean()), 4),
+            'forest_us_per_row': round(forest_seconds / samples * 1e6, 3),
+            'table_us_per_row': round(table_seconds / samples * 1e6, 3)
+        }
+
+def read_surrogate_manifest(directory: str) -> Dict[str, Any]:
+    manifest_path = os.path.join(directory, 'manifest.json')
+    if not os.path.exists(manifest_path):
+        return {'crops': {}}
+    
+    with open(manifest_path, encoding='utf-8') as f:
+        return json.load(f)
+
+def save_surrogate_table(directory: str, crop: str, table: SurrogateTable) -> Dict[str, Any]:
+    """Атомарная запись таблицы (.npy для mmap) и ее записи в манифесте суррогата"""
+    os.makedirs(directory, exist_ok=True)
+    filename = f"{crop}-{table.version}.npy"
+    path = os.path.join(directory, filename)
+    
+    with open(path + '.tmp', 'wb') as f:
+        np.save(f, table.table)
+    os.replace(path + '.tmp', path)
+    
+    entry = {
+        'file': filename,
+        'version': table.version,
+        'steps': [int(step) for step in table.steps],
+        'ranges': table.ranges.tolist(),
+        'size_bytes': int(table.table.nbytes),
+        'built_at': datetime.now().isoformat(),
+        **table.report
+    }
+    
+    manifest_path = os.path.join(directory, 'manifest.json')
+    with open(os.path.join(directory, '.manifest.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        
+        manifest = read_surrogate_manifest(directory)
+        previous = manifest['crops'].get(crop, {}).get('file')
+        manifest['crops'][crop] = entry
+        manifest['updated_at'] = datetime.now().isoformat()
+        
+        with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(manifest_path + '.tmp', manifest_path)
+    
+    # Старый файл остается доступным воркерам, которые уже отобразили его в память
+    if previous and previous != filename and os.path.exists(os.path.join(directory, previous)):
+        os.remove(os.path.join(directory, previous))
+    return entry
+
+class YieldSurrogate:
+    """
+    Таблицы суррогата, отображенные в память (mmap, общие страницы для всех
+    воркеров). Таблица используется, только пока ее версия совпадает с версией
+    модели культуры; манифест перечитывается при изменении
+    """
+    
+    def __init__(self, directory: Optional[str] = YIELD_SURROGATE_DIR):
+        self.directory = directory
+        self.tables: Dict[str, SurrogateTable] = {}
+        self._manifest_mtime: Optional[float] = None
+    
+    def _reload(self):
+        manifest_path = os.path.join(self.directory, 'manifest.json') if self.directory else None
+        try:
+            mtime = os.stat(manifest_path).st_mtime if manifest_path else None
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._manifest_mtime:
+            return
+        
+        tables = {}
+        complete = True
+        if mtime is not None:
+            for crop, entry in read_surrogate_manifest(self.directory)['crops'].items():
+                try:
+                    table = np.load(os.path.join(self.directory, entry['file']), mmap_mode='r')
+                    tables[crop] = SurrogateTable(table, np.array(entry['ranges']), entry['version'], entry)
+                except Exception as e:
+                    complete = False
+                    logger.error(f"Не удалось загрузить таблицу суррогата {crop}: {str(e)}")
+        
+        self.tables = tables
+        # При ошибке манифест будет перечитан при следующем запросе
+        self._manifest_mtime = mtime if complete else None
+        if tables:
+            logger.info(f"Таблицы суррогата урожайности загружены: {', '.join(sorted(tables))}")
+    
+    def table_for(self, crop: str, version: Optional[str]) -> Optional[SurrogateTable]:
+        """Актуальная таблица культуры или None (нет таблицы или модель обновилась)"""
+        self._reload()
+        table = self.tables.get(crop)
+        if table is None or table.version != version:
+            return None
+        return table
+    
+    def stats(self, model_versions: Dict[str, str]) -> Dict[str, Any]:
+        self._reload()
+        return {
+            crop: {
+                **{key: table.report.get(key) for key in (
+                    'version', 'steps', 'size_bytes', 'built_at', 'max_abs_error',
+                    'p99_abs_error', 'mean_abs_error', 'forest_us_per_row', 'table_us_per_row'
+                )},
+                'fresh': table.version == model_versions.get(crop)
+            }
+            for crop, table in sorted(self.tables.items())
+        }
@@ -0,0 +1,237 @@
+import os
+import sys
+import json
+import time
+import uuid
+import fcntl
+import resource
+import logging
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import joblib
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import HalvingRandomSearchCV
+
+from app.services.yield_prediction import AdvancedYieldModel, FEATURE_NAMES, YIELD_CROPS
+
+logger = logging.getLogger(__name__)
+
+# Колонки файла с фактическими урожаями (CSV/Parquet)
+HARVEST_COLUMNS = ['crop_type', 'soil_quality', 'rainfall', 'temperature', 'area', 'fertilizer_used', 'actual_yield']
+
+# Пространство поиска гиперпараметров для successive halving
+PARAM_DISTRIBUTIONS = {
+    'n_estimators': [50, 100, 200],
+    'max_depth': [6, 10, 14, None],
+    'min_samples_leaf': [1, 2, 5, 10],
+    'max_features': [1.0, 0.8, 0.6],
+}
+
+# Максимум кандидатов в первом раунде: 27 → 9 → 3 → 1 при factor=3
+SEARCH_CANDIDATES = 27
+SEARCH_FACTOR = 3
+SEARCH_CV = 3
+
+# Наблюдений на кандидата в первом раунде: по 30 строк на тестовый фолд,
+# на меньших фолдах R² отбора почти случаен
+SEARCH_MIN_RESOURCES = 30 * SEARCH_CV
+
+# Меньше этого числа наблюдений поиск гиперпараметров не запускается:
+# нужны хотя бы три осмысленных раунда (9 → 3 → 1)
+MIN_SAMPLES_FOR_SEARCH = SEARCH_MIN_RESOURCES * SEARCH_FACTOR ** 2
+
+def search_schedule(n_samples: int) -> Tuple[int, int]:
+    """
+    Число кандидатов и наблюдений первого раунда: кандидатов столько, чтобы первый
+    раунд был не меньше SEARCH_MIN_RESOURCES, а последний обучался почти на всех данных
+    """
+    n_candidates = 1
+    while (n_candidates * SEARCH_FACTOR <= SEARCH_CANDIDATES
+           and SEARCH_MIN_RESOURCES * n_candidates * SEARCH_FACTOR <= n_samples):
+        n_candidates *= SEARCH_FACTOR
+    return n_candidates, n_samples // n_candidates
+
+def iter_harvest_chunks(path: str, chunk_size: int = 100000) -> Iterator[pd.DataFrame]:
+    """Потоковое чтение наблюдений урожайности кусками из CSV или Parquet"""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=HARVEST_COLUMNS):
+            yield batch.to_pandas()
+    else:
+        for chunk in pd.read_csv(path, usecols=HARVEST_COLUMNS, chunksize=chunk_size):
+            yield chunk
+
+def load_harvest_data(paths: List[str], chunk_size: int = 100000) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Сбор признаков и урожайности по культурам. Куски сразу переводятся
+    в компактные float32 массивы, DataFrame целиком в памяти не держится
+    """
+    features: Dict[str, List[np.ndarray]] = {}
+    targets: Dict[str, List[np.ndarray]] = {}
+    
+    for path in paths:
+        for chunk in iter_harvest_chunks(path, chunk_size):
+            chunk = chunk.dropna()
+            chunk = chunk[chunk['actual_yield'] >= 0]
+            chunk['fertilizer'] = chunk['fertilizer_used'].astype(float)
+            
+            for crop, group in chunk.groupby('crop_type'):
+                crop = str(crop).strip().lower()
+                features.setdefault(crop, []).append(group[FEATURE_NAMES].to_numpy(dtype=np.float32))
+                targets.setdefault(crop, []).append(group['actual_yield'].to_numpy(dtype=np.float32))
+    
+    return {
+        crop: (np.concatenate(features[crop]), np.concatenate(targets[crop]))
+        for crop in features
+    }
+
+def generate_synthetic_data(n_samples: int, seed: int) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """Синтетические наблюдения для всех культур (как у демо-моделей)"""
+    return {
+        crop: AdvancedYieldModel._generate_training_data(crop, n_samples, seed + index)
+        for index, crop in enumerate(YIELD_CROPS)
+    }
+
+def train_crop_model(crop: str, X: np.ndarray, y: np.ndarray, seed_sequence: np.random.SeedSequence,
+                     search: bool = True) -> Dict[str, Any]:
+    """
+    Обучение модели одной культуры в отдельном процессе.
+    Случайность берется только из собственного Generator культуры
+    """
+    start = time.perf_counter()
+    rng = np.random.default_rng(seed_sequence)
+    random_state = int(rng.integers(0, 2 ** 31 - 1))
+    
+    if search and len(y) >= MIN_SAMPLES_FOR_SEARCH:
+        n_candidates, min_resources = search_schedule(len(y))
+        halving_search = HalvingRandomSearchCV(
+            RandomForestRegressor(random_state=random_state),
+            PARAM_DISTRIBUTIONS,
+            n_candidates=n_candidates,
+            resource='n_samples',
+            min_resources=min_resources,
+            max_resources=len(y),
+            factor=SEARCH_FACTOR,
+            cv=SEARCH_CV,
+            random_state=random_state,
+            n_jobs=1
+        )
+        halving_search.fit(X, y)
+        model = halving_search.best_estimator_
+        params = halving_search.best_params_
+        cv_score = float(halving_search.best_score_)
+    else:
+        model = RandomForestRegressor(n_estimators=100, max_depth=10, random_state=random_state)
+        model.fit(X, y)
+        params = {'n_estimators': 100, 'max_depth': 10}
+        cv_score = None
+    
+    # ru_maxrss в Linux в килобайтах, в macOS в байтах
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = peak_rss / (1024 * 1024) if sys.platform == 'darwin' else peak_rss / 1024
+    
+    return {
+        'crop': crop,
+        'model': model,
+        'params': params,
+        'cv_r2': cv_score,
+        'n_samples': int(len(y)),
+        'wall_clock_s': round(time.perf_counter() - start, 3),
+        'peak_rss_mb': round(peak_rss_mb, 1)
+    }
+
+class YieldTrainingPipeline:
+    def __init__(self, output_dir: str, workers: Optional[int] = None, seed: int = 42, search: bool = True):
+        self.output_dir = output_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.seed = seed
+        self.search = search
+    
+    def run(self, datasets: Dict[str, Tuple[np.ndarray, np.ndarray]]) -> Dict[str, Any]:
+        """Параллельное обучение культур и запись артефактов с манифестом"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        crops = sorted(datasets)
+        seed_sequences = dict(zip(crops, np.random.SeedSequence(self.seed).spawn(len(crops))))
+        
+        # Новый процесс на каждую культуру: пик памяти измеряется для нее одной
+        executor_kwargs = {'max_workers': min(self.workers, len(crops))}
+        if sys.version_info >= (3, 11):
+            executor_kwargs['max_tasks_per_child'] = 1
+        
+        reports = {}
+        with ProcessPoolExecutor(**executor_kwargs) as executor:
+            futures = [
+                executor.submit(train_crop_model, crop, X, y, seed_sequences[crop], self.search)
+                for crop, (X, y) in ((crop, datasets[crop]) for crop in crops)
+            ]
+            
+            for future in as_completed(futures):
+                result = future.result()
+                crop = result.pop('crop')
+                model = result.pop('model')
+                result.update(self._write_artifact(crop, model))
+                reports[crop] = result
+                logger.info(f"Модель {crop} обучена за {result['wall_clock_s']} с")
+        
+        self._write_manifest(reports)
+        return reports
+    
+    def _write_artifact(self, crop: str, model: RandomForestRegressor) -> Dict[str, str]:
+        """Атомарная запись артефакта модели"""
+        return write_model_artifact(self.output_dir, crop, model)
+    
+    def _write_manifest(self, reports: Dict[str, Any]):
+        """
+        Обновление манифеста: записи обученных культур заменяются целиком, чтобы
+        дообучение не подхватило base_artifact и feedback_rows прежней модели
+        """
+        update_manifest(self.output_dir, reports, replace=True)
+
+def write_model_artifact(models_dir: str, crop: str, model: RandomForestRegressor) -> Dict[str, str]:
+    """Атомарная запись артефакта модели культуры с новой версией"""
+    os.makedirs(models_dir, exist_ok=True)
+    version = f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    artifact = f"{crop}-{version}.joblib"
+    path = os.path.join(models_dir, artifact)
+    
+    joblib.dump(model, path + '.tmp')
+    os.replace(path + '.tmp', path)
+    
+    return {'version': version, 'artifact': artifact}
+
+def read_manifest(models_dir: str) -> Dict[str, Any]:
+    """Чтение манифеста артефактов (пустой, если его еще нет)"""
+    manifest_path = os.path.join(models_dir, 'manifest.json')
+    if not os.path.exists(manifest_path):
+        return {'crops': {}}
+    
+    with open(manifest_path, encoding='utf-8') as f:
+        return json.load(f)
+
+def update_manifest(models_dir: str, crop_entries: Dict[str, Any], replace: bool = False):
+    """
+    Атомарное обновление записей культур в манифесте под файловой блокировкой.
+    replace=True заменяет запись культуры целиком (полное обучение), иначе
+    новые поля дописываются поверх прежних (дообучение)
+    """
+    os.makedirs(models_dir, exist_ok=True)
+    manifest_path = os.path.join(models_dir, 'manifest.json')
+    
+    with open(os.path.join(models_dir, '.manifest.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        
+        manifest = read_manifest(models_dir)
+        for crop, entry in crop_entries.items():
+            manifest['crops'][crop] = entry if replace else {**manifest['crops'].get(crop, {}), **entry}
+        manifest['updated_at'] = datetime.now().isoformat()
+        
+        with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(manifest_path + '.tmp', manifest_path)
@@ -0,0 +1,200 @@
+import os
+import json
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+
+# Доверять X-Forwarded-For при определении клиента (только за своим прокси)
+ADMISSION_TRUST_FORWARDED = os.getenv("ADMISSION_TRUST_FORWARDED", "false").lower() == "true"
+
+# Сколько корзин клиентов хранится на маршрут (самые давние вытесняются)
+MAX_CLIENT_BUCKETS = 10000
+
+@dataclass
+class RoutePolicy:
+    """Политика допуска маршрута: адаптивный лимит параллелизма и корзина токенов клиента"""
+    initial_limit: int
+    min_limit: int
+    max_limit: int
+    target_latency_s: float
+    client_rate: float
+    client_burst: int
+
+# Контролируются только дорогие маршруты; остальные (/health, /api/crops, ...) проходят без проверок
+DEFAULT_ROUTE_POLICIES = {
+    '/api/analyze-plant': RoutePolicy(4, 1, 32, 2.0, 1.0, 5),
+    '/api/batch-analysis': RoutePolicy(2, 1, 8, 10.0, 0.2, 2),
+    '/api/analyze-orthomosaic': RoutePolicy(1, 1, 4, 120.0, 0.05, 2),
+    '/api/predict-yield': RoutePolicy(16, 2, 64, 0.5, 5.0, 20),
+    '/api/predict-yield/scenarios': RoutePolicy(4, 1, 16, 2.0, 1.0, 5),
+    '/api/chat': RoutePolicy(8, 2, 64, 3.0, 2.0, 10),
+}
+
+class AIMDLimiter:
+    """
+    Лимит одновременных запросов, подстраиваемый по задержке (AIMD):
+    быстрый ответ увеличивает лимит на 1/limit, медленный или ошибочный
+    уменьшает его в BACKOFF раз
+    """
+    
+    BACKOFF = 0.9
+    
+    def __init__(self, policy: RoutePolicy):
+        self.policy = policy
+        self.limit = float(policy.initial_limit)
+        self.in_flight = 0
+        self.latency_ewma: Optional[float] = None
+        self.admitted = 0
+        self.rejected = 0
+    
+    def try_acquire(self) -> bool:
+        if self.in_flight >= int(self.limit):
+            self.rejected += 1
+            return False
+        self.in_flight += 1
+        self.admitted += 1
+        return True
+    
+    def release(self, latency_s: float, failed: bool):
+        self.in_flight -= 1
+        self.latency_ewma = latency_s if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency_s
+        
+        if failed or latency_s > self.policy.target_latency_s:
+            self.limit = max(self.policy.min_limit, self.limit * self.BACKOFF)
+        else:
+            self.limit = min(self.policy.max_limit, self.limit + 1 / self.limit)
+    
+    def retry_after(self) -> int:
+        """Оценка времени до освобождения слота (секунды)"""
+        return max(1, math.ceil(self.latency_ewma or self.policy.target_latency_s))
+    
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'limit': round(self.limit, 2),
+            'in_flight': self.in_flight,
+            'latency_ewma_ms': round(self.latency_ewma * 1000, 1) if self.latency_ewma is not None else None,
+            'admitted': self.admitted,
+            'rejected_overload': self.rejected
+        }
+
+class TokenBuckets:
+    """Корзины токенов по клиентам одного маршрута (LRU с ограничением размера)"""
+    
+    def __init__(self, rate: float, burst: int, max_clients: int = MAX_CLIENT_BUCKETS):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self.rejected = 0
+    
+    def try_take(self, client: str, now: float) -> Tuple[bool, int]:
+        """Списание токена; при отказе возвращает время ожидания следующего токена"""
+        tokens, updated = self.buckets.pop(client, (float(self.burst), now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        else:
+            self.rejected += 1
+        
+        self.buckets[client] = (tokens, now)
+        if len(self.buckets) > self.max_clients:
+            self.buckets.popitem(last=False)
+        
+        return allowed, 0 if allowed else max(1, math.ceil((1 - tokens) / self.rate))
+
+class AdmissionController:
+    """Состояние контроля допуска: лимитеры и корзины токенов по маршрутам"""
+    
+    def __init__(self, policies: Optional[Dict[str, RoutePolicy]] = None, enabled: bool = ADMISSION_ENABLED):
+        self.enabled = enabled
+        policies = policies if policies is not None else DEFAULT_ROUTE_POLICIES
+        self.limiters = {path: AIMDLimiter(policy) for path, policy in policies.items()}
+        self.buckets = {path: TokenBuckets(policy.client_rate, policy.client_burst) for path, policy in policies.items()}
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Текущее состояние лимитов по маршрутам"""
+        return {
+            path: {**limiter.snapshot(), 'rejected_rate_limit': self.buckets[path].rejected}
+            for path, limiter in self.limiters.items()
+        }
+
+class AdmissionControlMiddleware:
+    """
+    ASGI middleware допуска запросов: корзина токенов клиента (429) и
+    адаптивный лимит параллелизма маршрута (503), оба с Retry-After.
+    Отказ формируется сразу, без ожидания в очереди
+    """
+    
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+    
+    async def __call__(self, scope, receive, send):
+        controller = self.controller
+        if (scope['type'] != 'http' or not controller.enabled or scope['method'] == 'OPTIONS'
+                or scope['path'] not in controller.limiters):
+            await self.app(scope, receive, send)
+            return
+        
+        path = scope['path']
+        allowed, retry_after = controller.buckets[path].try_take(self._client_key(scope), time.monotonic())
+        if not allowed:
+            await self._reject(send, 429, "Слишком много запросов, повторите позже", retry_after)
+            return
+        
+        limiter = controller.limiters[path]
+        if not limiter.try_acquire():
+            await self._reject(send, 503, "Сервис перегружен, повторите позже", limiter.retry_after())
+            return
+        
+        start = time.monotonic()
+        status = {'code': 500}
+        
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Для потоковых ответов время считается до конца тела
+            limiter.release(time.monotonic() - start, failed=status['code'] >= 500)
+    
+    @staticmethod
+    def _client_key(scope) -> str:
+        if ADMISSION_TRUST_FORWARDED:
+            for name, value in scope.get('headers', []):
+                if name == b'x-forwarded-for':
+                    return value.decode('latin-1').split(',')[0].strip()
+        client = scope.get('client')
+        return client[0] if client else 'unknown'
+    
+    @staticmethod
+    async def _reject(send, status_code: int, message: str, retry_after: int):
+        body = json.dumps({
+            "status": "error",
+            "timestamp": datetime.now().isoformat(),
+            "error": {
+                "type": "rate_limited" if status_code == 429 else "overloaded",
+                "message": message
+            }
+        }, ensure_ascii=False).encode('utf-8')
+        
+        await send({
+            'type': 'http.response.start',
+            'status': status_code,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode()),
+                (b'retry-after', str(retry_after).encode()),
+            ]
+        })
+        await send({'type': 'http.response.body', 'body': body})
@@ -0,0 +1,78 @@
+import re
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+# Окончания, отбрасываемые легким стеммером (от длинных к коротким)
+RUSSIAN_ENDINGS = sorted([
+    'иями', 'ями', 'ами', 'ией', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ых', 'их', 'ой', 'ей', 'ий', 'ый',
+    'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ую', 'юю', 'ов', 'ев', 'ам', 'ям', 'ах', 'ях', 'ом', 'ем', 'ия', 'ию',
+    'ть', 'ет', 'ют', 'ит', 'ят', 'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь',
+], key=len, reverse=True)
+
+MIN_STEM_LENGTH = 4
+
+TOKEN_PATTERN = re.compile(r"[a-zа-яөүң0-9]+")
+
+def stem(token: str) -> str:
+    """Легкий стемминг: отбрасывание одного окончания, если остается основа от 4 букв"""
+    for ending in RUSSIAN_ENDINGS:
+        if token.endswith(ending) and len(token) - len(ending) >= MIN_STEM_LENGTH:
+            return token[:-len(ending)]
+    return token
+
+def simple_tokens(text: str) -> List[str]:
+    return [stem(token) for token in TOKEN_PATTERN.findall(text.lower().replace('ё', 'е')) if len(token) > 2]
+
+class BM25Index:
+    """
+    Разреженный BM25 индекс: веса BM25 (idf × насыщенная tf с нормировкой
+    длины) считаются один раз и хранятся в CSC матрице документ × термин.
+    Запрос складывает только списки вхождений своих терминов (столбцы матрицы)
+    """
+    
+    def __init__(self, documents: Sequence[List[str]], k1: float = 1.5, b: float = 0.75):
+        self.vocabulary: Dict[str, int] = {}
+        rows, cols, counts = [], [], []
+        lengths = np.zeros(len(documents), dtype=np.float32)
+        
+        for doc_id, tokens in enumerate(documents):
+            lengths[doc_id] = len(tokens)
+            for term, count in Counter(tokens).items():
+                rows.append(doc_id)
+                cols.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                counts.append(count)
+        
+        rows = np.asarray(rows, dtype=np.int32)
+        cols = np.asarray(cols, dtype=np.int32)
+        tf = np.asarray(counts, dtype=np.float32)
+        
+        self.num_documents = len(documents)
+        average_length = float(lengths.mean()) if len(documents) and lengths.mean() > 0 else 1.0
+        document_frequency = np.bincount(cols, minlength=len(self.vocabulary)).astype(np.float32)
+        self.idf = np.log1p((self.num_documents - document_frequency + 0.5) / (document_frequency + 0.5))
+        
+        weights = self.idf[cols] * tf * (k1 + 1) / (tf + k1 * (1 - b + b * lengths[rows] / average_length))
+        self.matrix = sparse.csc_matrix(
+            (weights.astype(np.float32), (rows, cols)), shape=(self.num_documents, len(self.vocabulary))
+        )
+    
+    def search(self, tokens: List[str], k: int = 3) -> List[Tuple[int, float]]:
+        """Top-k документов (id, score) по убыванию score"""
+        term_ids = {self.vocabulary[token] for token in tokens if token in self.vocabulary}
+        if not term_ids:
+            return []
+        
+        # Накопление только по спискам вхождений терминов запроса
+        indptr, indices, data = self.matrix.indptr, self.matrix.indices, self.matrix.data
+        scores = np.zeros(self.num_documents, dtype=np.float32)
+        for term_id in term_ids:
+            start, end = indptr[term_id], indptr[term_id + 1]
+            scores[indices[start:end]] += data[start:end]
+        
+        k = min(k, self.num_documents)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(int(doc_id), float(scores[doc_id])) for doc_id in top if scores[doc_id] > 0]
@@ -0,0 +1,91 @@
+import os
+import json
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# Маршруты, для которых одинаковые одновременные запросы объединяются
+COALESCING_ROUTES = [
+    route.strip() for route in os.getenv("COALESCING_ROUTES", "chat,predict_yield").split(",") if route.strip()
+]
+
+def normalize_text(text: str) -> str:
+    """Нормализация текста запроса: регистр и пробелы"""
+    return " ".join(text.lower().split())
+
+def request_key(payload: Dict[str, Any]) -> str:
+    """Ключ запроса: хэш канонического JSON (порядок полей и округление чисел не влияют)"""
+    canonical = {
+        name: round(value, 6) if isinstance(value, float) else value
+        for name, value in payload.items()
+    }
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+class SingleFlight:
+    """
+    Объединение одновременных одинаковых вычислений: первый запрос запускает
+    задачу, остальные с тем же ключом ждут ее результат. Отмена ожидающего
+    запроса (обрыв соединения) не отменяет общую задачу
+    """
+    
+    def __init__(self, name: str, enabled: bool = True):
+        self.name = name
+        self.enabled = enabled
+        self.in_flight: Dict[str, asyncio.Task] = {}
+        self.requests = 0
+        self.executions = 0
+        self.collapsed = 0
+        self.errors = 0
+    
+    async def run(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        self.requests += 1
+        if not self.enabled:
+            self.executions += 1
+            return await func()
+        
+        task = self.in_flight.get(key)
+        if task is not None:
+            self.collapsed += 1
+        else:
+            self.executions += 1
+            task = asyncio.ensure_future(func())
+            self.in_flight[key] = task
+            task.add_done_callback(lambda done, key=key: self._finish(key, done))
+        
+        return await asyncio.shield(task)
+    
+    def _finish(self, key: str, task: asyncio.Task):
+        if self.in_flight.get(key) is task:
+            del self.in_flight[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.errors += 1
+    
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'requests': self.requests,
+            'executions': self.executions,
+            'collapsed': self.collapsed,
+            'collapse_ratio': round(self.collapsed / self.requests, 4) if self.requests else 0.0,
+            'in_flight': len(self.in_flight),
+            'errors': self.errors
+        }
+
+class RequestCoalescer:
+    """Группы single-flight по маршрутам; объединение включается для маршрута явно"""
+    
+    def __init__(self, enabled_routes: Optional[list] = None):
+        self.enabled_routes = set(enabled_routes if enabled_routes is not None else COALESCING_ROUTES)
+        self.groups: Dict[str, SingleFlight] = {}
+    
+    def group(self, route: str) -> SingleFlight:
+        if route not in self.groups:
+            self.groups[route] = SingleFlight(route, enabled=route in self.enabled_routes)
+        return self.groups[route]
+    
+    async def run(self, route: str, payload: Dict[str, Any], func: Callable[[], Awaitable[Any]]) -> Any:
+        """Выполнение func с объединением одинаковых (по payload) одновременных запросов маршрута"""
+        return await self.group(route).run(request_key(payload), func)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        return {route: group.snapshot() for route, group in self.groups.items()}
@@ -1,9 +1,109 @@
 import os
+import io
+import json
+import mmap
 import uuid
+import hashlib
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional, Union
 import aiofiles
 
+class UploadTooLargeError(Exception):
+    """Загруженный файл превышает допустимый размер"""
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        super().__init__(f"Upload exceeds {max_size} bytes")
+
+class SpooledUpload:
+    """Проверенная загрузка: содержимое в памяти или во временном файле на диске"""
+    def __init__(self, file, size: int, sha256: str, header: bytes, on_disk: bool):
+        self.file = file
+        self.size = size
+        self.sha256 = sha256
+        self.header = header
+        self.on_disk = on_disk
+        self._mmap: Optional[mmap.mmap] = None
+    
+    def buffer(self) -> Union[mmap.mmap, io.BytesIO]:
+        """Буфер для декодера без копирования содержимого"""
+        if self.on_disk:
+            if self._mmap is None:
+                self._mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mmap.seek(0)
+            return self._mmap
+        self.file.seek(0)
+        return self.file
+    
+    def close(self):
+        """Освобождение отображения и временного файла"""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self.file.close()
+
+class UploadLimitMiddleware:
+    """
+    Отказ 413 по размеру тела запроса до разбора multipart: по заголовку
+    Content-Length сразу, а без него (chunked) - как только принятое тело
+    превысит лимит маршрута. Без этого парсер Starlette принимает и
+    сохраняет файл целиком, прежде чем эндпоинт увидит его размер
+    """
+    
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+    
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope['path']) if scope['type'] == 'http' and scope['method'] == 'POST' else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        
+        for name, value in scope.get('headers', []):
+            if name == b'content-length' and value.isdigit() and int(value) > limit:
+                await self._reject(send, limit)
+                return
+        
+        state = {'received': 0, 'exceeded': False}
+        
+        async def limited_receive():
+            message = await receive()
+            if message['type'] == 'http.request':
+                state['received'] += len(message.get('body', b''))
+                if state['received'] > limit:
+                    state['exceeded'] = True
+                    raise UploadTooLargeError(limit)
+            return message
+        
+        async def guarded_send(message):
+            # Ответ приложения на прерванный разбор тела (400) заменяется отказом 413
+            if not state['exceeded']:
+                await send(message)
+        
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except UploadTooLargeError:
+            if not state['exceeded']:
+                raise
+        if state['exceeded']:
+            await self._reject(send, limit)
+    
+    @staticmethod
+    async def _reject(send, limit: int):
+        body = json.dumps({
+            "detail": f"Размер запроса не должен превышать {limit // (1024 * 1024)}MB"
+        }, ensure_ascii=False).encode('utf-8')
+        await send({
+            'type': 'http.response.start',
+            'status': 413,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode()),
+                (b'connection', b'close'),
+            ]
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
 class FileManager:
     def __init__(self, upload_dir: str = "temp_uploads"):
         self.upload_dir = upload_dir
@@ -22,6 +122,44 @@ class FileManager:
         except Exception as e:
             raise Exception(f"File save error: {str(e)}")
     
+    async def stream_upload(self, upload, max_size: int, chunk_size: int = 64 * 1024,
+                            spool_threshold: int = 1024 * 1024, header_size: int = 32) -> SpooledUpload:
+        """
+        Проверка загрузки, уже принятой парсером multipart: размер, SHA-256 и
+        заголовок формата за один проход чтения. Содержимое не копируется -
+        используется временный файл парсера (больше spool_threshold - на диске).
+        Отказ по размеру до приема тела выполняет UploadLimitMiddleware
+        """
+        declared_size = getattr(upload, 'size', None)
+        if declared_size is not None and declared_size > max_size:
+            raise UploadTooLargeError(max_size)
+        
+        digest = hashlib.sha256()
+        header = b''
+        size = 0
+        
+        await upload.seek(0)
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                break
+            
+            size += len(chunk)
+            if size > max_size:
+                raise UploadTooLargeError(max_size)
+            
+            if len(header) < header_size:
+                header += chunk[:header_size - len(header)]
+            
+            digest.update(chunk)
+        
+        file = upload.file
+        on_disk = size > spool_threshold
+        if on_disk and hasattr(file, 'rollover'):
+            # Для SpooledTemporaryFile, уже сброшенного парсером на диск, rollover() ничего не делает
+            file.rollover()
+        return SpooledUpload(file, size, digest.hexdigest(), header, on_disk)
+    
     async def cleanup_file(self, filepath: str):
         """Удаление временного файла"""
         try:
@@ -32,4 +170,4 @@ class FileManager:
     
     def get_file_size(self, filepath: str) -> int:
         """Получение размера файла"""
-        return os.path.getsize(filepath)
\ No newline at end of file
+        return os.path.getsize(filepath)
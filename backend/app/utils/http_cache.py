@@ -0,0 +1,220 @@
+import os
+import gzip
+import json
+import zlib
+import hashlib
+import logging
+from typing import Any, Dict, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен: без него отдается только gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Ответы меньше этого размера не сжимаются (заголовки дороже выигрыша)
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+
+# Динамические ответы сжимаются быстрым уровнем brotli, предсжатые тексты - максимальным
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 4))
+PRECOMPRESSED_BROTLI_QUALITY = 11
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/', 'application/javascript', 'image/svg+xml')
+
+def supported_encodings() -> tuple:
+    """Поддерживаемые кодировки в порядке предпочтения"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+def negotiate_encoding(accept_encoding: str, available: Optional[tuple] = None) -> Optional[str]:
+    """Выбор кодировки по Accept-Encoding с учетом q-весов (br предпочтительнее gzip)"""
+    weights = {}
+    for item in accept_encoding.lower().split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            weights[name] = quality
+    
+    best, best_quality = None, 0.0
+    for encoding in available if available is not None else supported_encodings():
+        quality = weights.get(encoding, weights.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Слабое сравнение If-None-Match (RFC 9110): W/ префикс не учитывается"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    return any(
+        (candidate.strip()[2:] if candidate.strip().startswith('W/') else candidate.strip()) == opaque
+        for candidate in if_none_match.split(',')
+    )
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={'ETag': etag, 'Cache-Control': cache_control, 'Vary': 'Accept-Encoding'})
+
+def json_bytes(payload: Any) -> bytes:
+    """Сериализация как в JSONResponse FastAPI"""
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode('utf-8')
+
+class PrecompressedBody:
+    """
+    Неизменяемое тело ответа, сжатое один раз (gzip и brotli) с готовыми ETag.
+    Отдается в кодировке клиента без сжатия на каждый запрос. У каждой кодировки
+    свой сильный ETag (суффикс -gzip/-br): байты вариантов различаются
+    """
+    
+    def __init__(self, body: bytes, media_type: str = 'application/json', cache_control: str = 'public, max-age=86400'):
+        self.media_type = media_type
+        self.cache_control = cache_control
+        self.variants = {None: body, 'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.variants['br'] = brotli.compress(body, quality=PRECOMPRESSED_BROTLI_QUALITY)
+        
+        etag = make_etag(body)
+        self.etags = {encoding: etag if encoding is None else f'{etag[:-1]}-{encoding}"' for encoding in self.variants}
+    
+    @classmethod
+    def from_json(cls, payload: Any, **kwargs) -> 'PrecompressedBody':
+        return cls(json_bytes(payload), **kwargs)
+    
+    def sizes(self) -> Dict[str, int]:
+        return {encoding or 'identity': len(body) for encoding, body in self.variants.items()}
+    
+    def respond(self, request: Request) -> Response:
+        encoding = negotiate_encoding(request.headers.get('accept-encoding', ''))
+        if len(self.variants[None]) < COMPRESSION_MIN_SIZE:
+            encoding = None
+        
+        etag = self.etags[encoding]
+        if etag_matches(request.headers.get('if-none-match'), etag):
+            return not_modified(etag, self.cache_control)
+        
+        headers = {'ETag': etag, 'Cache-Control': self.cache_control, 'Vary': 'Accept-Encoding'}
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        return Response(self.variants[encoding], media_type=self.media_type, headers=headers)
+
+class StreamCompressor:
+    """Инкрементальное сжатие тела; flush после каждого куска, чтобы потоковые ответы не задерживались"""
+    
+    def __init__(self, encoding: str):
+        if encoding == 'br':
+            self.compressor = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+        else:
+            self.compressor = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+        self.encoding = encoding
+    
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if self.encoding == 'br':
+            out = self.compressor.process(data)
+            return out + (self.compressor.finish() if final else self.compressor.flush())
+        out = self.compressor.compress(data)
+        return out + self.compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+class CompressionMiddleware:
+    """
+    ASGI middleware сжатия ответов gzip/brotli по Accept-Encoding.
+    Не трогает уже сжатые (предсжатые) ответы, бинарные типы и тела меньше
+    COMPRESSION_MIN_SIZE. ETag сжатого ответа становится слабым
+    """
+    
+    def __init__(self, app, min_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.min_size = min_size
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        
+        accept_encoding = ''
+        for name, value in scope.get('headers', []):
+            if name == b'accept-encoding':
+                accept_encoding = value.decode('latin-1')
+                break
+        encoding = negotiate_encoding(accept_encoding)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        
+        state = {'start': None, 'compressor': None, 'passthrough': False}
+        
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                state['start'] = message
+                return
+            if message['type'] != 'http.response.body' or state['passthrough']:
+                # Тело без http.response.body (pathsend у FileResponse и т.п.) не сжимается:
+                # придержанный start уходит первым, дальше ответ идет как есть
+                if state['start'] is not None and state['compressor'] is None and not state['passthrough']:
+                    state['passthrough'] = True
+                    await send(state['start'])
+                await send(message)
+                return
+            
+            body = message.get('body', b'')
+            more_body = message.get('more_body', False)
+            
+            if state['compressor'] is None:
+                start = state['start']
+                headers = {name.lower(): value for name, value in start['headers']}
+                content_type = headers.get(b'content-type', b'').decode('latin-1')
+                if (b'content-encoding' in headers or start['status'] < 200 or start['status'] in (204, 304)
+                        or not content_type.startswith(COMPRESSIBLE_TYPES)
+                        or (not more_body and len(body) < self.min_size)):
+                    state['passthrough'] = True
+                    await send(start)
+                    await send(message)
+                    return
+                
+                state['compressor'] = StreamCompressor(encoding)
+                await send({**start, 'headers': self._compressed_headers(start['headers'], encoding)})
+            
+            await send({
+                'type': 'http.response.body',
+                'body': state['compressor'].compress(body, final=not more_body),
+                'more_body': more_body
+            })
+        
+        await self.app(scope, receive, send_wrapper)
+    
+    @staticmethod
+    def _compressed_headers(raw_headers, encoding: str) -> list:
+        headers = []
+        vary = None
+        for name, value in raw_headers:
+            lowered = name.lower()
+            if lowered == b'content-length':
+                continue
+            if lowered == b'etag' and not value.startswith(b'W/'):
+                value = b'W/' + value
+            if lowered == b'vary':
+                vary = value
+                continue
+            headers.append((name, value))
+        
+        if vary is None:
+            vary = b'Accept-Encoding'
+        elif b'accept-encoding' not in vary.lower():
+            vary += b', Accept-Encoding'
+        headers.append((b'vary', vary))
+        headers.append((b'content-encoding', encoding.encode()))
+        return headers
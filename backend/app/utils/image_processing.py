@@ -2,16 +2,46 @@ import cv2
 import numpy as np
 from PIL import Image
 import io
+import os
+import mmap
+from typing import BinaryIO, Optional, Tuple, Union
+
+# Потоки внутреннего параллелизма OpenCV на весь процесс: cv2.setNumThreads
+# глобальный, а параллелизм по изображениям и фрагментам обеспечивают пулы анализа
+CV_THREADS = int(os.getenv("CV_THREADS", 1))
+
+def limit_cv_threads():
+    """Ограничение потоков OpenCV для всего процесса (общее для всех пулов)"""
+    cv2.setNumThreads(CV_THREADS)
+
+# Маска растительности строится на уменьшенной в VEGETATION_MASK_SCALE раз копии
+VEGETATION_MASK_SCALE = 4
+
+# Тон от желтого до зеленого (шкала OpenCV 0-180): захватывает и хлорозные листья
+VEGETATION_HSV_LOWER = (22, 40, 30)
+VEGETATION_HSV_UPPER = (95, 255, 255)
+
+# Порог индекса избыточной зелени ExG = 2G - R - B (шкала 0-255)
+EXG_THRESHOLD = 20
+
+# Если листьев меньше этой доли кадра, анализируется все изображение
+MIN_LEAF_AREA_FRACTION = 0.02
+
+# Запас вокруг ограничивающего прямоугольника (пиксели уменьшенной копии)
+ROI_PADDING = 2
 
 class ImageProcessor:
     @staticmethod
-    def preprocess_image(image_data: bytes, target_size: tuple = (224, 224)) -> np.ndarray:
+    def preprocess_image(image_data: Union[bytes, BinaryIO], target_size: tuple = (224, 224)) -> np.ndarray:
         """
-        Препроцессинг изображения для ML модели
+        Препроцессинг изображения для ML модели.
+        Принимает байты или файловый буфер (например, mmap загрузки) без копирования
         """
         try:
             # Чтение изображения
-            image = Image.open(io.BytesIO(image_data))
+            if isinstance(image_data, (bytes, bytearray)):
+                image_data = io.BytesIO(image_data)
+            image = Image.open(image_data)
             
             # Конвертация в RGB если нужно
             if image.mode != 'RGB':
@@ -31,6 +61,13 @@ class ImageProcessor:
         except Exception as e:
             raise Exception(f"Image processing error: {str(e)}")
     
+    @staticmethod
+    def to_uint8(image_array: np.ndarray) -> np.ndarray:
+        """uint8 представление изображения (без копии, если оно уже uint8)"""
+        if image_array.dtype == np.uint8:
+            return image_array
+        return (image_array * 255).astype(np.uint8)
+    
     @staticmethod
     def extract_features(image_array: np.ndarray) -> np.ndarray:
         """
@@ -58,11 +95,83 @@ class ImageProcessor:
         
         return np.array(features)
     
+    @staticmethod
+    def vegetation_roi(image_array: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray], float]:
+        """
+        Выделение области листьев: HSV и ExG пороги на уменьшенной копии,
+        затем обрезка по ограничивающему прямоугольнику.
+        Возвращает (ROI изображения, маску листьев в ROI, долю листьев в кадре);
+        если листья не найдены, маска None и анализируется весь кадр
+        """
+        height, width = image_array.shape[:2]
+        small_size = (max(width // VEGETATION_MASK_SCALE, 1), max(height // VEGETATION_MASK_SCALE, 1))
+        small = ImageProcessor.to_uint8(cv2.resize(image_array, small_size, interpolation=cv2.INTER_AREA))
+        
+        hsv = cv2.cvtColor(small, cv2.COLOR_RGB2HSV)
+        mask = cv2.inRange(hsv, VEGETATION_HSV_LOWER, VEGETATION_HSV_UPPER)
+        
+        # ExG дополняет HSV на темной зелени с малой яркостью
+        red, green, blue = cv2.split(small.astype(np.int16))
+        mask |= ((2 * green - red - blue) > EXG_THRESHOLD).astype(np.uint8) * 255
+        
+        # Удаление одиночных пикселей (шум, блики)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
+        
+        leaf_area_fraction = cv2.countNonZero(mask) / mask.size
+        if leaf_area_fraction < MIN_LEAF_AREA_FRACTION:
+            return image_array, None, leaf_area_fraction
+        
+        x, y, w, h = cv2.boundingRect(mask)
+        small_x0, small_y0 = max(x - ROI_PADDING, 0), max(y - ROI_PADDING, 0)
+        small_x1, small_y1 = min(x + w + ROI_PADDING, small_size[0]), min(y + h + ROI_PADDING, small_size[1])
+        
+        x0, y0 = small_x0 * VEGETATION_MASK_SCALE, small_y0 * VEGETATION_MASK_SCALE
+        x1 = width if small_x1 == small_size[0] else small_x1 * VEGETATION_MASK_SCALE
+        y1 = height if small_y1 == small_size[1] else small_y1 * VEGETATION_MASK_SCALE
+        
+        roi_mask = cv2.resize(mask[small_y0:small_y1, small_x0:small_x1], (x1 - x0, y1 - y0),
+                              interpolation=cv2.INTER_NEAREST)
+        return image_array[y0:y1, x0:x1], roi_mask, leaf_area_fraction
+    
     @staticmethod
     def detect_edges(image_array: np.ndarray) -> np.ndarray:
         """
         Детекция границ для анализа текстуры листьев
         """
-        gray = cv2.cvtColor((image_array * 255).astype(np.uint8), cv2.COLOR_RGB2GRAY)
+        gray = cv2.cvtColor(ImageProcessor.to_uint8(image_array), cv2.COLOR_RGB2GRAY)
         edges = cv2.Canny(gray, 50, 150)
-        return edges
\ No newline at end of file
+        return edges
+
+class OpenCVImageProcessor(ImageProcessor):
+    """
+    Движок только на OpenCV: декодирование cv2.imdecode сразу в uint8,
+    без PIL и промежуточных float копий. Функции OpenCV отпускают GIL,
+    поэтому анализ масштабируется на пуле потоков
+    """
+    
+    @staticmethod
+    def preprocess_image(image_data: Union[bytes, BinaryIO], target_size: tuple = (224, 224)) -> np.ndarray:
+        """Декодирование и уменьшение до target_size; результат RGB uint8"""
+        try:
+            if isinstance(image_data, (bytes, bytearray, memoryview, mmap.mmap)):
+                buffer = np.frombuffer(image_data, dtype=np.uint8)
+            else:
+                buffer = np.frombuffer(image_data.read(), dtype=np.uint8)
+            
+            try:
+                image = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+            finally:
+                # Представление mmap не должно пережить вызов, иначе отображение не закрыть
+                del buffer
+            
+            if image is None:
+                # Форматы без кодека OpenCV (например, GIF) декодируются через PIL
+                if hasattr(image_data, 'seek'):
+                    image_data.seek(0)
+                return ImageProcessor.to_uint8(ImageProcessor.preprocess_image(image_data, target_size))
+            
+            image = cv2.resize(image, target_size, interpolation=cv2.INTER_AREA)
+            return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        
+        except Exception as e:
+            raise Exception(f"Image processing error: {str(e)}")
\ No newline at end of file
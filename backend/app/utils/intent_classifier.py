@@ -0,0 +1,182 @@
+import os
+import json
+import zlib
+from functools import lru_cache
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+# Размер пространства хэшированных признаков и длины символьных n-грамм
+INTENT_HASH_FEATURES = 2 ** 16
+INTENT_NGRAM_RANGE = (2, 4)
+
+# Кэш слово -> индексы признаков: словарь чата невелик, слова повторяются
+INTENT_WORD_CACHE_SIZE = 50000
+
+# Регуляризация логистической регрессии при обучении
+INTENT_REGULARIZATION = 100.0
+
+class HashedNgramVectorizer:
+    """
+    Символьные n-граммы внутри слов (" слово " с границами) и само слово
+    хэшируются crc32 в фиксированное пространство: словарь не хранится,
+    новые слова и опечатки дают близкие признаки. Признаки бинарные с
+    L2 нормировкой; индексы признаков слова кэшируются в LRU
+    """
+    
+    def __init__(self, n_features: int = INTENT_HASH_FEATURES, ngram_range: Tuple[int, int] = INTENT_NGRAM_RANGE,
+                 cache_size: int = INTENT_WORD_CACHE_SIZE):
+        self.n_features = n_features
+        self.ngram_range = ngram_range
+        self.word_ids = lru_cache(maxsize=cache_size)(self._word_ids)
+    
+    def _word_ids(self, word: str) -> Tuple[int, ...]:
+        low, high = self.ngram_range
+        padded = f" {word} "
+        grams = {padded}
+        for n in range(low, high + 1):
+            grams.update(padded[i:i + n] for i in range(len(padded) - n + 1))
+        return tuple({zlib.crc32(gram.encode('utf-8')) % self.n_features for gram in grams})
+    
+    def feature_ids(self, text: str) -> np.ndarray:
+        """Индексы ненулевых признаков текста (без повторов)"""
+        ids = set()
+        for word in text.lower().replace('ё', 'е').split():
+            ids.update(self.word_ids(word))
+        return np.fromiter(ids, dtype=np.int64, count=len(ids))
+    
+    def transform(self, texts: Sequence[str]) -> sparse.csr_matrix:
+        """CSR матрица текстов × признаков"""
+        indptr = [0]
+        indices, values = [], []
+        for text in texts:
+            ids = self.feature_ids(text)
+            indices.append(ids)
+            values.append(np.full(len(ids), 1.0 / np.sqrt(len(ids)) if len(ids) else 0.0, dtype=np.float32))
+            indptr.append(indptr[-1] + len(ids))
+        
+        return sparse.csr_matrix(
+            (np.concatenate(values) if values else np.zeros(0, np.float32),
+             np.concatenate(indices) if indices else np.zeros(0, np.int64),
+             np.asarray(indptr, dtype=np.int64)),
+            shape=(len(texts), self.n_features)
+        )
+
+class IntentClassifier:
+    """
+    Линейная модель интентов над хэшированными n-граммами. Веса хранятся
+    плотной матрицей признак × интент: одно сообщение оценивается суммой
+    строк своих признаков, пакет - одним умножением разреженной матрицы
+    """
+    
+    def __init__(self, labels: List[str], weights: np.ndarray, bias: np.ndarray,
+                 vectorizer: HashedNgramVectorizer, metadata: Optional[Dict] = None):
+        self.labels = list(labels)
+        self.weights = np.ascontiguousarray(weights, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.vectorizer = vectorizer
+        self.metadata = metadata or {}
+    
+    @staticmethod
+    def _softmax(scores: np.ndarray) -> np.ndarray:
+        scores = scores - scores.max(axis=-1, keepdims=True)
+        exp = np.exp(scores)
+        return exp / exp.sum(axis=-1, keepdims=True)
+    
+    def predict(self, text: str) -> Tuple[str, float]:
+        """(интент, вероятность) для одного сообщения"""
+        ids = self.vectorizer.feature_ids(text)
+        if not len(ids):
+            scores = self.bias
+        else:
+            scores = self.weights[ids].sum(axis=0) * (1.0 / np.sqrt(len(ids))) + self.bias
+        best = int(scores.argmax())
+        # Вероятность лучшего класса без полного softmax: 1 / sum(exp(s - s_best))
+        return self.labels[best], float(1.0 / np.exp(scores - scores[best]).sum())
+    
+    def predict_batch(self, texts: Sequence[str]) -> List[Tuple[str, float]]:
+        """(интент, вероятность) для пакета сообщений"""
+        if not texts:
+            return []
+        probabilities = self._softmax(self.vectorizer.transform(texts) @ self.weights + self.bias)
+        best = probabilities.argmax(axis=1)
+        return [(self.labels[index], float(probabilities[row, index])) for row, index in enumerate(best)]
+    
+    def info(self) -> Dict:
+        return {
+            'labels': len(self.labels),
+            'features': self.vectorizer.n_features,
+            'ngram_range': list(self.vectorizer.ngram_range),
+            **self.metadata
+        }
+    
+    def save(self, path: str):
+        """Сохранение в .npz без pickle; запись через временный файл"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            labels=np.asarray(self.labels),
+            weights=self.weights,
+            bias=self.bias,
+            ngram_range=np.asarray(self.vectorizer.ngram_range),
+            metadata=np.asarray(json.dumps(self.metadata, ensure_ascii=False))
+        )
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load(cls, path: str) -> 'IntentClassifier':
+        with np.load(path, allow_pickle=False) as data:
+            weights = data['weights']
+            vectorizer = HashedNgramVectorizer(weights.shape[0], tuple(int(n) for n in data['ngram_range']))
+            return cls(
+                [str(label) for label in data['labels']], weights, data['bias'], vectorizer,
+                json.loads(str(data['metadata']))
+            )
+
+def train_intent_classifier(texts: Sequence[str], labels: Sequence[str],
+                            sample_weight: Optional[Sequence[float]] = None,
+                            n_features: int = INTENT_HASH_FEATURES,
+                            ngram_range: Tuple[int, int] = INTENT_NGRAM_RANGE,
+                            regularization: float = INTENT_REGULARIZATION) -> IntentClassifier:
+    """Обучение мультиклассовой логистической регрессии (sklearn нужен только здесь)"""
+    from sklearn.linear_model import LogisticRegression
+    
+    vectorizer = HashedNgramVectorizer(n_features, ngram_range)
+    model = LogisticRegression(C=regularization, max_iter=2000)
+    model.fit(vectorizer.transform(texts), labels, sample_weight=sample_weight)
+    
+    classes = [str(label) for label in model.classes_]
+    weights, bias = model.coef_.T, model.intercept_
+    if len(classes) == 2:
+        # Для двух классов sklearn хранит одну разделяющую строку
+        weights = np.hstack([-weights / 2, weights / 2])
+        bias = np.array([-bias[0] / 2, bias[0] / 2])
+    
+    metadata = {
+        'trained_at': datetime.now().isoformat(timespec='seconds'),
+        'n_samples': len(texts),
+        'class_counts': {label: int(sum(1 for item in labels if item == label)) for label in classes}
+    }
+    return IntentClassifier(classes, weights, bias, vectorizer, metadata)
+
+def out_of_fold_predictions(texts: Sequence[str], labels: Sequence[str], folds: int = 5, seed: int = 42,
+                            sample_weight: Optional[Sequence[float]] = None,
+                            **options) -> List[Tuple[str, float]]:
+    """Предсказания кросс-валидации: каждый текст оценивает модель, не видевшая его при обучении"""
+    from sklearn.model_selection import StratifiedKFold
+    
+    texts, labels = list(texts), list(labels)
+    weights = np.ones(len(texts)) if sample_weight is None else np.asarray(sample_weight, dtype=np.float64)
+    predictions: List[Optional[Tuple[str, float]]] = [None] * len(texts)
+    
+    splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed)
+    for train_ids, test_ids in splitter.split(texts, labels):
+        classifier = train_intent_classifier(
+            [texts[i] for i in train_ids], [labels[i] for i in train_ids], weights[train_ids], **options
+        )
+        for i, prediction in zip(test_ids, classifier.predict_batch([texts[i] for i in test_ids])):
+            predictions[i] = prediction
+    return predictions
@@ -1,17 +1,69 @@
 import joblib
 import torch
+import torch.nn as nn
 import numpy as np
 import os
-from typing import Any, Dict
+import logging
+from typing import Any, Dict, Tuple
+from torch.ao.quantization import quantize_dynamic
+
+logger = logging.getLogger(__name__)
+
+MODELS_DIR = os.getenv("MODELS_DIR", "models")
+
+# Модель растений в int8 (динамическая квантизация Linear слоев для CPU). Пока
+# PlantDiseaseClassifier.predict() работает на эвристиках, флаг меняет только
+# загружаемую модель и проверку паритета, но не ответы и скорость анализа
+PLANT_MODEL_QUANTIZED = os.getenv("PLANT_MODEL_QUANTIZED", "false").lower() == "true"
+
+# Допуски паритета int8 модели с float32: разница вероятностей и совпадение top-1 класса
+QUANTIZATION_MAX_ABS_DIFF = 0.02
+QUANTIZATION_MIN_AGREEMENT = 0.99
+PARITY_SAMPLES = 2048
+
+def quantize_plant_model(model: nn.Module) -> nn.Module:
+    """Динамическая int8 квантизация Linear слоев (активации квантуются на лету)"""
+    return quantize_dynamic(model.eval(), {nn.Linear}, dtype=torch.qint8)
+
+def check_quantization_parity(float_model: nn.Module, quantized_model: nn.Module,
+                              num_features: int, samples: int = PARITY_SAMPLES) -> Dict[str, Any]:
+    """Сравнение выходов int8 и float32 моделей на фиксированной выборке признаков"""
+    inputs = torch.from_numpy(np.random.default_rng(0).normal(size=(samples, num_features)).astype(np.float32))
+    
+    with torch.inference_mode():
+        expected = float_model.eval()(inputs)
+        actual = quantized_model(inputs)
+    
+    max_abs_diff = float((expected - actual).abs().max())
+    agreement = expected.argmax(dim=1) == actual.argmax(dim=1)
+    
+    # Почти равные вероятности классов могут поменяться местами в пределах допуска,
+    # поэтому совпадение top-1 требуется только для уверенных предсказаний
+    top2 = expected.topk(2, dim=1).values
+    decisive = (top2[:, 0] - top2[:, 1]) > 2 * QUANTIZATION_MAX_ABS_DIFF
+    decisive_agreement = float(agreement[decisive].float().mean()) if decisive.any() else 1.0
+    
+    return {
+        'max_abs_diff': round(max_abs_diff, 6),
+        'top1_agreement': round(float(agreement.float().mean()), 4),
+        'decisive_top1_agreement': round(decisive_agreement, 4),
+        'samples': samples,
+        'passed': max_abs_diff <= QUANTIZATION_MAX_ABS_DIFF and decisive_agreement >= QUANTIZATION_MIN_AGREEMENT
+    }
 
 class ModelLoader:
-    def __init__(self, models_dir: str = "models"):
+    def __init__(self, models_dir: str = MODELS_DIR):
         self.models_dir = models_dir
         self.loaded_models: Dict[str, Any] = {}
         
-    def load_plant_model(self) -> Any:
-        """Загрузка модели для анализа растений"""
+    def load_plant_model(self, quantized: bool = PLANT_MODEL_QUANTIZED) -> Any:
+        """Загрузка модели для анализа растений (float32 или int8)"""
         try:
+            if quantized:
+                model = self._load_quantized_plant_model()
+                self.loaded_models['plant'] = model
+                return model
+            
             # В реальном проекте здесь загружалась бы предобученная модель
             # Пока возвращаем заглушку
             model_path = os.path.join(self.models_dir, "plant_disease_model.pkl")
@@ -26,12 +78,55 @@ class ModelLoader:
                 os.makedirs(self.models_dir, exist_ok=True)
                 joblib.dump(model, model_path)
             
+            # Инференс без Dropout
+            model.eval()
             self.loaded_models['plant'] = model
             return model
             
         except Exception as e:
             raise Exception(f"Failed to load plant model: {str(e)}")
     
+    def _load_quantized_plant_model(self) -> nn.Module:
+        """
+        Загрузка сохраненного int8 артефакта. Если его нет, float модель
+        квантизуется, проходит проверку паритета и сохраняется
+        """
+        from app.services.plant_analysis import AdvancedPlantModel
+        
+        model_path = os.path.join(self.models_dir, "plant_disease_model_int8.pt")
+        
+        if os.path.exists(model_path):
+            artifact = torch.load(model_path)
+            model = quantize_plant_model(AdvancedPlantModel(artifact['num_features'], artifact['num_classes']))
+            model.load_state_dict(artifact['state_dict'])
+            return model
+        
+        float_model = self.load_plant_model(quantized=False)
+        model, parity = self.build_quantized_plant_model(float_model)
+        
+        if not parity['passed']:
+            logger.warning(f"int8 модель не прошла проверку паритета {parity}, используется float32")
+            return float_model
+        
+        torch.save({
+            'state_dict': model.state_dict(),
+            'num_features': float_model.classifier[0].in_features,
+            'num_classes': float_model.classifier[-2].out_features,
+            'parity': parity
+        }, model_path)
+        logger.info(f"int8 модель сохранена: {model_path}, паритет {parity}")
+        
+        return model
+    
+    @staticmethod
+    def build_quantized_plant_model(float_model: nn.Module) -> Tuple[nn.Module, Dict[str, Any]]:
+        """Квантизация float модели и проверка паритета"""
+        float_model.eval()
+        quantized_model = quantize_plant_model(float_model)
+        # quantize_dynamic копирует модель, float веса не меняются
+        parity = check_quantization_parity(float_model, quantized_model, float_model.classifier[0].in_features)
+        return quantized_model, parity
+    
     def load_yield_model(self) -> Any:
         """Загрузка модели для прогноза урожайности"""
         try:
@@ -0,0 +1,132 @@
+import os
+import time
+import resource
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# Размер куска строк, читаемого из SQLite и записываемого одной группой строк Parquet
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "50000"))
+
+# Сжатие колонок Parquet: zstd, snappy, gzip, brotli или none
+EXPORT_COMPRESSION = os.getenv("EXPORT_COMPRESSION", "zstd")
+
+# Формат времени CURRENT_TIMESTAMP в SQLite (UTC)
+SQLITE_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+MESSAGES_SCHEMA = pa.schema([
+    ('message_id', pa.int64()),
+    ('session_id', pa.string()),
+    ('user_message', pa.string()),
+    ('bot_response', pa.string()),
+    ('intent', pa.string()),
+    ('entities', pa.string()),
+    ('timestamp', pa.timestamp('s', tz='UTC')),
+])
+
+PREDICTIONS_SCHEMA = pa.schema([
+    ('prediction_id', pa.int64()),
+    ('created_at', pa.timestamp('s', tz='UTC')),
+    ('crop_type', pa.string()),
+    ('soil_quality', pa.float64()),
+    ('rainfall', pa.float64()),
+    ('temperature', pa.float64()),
+    ('area', pa.float64()),
+    ('fertilizer_used', pa.bool_()),
+    ('predicted_yield', pa.float64()),
+    ('lower', pa.float64()),
+    ('upper', pa.float64()),
+    ('confidence', pa.float64()),
+    ('model_version', pa.string()),
+])
+
+def rows_to_batch(rows: Sequence[Sequence[Any]], schema: pa.Schema) -> pa.RecordBatch:
+    """Кусок строк SQLite (кортежи в порядке схемы) в Arrow record batch по колонкам"""
+    columns = list(zip(*rows)) if rows else [()] * len(schema)
+    arrays = []
+    for field, values in zip(schema, columns):
+        if pa.types.is_timestamp(field.type):
+            # Время в SQLite хранится текстом; разбор векторный, нераспознанные значения - null
+            parsed = pc.strptime(pa.array(values, pa.string()), format=SQLITE_TIMESTAMP_FORMAT,
+                                 unit=field.type.unit, error_is_null=True)
+            arrays.append(parsed.cast(field.type))
+        else:
+            arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+class _ByteQueue:
+    """Приемник ParquetWriter: записанные байты отдаются потребителю и не копятся"""
+    
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+        self.closed = False
+    
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+    
+    def tell(self) -> int:
+        return self.position
+    
+    def flush(self):
+        pass
+    
+    def close(self):
+        self.closed = True
+    
+    def drain(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+def stream_parquet(chunks: Iterable[Sequence[Sequence[Any]]], schema: pa.Schema,
+                   compression: str = EXPORT_COMPRESSION) -> Iterator[bytes]:
+    """
+    Parquet файл по частям для потоковой отдачи: каждый кусок строк
+    становится группой строк, ее байты отдаются сразу после записи.
+    В памяти одновременно держится только один кусок
+    """
+    sink = _ByteQueue()
+    writer = pq.ParquetWriter(sink, schema, compression=compression)
+    try:
+        for rows in chunks:
+            writer.write_batch(rows_to_batch(rows, schema))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+def export_parquet(chunks: Iterable[Sequence[Sequence[Any]]], schema: pa.Schema, path: str,
+                   compression: str = EXPORT_COMPRESSION) -> Dict[str, Any]:
+    """Потоковая запись в файл (через временный файл); отчет о строках, скорости и пике памяти"""
+    tmp_path = f"{path}.tmp"
+    rows_written = 0
+    row_groups = 0
+    start = time.perf_counter()
+    
+    with pq.ParquetWriter(tmp_path, schema, compression=compression) as writer:
+        for rows in chunks:
+            writer.write_batch(rows_to_batch(rows, schema))
+            rows_written += len(rows)
+            row_groups += 1
+    os.replace(tmp_path, path)
+    
+    elapsed = time.perf_counter() - start
+    return {
+        'rows': rows_written,
+        'row_groups': row_groups,
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(rows_written / elapsed) if elapsed > 0 else None,
+        'file_bytes': os.path.getsize(path),
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }
+
+def export_filename(dataset: str, since: Optional[str] = None, until: Optional[str] = None) -> str:
+    parts = [dataset] + [value for value in (since, until) if value]
+    return '_'.join(parts) + '.parquet'
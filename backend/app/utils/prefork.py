@@ -0,0 +1,269 @@
+import os
+import gc
+import sys
+import time
+import signal
+import logging
+import importlib
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Оценка собственной (unique) памяти одного воркера для расчета их числа, МБ;
+# после запуска лаунчер сообщает измеренное значение
+WORKER_MEMORY_MB = int(os.getenv("WORKER_MEMORY_MB", "256"))
+
+# Память, оставляемая системе и мастеру при расчете числа воркеров, МБ
+WORKER_MEMORY_RESERVE_MB = int(os.getenv("WORKER_MEMORY_RESERVE_MB", "512"))
+
+# Период отчета о памяти воркеров в лог мастера (секунды, 0 - только после старта)
+WORKER_REPORT_INTERVAL = int(os.getenv("WORKER_REPORT_INTERVAL", "300"))
+
+# Время на корректное завершение воркеров перед SIGKILL (секунды)
+WORKER_SHUTDOWN_TIMEOUT = int(os.getenv("WORKER_SHUTDOWN_TIMEOUT", "30"))
+
+# PID мастера в окружении воркеров: по нему воркер находит соседей для отчета
+PREFORK_MASTER_ENV = "PREFORK_MASTER_PID"
+
+def available_cpus() -> int:
+    """Ядра, доступные процессу: affinity и квота cgroup v2 (cpu.max)"""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            cpus = min(cpus, max(1, -(-int(quota) // int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+def available_memory_bytes() -> int:
+    """Доступная память: MemAvailable и остаток лимита cgroup v2 (memory.max)"""
+    available = None
+    with open('/proc/meminfo') as f:
+        for line in f:
+            if line.startswith('MemAvailable:'):
+                available = int(line.split()[1]) * 1024
+                break
+    try:
+        with open('/sys/fs/cgroup/memory.max') as f:
+            limit = f.read().strip()
+        if limit != 'max':
+            with open('/sys/fs/cgroup/memory.current') as f:
+                remaining = int(limit) - int(f.read())
+            available = remaining if available is None else min(available, remaining)
+    except (OSError, ValueError):
+        pass
+    return available or 0
+
+def size_workers(cpus: int, memory_bytes: int, worker_mb: int = WORKER_MEMORY_MB,
+                 reserve_mb: int = WORKER_MEMORY_RESERVE_MB) -> int:
+    """Число воркеров: по воркеру на ядро, но не больше, чем помещается в память"""
+    fit = (memory_bytes - reserve_mb * 1024 * 1024) // (worker_mb * 1024 * 1024)
+    return max(1, min(cpus, int(fit)))
+
+def process_memory(pid: int) -> Optional[Dict[str, float]]:
+    """
+    RSS, PSS и USS процесса в МБ из /proc/<pid>/smaps_rollup. USS (приватные
+    страницы) - сколько памяти освободится при остановке воркера; RSS - USS -
+    страницы, общие с мастером и другими воркерами
+    """
+    values = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    values[parts[0].rstrip(':')] = int(parts[1])
+    except OSError:
+        return None
+    
+    uss = values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)
+    return {
+        'rss_mb': round(values.get('Rss', 0) / 1024, 1),
+        'pss_mb': round(values.get('Pss', 0) / 1024, 1),
+        'uss_mb': round(uss / 1024, 1),
+        'shared_mb': round((values.get('Rss', 0) - uss) / 1024, 1)
+    }
+
+def worker_pids(master_pid: int) -> List[int]:
+    """Дочерние процессы мастера"""
+    pids = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # Поле 4 после имени процесса в скобках - PPID
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        if ppid == master_pid:
+            pids.append(int(entry))
+    return sorted(pids)
+
+def memory_report(master_pid: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """Память мастера и воркеров; None, если процесс запущен не лаунчером"""
+    master_pid = master_pid or int(os.getenv(PREFORK_MASTER_ENV, "0"))
+    if not master_pid:
+        return None
+    
+    workers = {pid: process_memory(pid) for pid in worker_pids(master_pid)}
+    workers = {pid: memory for pid, memory in workers.items() if memory is not None}
+    uss = [memory['uss_mb'] for memory in workers.values()]
+    average_uss = sum(uss) / len(uss) if uss else None
+    
+    # Сколько воркеров поместится, если каждый новый займет в среднем столько же USS
+    fit = None
+    if average_uss:
+        free_mb = available_memory_bytes() / 1024 / 1024 - WORKER_MEMORY_RESERVE_MB
+        fit = len(workers) + max(0, int(free_mb // average_uss))
+    
+    return {
+        'master': {'pid': master_pid, **(process_memory(master_pid) or {})},
+        'workers': [{'pid': pid, **memory} for pid, memory in workers.items()],
+        'average_worker_uss_mb': round(average_uss, 1) if average_uss else None,
+        'workers_fit_in_memory': fit,
+        'cpus': available_cpus()
+    }
+
+class PreforkLauncher:
+    """
+    Продакшн-запуск: мастер один раз импортирует приложение (модели урожайности,
+    классификатор растений, индексы чата), замораживает сборщик мусора и
+    форкает воркеры uvicorn на общем сокете. Страницы моделей остаются общими
+    (copy-on-write); фоновые задачи стартуют в lifespan каждого воркера
+    """
+    
+    def __init__(self, app_path: str, host: str, port: int, workers: int,
+                 log_level: str = "info", report_interval: int = WORKER_REPORT_INTERVAL):
+        self.app_path = app_path
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.log_level = log_level
+        self.report_interval = report_interval
+        self.children: Dict[int, int] = {}
+        self.stopping = False
+        self.stop_deadline = float('inf')
+    
+    def load_app(self):
+        """Импорт приложения в мастере с отключенным GC (без "дыр" в страницах до форка)"""
+        gc.disable()
+        start = time.perf_counter()
+        module_name, attribute = self.app_path.split(':')
+        app = getattr(importlib.import_module(module_name), attribute)
+        logger.info(f"Приложение загружено в мастере за {time.perf_counter() - start:.1f} с")
+        return app
+    
+    def run(self):
+        import uvicorn
+        
+        app = self.load_app()
+        config = uvicorn.Config(app, host=self.host, port=self.port, log_level=self.log_level,
+                                workers=1, lifespan="on")
+        sock = config.bind_socket()
+        os.environ[PREFORK_MASTER_ENV] = str(os.getpid())
+        
+        # Объекты, созданные при загрузке, уходят в постоянное поколение: GC воркеров их не трогает
+        gc.freeze()
+        logger.info(f"Заморожено объектов GC: {gc.get_freeze_count()}, воркеров: {self.workers}")
+        
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        
+        for slot in range(self.workers):
+            self._spawn(slot, config, sock)
+        
+        next_report = time.monotonic() + min(30, self.report_interval or 30)
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            
+            if pid:
+                slot = self.children.pop(pid)
+                if not self.stopping:
+                    logger.warning(f"Воркер {pid} завершился (код {os.waitstatus_to_exitcode(status)}), перезапуск")
+                    self._spawn(slot, config, sock)
+                continue
+            
+            if self.stopping:
+                self._shutdown_children()
+                continue
+            
+            if next_report is not None and time.monotonic() >= next_report:
+                self._log_memory()
+                next_report = time.monotonic() + self.report_interval if self.report_interval else None
+            time.sleep(0.5)
+        
+        sock.close()
+        logger.info("Мастер остановлен")
+    
+    def _spawn(self, slot: int, config, sock):
+        pid = os.fork()
+        if pid:
+            self.children[pid] = slot
+            return
+        
+        # Воркер: свои обработчики сигналов ставит uvicorn
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        gc.enable()
+        self._limit_threads()
+        
+        import uvicorn
+        
+        exit_code = 0
+        try:
+            uvicorn.Server(config).run(sockets=[sock])
+        except BaseException as e:
+            logger.error(f"Воркер {os.getpid()} упал: {str(e)}")
+            exit_code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(exit_code)
+    
+    def _limit_threads(self):
+        """Потоки torch делятся между воркерами, чтобы N процессов не конкурировали за ядра"""
+        torch = sys.modules.get('torch')
+        if torch is not None:
+            torch.set_num_threads(max(1, available_cpus() // self.workers))
+    
+    def _handle_stop(self, signum, frame):
+        if not self.stopping:
+            logger.info(f"Получен сигнал {signal.Signals(signum).name}, остановка воркеров")
+            self.stopping = True
+            self.stop_deadline = time.monotonic() + WORKER_SHUTDOWN_TIMEOUT
+            for pid in self.children:
+                self._signal(pid, signal.SIGTERM)
+    
+    def _shutdown_children(self):
+        if time.monotonic() >= self.stop_deadline:
+            for pid in self.children:
+                logger.warning(f"Воркер {pid} не завершился за {WORKER_SHUTDOWN_TIMEOUT} с, SIGKILL")
+                self._signal(pid, signal.SIGKILL)
+            self.stop_deadline = float('inf')
+        time.sleep(0.1)
+    
+    @staticmethod
+    def _signal(pid: int, signum: int):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+    
+    def _log_memory(self):
+        report = memory_report(os.getpid())
+        if not report:
+            return
+        
+        master = report['master']
+        logger.info(f"Память мастера {master['pid']}: RSS {master.get('rss_mb')} МБ, USS {master.get('uss_mb')} МБ")
+        for worker in report['workers']:
+            logger.info(f"Воркер {worker['pid']}: RSS {worker['rss_mb']} МБ, USS {worker['uss_mb']} МБ, "
+                        f"общих с мастером {worker['shared_mb']} МБ, PSS {worker['pss_mb']} МБ")
+        logger.info(f"Средний USS воркера {report['average_worker_uss_mb']} МБ: в памяти поместится "
+                    f"{report['workers_fit_in_memory']} воркеров (ядер {report['cpus']})")
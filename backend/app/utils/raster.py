@@ -0,0 +1,175 @@
+import os
+import threading
+from typing import Any, BinaryIO, Dict, Optional
+
+import cv2
+import numpy as np
+import tifffile
+from PIL import Image
+
+# Лимит пикселей для форматов без оконного чтения (PNG/JPEG декодируются целиком)
+MAX_DECODED_RASTER_PIXELS = int(os.getenv("MAX_DECODED_RASTER_PIXELS", 50_000_000))
+
+# GeoTIFF теги привязки растра
+GEOTIFF_PIXEL_SCALE_TAG = 33550
+GEOTIFF_TIEPOINT_TAG = 33922
+
+class RasterReader:
+    """
+    Чтение большого растра полосами строк. Несжатый TIFF/GeoTIFF отображается
+    в память (np.memmap) без копирования, сжатый и тайловый TIFF декодируется
+    по сегментам, пересекающим полосу. Остальные форматы декодируются целиком
+    в пределах MAX_DECODED_RASTER_PIXELS
+    """
+    
+    def __init__(self, file: BinaryIO, image_format: str):
+        self.file = file
+        self.image_format = image_format
+        self.geo: Optional[Dict[str, Any]] = None
+        self._tiff: Optional[tifffile.TiffFile] = None
+        self._page = None
+        self._array: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+        
+        if image_format == 'tiff':
+            self._open_tiff()
+        else:
+            self._open_decoded()
+    
+    @property
+    def mode(self) -> str:
+        """Способ чтения: memmap, segments или decoded"""
+        if self._page is not None:
+            return 'segments'
+        return 'memmap' if isinstance(self._array, np.memmap) else 'decoded'
+    
+    def _open_tiff(self):
+        self.file.seek(0)
+        try:
+            self._tiff = tifffile.TiffFile(self.file, name='raster.tif')
+            page = self._tiff.pages[0]
+        except Exception as e:
+            raise ValueError(f"Не удалось прочитать TIFF: {str(e)}")
+        
+        if page.planarconfig != 1 and not page.is_memmappable:
+            if page.compression != 1:
+                raise ValueError("Сжатый TIFF с раздельными каналами не поддерживается")
+            raise ValueError("TIFF с раздельными каналами поддерживается только одним непрерывным блоком данных")
+        
+        self.height, self.width = page.imagelength, page.imagewidth
+        self.geo = self._read_geo_tags(page)
+        
+        if page.is_memmappable:
+            dtype = np.dtype(self._tiff.byteorder + page.dtype.char)
+            array = np.memmap(self.file, dtype=dtype, mode='r', offset=page.dataoffsets[0], shape=page.shape)
+            # Раздельные каналы (S, H, W) приводятся к (H, W, S) без копирования
+            if page.planarconfig != 1 and array.ndim == 3:
+                array = array.transpose(1, 2, 0)
+            self._array = array
+        else:
+            self._page = page
+            # Первый и последний сегменты декодируются сразу: ошибка кодека или
+            # данных возвращается кодом 400, а не обрывает поток ответа
+            try:
+                self._read_segment(0)
+                self._read_segment(len(page.dataoffsets) - 1)
+            except Exception as e:
+                raise ValueError(f"Не удалось декодировать TIFF: {str(e)}")
+    
+    def _open_decoded(self):
+        self.file.seek(0)
+        with Image.open(self.file) as image:
+            width, height = image.size
+        
+        if width * height > MAX_DECODED_RASTER_PIXELS:
+            raise ValueError(
+                f"Растр {width}×{height} слишком большой для {self.image_format.upper()}, "
+                f"используйте (Geo)TIFF для оконного чтения"
+            )
+        
+        self.file.seek(0)
+        data = np.frombuffer(self.file.read(), dtype=np.uint8)
+        array = cv2.imdecode(data, cv2.IMREAD_UNCHANGED)
+        if array is None:
+            raise ValueError("Не удалось декодировать изображение")
+        if array.ndim == 3:
+            array = cv2.cvtColor(array, cv2.COLOR_BGRA2RGBA if array.shape[2] == 4 else cv2.COLOR_BGR2RGB)
+        
+        self.height, self.width = array.shape[:2]
+        self._array = array
+    
+    @staticmethod
+    def _read_geo_tags(page) -> Optional[Dict[str, Any]]:
+        pixel_scale = page.tags.get(GEOTIFF_PIXEL_SCALE_TAG)
+        tiepoint = page.tags.get(GEOTIFF_TIEPOINT_TAG)
+        if pixel_scale is None or tiepoint is None:
+            return None
+        
+        return {
+            'pixel_scale': [float(v) for v in pixel_scale.value[:2]],
+            'origin': [float(v) for v in tiepoint.value[3:5]]
+        }
+    
+    def read_band(self, y0: int, height: int) -> np.ndarray:
+        """Полоса строк [y0, y0 + height) во всю ширину растра в виде (H, W, C)"""
+        y1 = min(y0 + height, self.height)
+        if self._array is not None:
+            return self._array[y0:y1]
+        return self._decode_band(y0, y1)
+    
+    def _read_segment(self, index: int):
+        """Сегмент (полоса или тайл) в виде (строки, ширина, каналы) и его верхний левый угол"""
+        page = self._page
+        with self._lock:
+            self.file.seek(page.dataoffsets[index])
+            data = self.file.read(page.databytecounts[index])
+        
+        segment, indices, _ = page.decode(data, index)
+        # Тайлы дополнены до полного размера, последняя полоса короче остальных
+        segment = segment.reshape(-1, page.chunks[1], page.samplesperpixel)
+        return segment, indices[2], indices[3]
+    
+    def _decode_band(self, y0: int, y1: int) -> np.ndarray:
+        page = self._page
+        segment_height, segment_width = page.chunks[0], page.chunks[1]
+        band = np.empty((y1 - y0, self.width, page.samplesperpixel), dtype=page.dtype)
+        
+        rows, cols = page.chunked[:2]
+        for row in range(y0 // segment_height, min(rows, (y1 - 1) // segment_height + 1)):
+            for col in range(cols):
+                segment, top, left = self._read_segment(row * cols + col)
+                
+                # Обрезка по растру и полосе
+                src_y0 = max(y0 - top, 0)
+                src_y1 = min(y1 - top, segment.shape[0], self.height - top)
+                width = min(segment_width, self.width - left)
+                band[top + src_y0 - y0:top + src_y1 - y0, left:left + width] = segment[src_y0:src_y1, :width]
+        
+        return band
+    
+    @staticmethod
+    def to_rgb(window: np.ndarray) -> np.ndarray:
+        """Приведение окна к RGB uint8 (оттенки серого, альфа, 16 бит, мультиспектр)"""
+        if window.ndim == 2:
+            window = window[:, :, np.newaxis]
+        if window.shape[2] == 1:
+            window = np.repeat(window, 3, axis=2)
+        elif window.shape[2] > 3:
+            window = window[:, :, :3]
+        
+        if window.dtype == np.uint16:
+            window = (window >> 8).astype(np.uint8)
+        elif np.issubdtype(window.dtype, np.floating):
+            # Отражательная способность в диапазоне 0..1
+            window = (np.clip(window, 0, 1) * 255).astype(np.uint8)
+        elif window.dtype != np.uint8:
+            window = np.clip(window, 0, 255).astype(np.uint8)
+        
+        return np.ascontiguousarray(window)
+    
+    def close(self):
+        """Закрытие TIFF и освобождение отображения"""
+        if self._tiff is not None:
+            # Переданный файл tifffile не закрывает, им владеет вызывающий код
+            self._tiff.close()
+        self._array = None
@@ -27,6 +27,7 @@ class ResponseFormatter:
             "data": {
                 "predicted_yield": response.get("predicted_yield", 0),
                 "confidence": round(response.get("confidence", 0), 3),
+                "prediction_interval": response.get("prediction_interval", {}),
                 "suggestions": response.get("suggestions", []),
                 "analysis": response.get("analysis", {}),
                 "optimal_ranges": response.get("optimal_ranges", {})
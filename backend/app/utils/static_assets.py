@@ -0,0 +1,91 @@
+import os
+import logging
+import mimetypes
+from typing import Dict, Tuple
+
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+from app.utils.http_cache import negotiate_encoding
+
+logger = logging.getLogger(__name__)
+
+# Vite кладет файлы с хэшем содержимого в имени в assets/ - их можно кэшировать навсегда
+HASHED_ASSETS_PREFIX = 'assets' + os.sep
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+PRECOMPRESSED_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+class FrontendStaticFiles(StaticFiles):
+    """
+    Раздача собранного фронтенда (Vite dist/): предсжатые .br/.gz варианты
+    по Accept-Encoding, immutable кэш для хэшированных assets/ и index.html
+    для клиентских маршрутов React Router
+    """
+    
+    def __init__(self, directory: str):
+        super().__init__(directory=directory, html=True)
+        self.root = os.path.realpath(directory)
+        self.variants = self._scan_variants()
+    
+    def _scan_variants(self) -> Dict[str, Dict[str, Tuple[str, os.stat_result]]]:
+        """Индекс предсжатых вариантов: dist неизменяем, поэтому сканируется один раз"""
+        variants = {}
+        for dirpath, _, filenames in os.walk(self.root):
+            names = set(filenames)
+            for name in filenames:
+                for encoding, suffix in PRECOMPRESSED_SUFFIXES.items():
+                    if name + suffix in names:
+                        variant_path = os.path.join(dirpath, name + suffix)
+                        variants.setdefault(os.path.join(dirpath, name), {})[encoding] = (
+                            variant_path, os.stat(variant_path)
+                        )
+        
+        logger.info(f"Frontend {self.root}: {len(variants)} files with precompressed variants")
+        return variants
+    
+    async def get_response(self, path: str, scope) -> Response:
+        try:
+            return await super().get_response(path, scope)
+        except HTTPException as exc:
+            # Клиентский маршрут (/yield, /chat, ...) - отдаем index.html; API и файлы - 404
+            if exc.status_code != 404 or path.startswith('api') or os.path.splitext(path)[1]:
+                raise
+            full_path, stat_result = self.lookup_path('index.html')
+            if stat_result is None:
+                raise
+            return self.file_response(full_path, stat_result, scope)
+    
+    def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        full_path = os.fspath(full_path)
+        relative_path = os.path.relpath(full_path, self.root)
+        
+        headers = {
+            'Cache-Control': IMMUTABLE_CACHE_CONTROL if relative_path.startswith(HASHED_ASSETS_PREFIX)
+            else REVALIDATE_CACHE_CONTROL
+        }
+        
+        file_variants = self.variants.get(full_path, {})
+        encoding = negotiate_encoding(
+            request_headers.get('accept-encoding', ''),
+            available=tuple(name for name in PRECOMPRESSED_SUFFIXES if name in file_variants)
+        )
+        
+        media_type = mimetypes.guess_type(full_path)[0] or 'text/plain'
+        if file_variants:
+            headers['Vary'] = 'Accept-Encoding'
+        if encoding:
+            headers['Content-Encoding'] = encoding
+            full_path, stat_result = file_variants[encoding]
+        
+        # FileResponse отдает файл через расширение ASGI pathsend, только если сервер объявил его
+        # в scope['extensions'] (например, Granian); uvicorn его не объявляет, и файл читается кусками
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result,
+                                media_type=media_type, headers=headers)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -0,0 +1,222 @@
+import os
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Размер LRU кэша token -> каноническая сущность
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 50000))
+
+# Максимальное расстояние Дамерау-Левенштейна при поиске опечаток
+MAX_EDIT_DISTANCE = 2
+
+TOKEN_PATTERN = re.compile(r"[a-zа-яөүң]+")
+
+# Частые слова, похожие на термины словаря ("перед" - "перец", "малое" - "малина"):
+# точное совпадение со стоп-словом отменяет нечеткий поиск
+STOPWORDS = {
+    'перед', 'через', 'после', 'когда', 'почему', 'какие', 'какой', 'какая', 'каких', 'какое',
+    'можно', 'нужно', 'надо', 'лучше', 'больше', 'меньше', 'очень', 'время', 'всего', 'сейчас',
+    'тоже', 'также', 'этого', 'этому', 'этой', 'этот', 'этих', 'который', 'которые', 'чтобы',
+    'если', 'потом', 'теперь', 'здесь', 'сколько', 'только', 'другой', 'другие', 'много', 'мало',
+    'малое', 'малый', 'малом', 'летом', 'лето', 'года', 'году', 'годы', 'день', 'дней', 'неделю',
+    'хорошо', 'плохо', 'можете', 'скажите', 'подскажите', 'помогите', 'спасибо', 'пожалуйста',
+    'растет', 'растут', 'растения', 'растение', 'листья', 'листьев', 'листы', 'корни', 'плоды',
+    'делать', 'сделать', 'лучший', 'лучшие', 'самый', 'самые',
+    'нашей', 'наших', 'моего', 'моей', 'своих', 'свой', 'участок', 'участке', 'огород', 'огороде',
+    'грушевый', 'перевод', 'переход', 'поле', 'поля', 'полем', 'полях', 'слова', 'слово',
+    'кара', 'карагач', 'мухой', 'лучи', 'лучей', 'ветер', 'ветра', 'дождь', 'дожди', 'спорта',
+}
+
+TRANSLITERATION = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ж': 'zh', 'з': 'z', 'и': 'i',
+    'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's',
+    'т': 't', 'у': 'u', 'ф': 'f', 'х': 'kh', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sch', 'ъ': '',
+    'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya', 'ө': 'o', 'ү': 'u', 'ң': 'ng',
+}
+
+# Окончания для порождения словоформ из леммы (существительные и прилагательные)
+NOUN_ENDINGS = {
+    'ская': ('ая', ['ая', 'ой', 'ую', 'ие', 'их', 'им', 'ими']),
+    'ец': ('ец', ['ец', 'ца', 'цу', 'цом', 'це', 'цы', 'цов', 'цам', 'цами', 'цах']),
+    'ть': ('ть', ['ть', 'ю', 'ет', 'ют', 'ит', 'ят', 'л', 'ла', 'ли', 'й', 'йте']),
+    'а': ('а', ['а', 'ы', 'и', 'е', 'у', 'ой', 'ам', 'ами', 'ах']),
+    'я': ('я', ['я', 'и', 'е', 'ю', 'ей', 'ям', 'ями', 'ях']),
+    'ь': ('ь', ['ь', 'я', 'и', 'ю', 'ем', 'ей', 'ью', 'ям', 'ями', 'ях']),
+    'ы': ('ы', ['ы', 'а', 'у', 'е', 'ой', 'ам', 'ами', 'ах']),
+    'и': ('и', ['и', 'ей', 'ям', 'ями', 'ях', 'ь', 'я', 'ю']),
+    'е': ('е', ['е', 'я', 'ю', 'ем', 'ия', 'ий']),
+}
+CONSONANT_ENDINGS = ['', 'а', 'у', 'ом', 'е', 'ы', 'и', 'ов', 'ам', 'ами', 'ах']
+
+def normalize_spelling(text: str) -> str:
+    return text.lower().replace('ё', 'е')
+
+def transliterate(word: str) -> str:
+    """Кириллица (включая кыргызские буквы) в латиницу"""
+    return ''.join(TRANSLITERATION.get(char, char) for char in word)
+
+def inflect(lemma: str) -> Set[str]:
+    """Словоформы леммы по типу окончания; составные названия склоняются по последнему слову"""
+    words = normalize_spelling(lemma).replace('-', ' ').split()
+    head, last = ''.join(words[:-1]), words[-1]
+    
+    forms = {last}
+    for suffix, (cut, endings) in NOUN_ENDINGS.items():
+        if last.endswith(suffix) and len(last) > len(suffix) + 1:
+            stem = last[:-len(cut)]
+            forms.update(stem + ending for ending in endings)
+            break
+    else:
+        if last[-1] not in 'аеиоуыэюяйөү':
+            forms.update(last + ending for ending in CONSONANT_ENDINGS)
+    
+    return {head + form for form in forms}
+
+def damerau_levenshtein(a: str, b: str, max_distance: int) -> int:
+    """Расстояние с перестановкой соседних букв; max_distance + 1, если превышено"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = current[0]
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+            row_min = min(row_min, current[j])
+        if row_min > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+def allowed_distance(length: int) -> int:
+    """Допустимое число опечаток по длине слова: короткие слова только точно"""
+    if length <= 5:
+        return 0
+    if length <= 9:
+        return 1
+    return MAX_EDIT_DISTANCE
+
+def deletes(word: str, distance: int) -> Set[str]:
+    """Все варианты слова с удалением до distance букв (индекс SymSpell)"""
+    result = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {item[:i] + item[i + 1:] for item in frontier for i in range(len(item)) if len(item) > 1}
+        result |= frontier
+    return result
+
+class TokenNormalizer:
+    """
+    Нормализация токенов к каноническим сущностям: словарь словоформ
+    (леммы + порожденные окончания + транслитерация) и индекс удалений
+    SymSpell для опечаток строятся один раз; результаты поиска кэшируются в LRU
+    """
+    
+    def __init__(self, lexicon: Dict[str, Dict[str, List[str]]], max_edit_distance: int = MAX_EDIT_DISTANCE,
+                 transliteration: bool = True, cache_size: int = TOKEN_CACHE_SIZE):
+        self.max_edit_distance = max_edit_distance
+        self.forms: Dict[str, Tuple[str, str]] = {}
+        self.ambiguous: Set[str] = set()
+        self.delete_index: Dict[str, List[str]] = {}
+        
+        for category, entries in lexicon.items():
+            for canonical, aliases in entries.items():
+                for alias in [canonical] + aliases:
+                    forms = inflect(alias)
+                    if transliteration:
+                        forms |= {transliterate(form) for form in forms}
+                    for form in forms:
+                        self._add_form(form, (category, canonical))
+        
+        for form in self.forms:
+            for variant in deletes(form, min(self.max_edit_distance, allowed_distance(len(form)))):
+                self.delete_index.setdefault(variant, []).append(form)
+        
+        self.lookup = lru_cache(maxsize=cache_size)(self._lookup)
+    
+    def _add_form(self, form: str, entity: Tuple[str, str]):
+        existing = self.forms.get(form)
+        if existing is not None and existing != entity:
+            # Одна форма у разных сущностей - такой токен не разрешается
+            self.ambiguous.add(form)
+        self.forms[form] = entity
+    
+    def _lookup(self, token: str) -> Optional[Tuple[str, str]]:
+        """(категория, каноническая форма) для токена или None"""
+        if token in self.forms:
+            return None if token in self.ambiguous else self.forms[token]
+        if token in STOPWORDS:
+            return None
+        
+        max_distance = min(self.max_edit_distance, allowed_distance(len(token)))
+        if max_distance == 0:
+            return None
+        
+        best_distance = max_distance + 1
+        best: Set[Tuple[str, str]] = set()
+        for variant in deletes(token, max_distance):
+            for form in self.delete_index.get(variant, ()):
+                if form in self.ambiguous:
+                    continue
+                distance = damerau_levenshtein(token, form, min(max_distance, allowed_distance(len(form))))
+                if distance < best_distance:
+                    best_distance, best = distance, {self.forms[form]}
+                elif distance == best_distance:
+                    best.add(self.forms[form])
+        
+        if best_distance > max_distance or len(best) != 1:
+            return None
+        return next(iter(best))
+    
+    def tokenize(self, text: str) -> List[str]:
+        return TOKEN_PATTERN.findall(normalize_spelling(text))
+    
+    def normalize(self, text: str) -> List[Tuple[str, str, str]]:
+        """Найденные сущности текста: (токен, категория, каноническая форма) в порядке появления"""
+        tokens = self.tokenize(text)
+        matches = []
+        i = 0
+        while i < len(tokens):
+            # Составные названия ("кара балта", "иссык куль") проверяются по склеенной паре
+            if i + 1 < len(tokens):
+                pair = tokens[i] + tokens[i + 1]
+                entity = self.forms.get(pair) if pair not in self.ambiguous else None
+                if entity is not None:
+                    matches.append((tokens[i] + ' ' + tokens[i + 1],) + entity)
+                    i += 2
+                    continue
+            
+            entity = self.lookup(tokens[i])
+            if entity is not None:
+                matches.append((tokens[i],) + entity)
+            i += 1
+        return matches
+    
+    def entities(self, text: str) -> Dict[str, List[str]]:
+        """Канонические сущности по категориям без повторов"""
+        result: Dict[str, List[str]] = {}
+        for _, category, canonical in self.normalize(text):
+            values = result.setdefault(category, [])
+            if canonical not in values:
+                values.append(canonical)
+        return result
+    
+    def canonical_text(self, text: str, matches: Optional[Iterable[Tuple[str, str, str]]] = None) -> str:
+        """Текст в нижнем регистре с дописанными каноническими формами найденных токенов"""
+        matches = self.normalize(text) if matches is None else matches
+        return ' '.join([normalize_spelling(text).strip()] + [canonical for _, _, canonical in matches])
+    
+    def stats(self) -> Dict[str, int]:
+        info = self.lookup.cache_info()
+        return {
+            'forms': len(self.forms),
+            'delete_index': len(self.delete_index),
+            'cache_hits': info.hits,
+            'cache_misses': info.misses,
+            'cache_size': info.currsize
+        }
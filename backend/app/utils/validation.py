@@ -1,7 +1,32 @@
 from typing import Dict, Any, List, Optional
 import re
 
+# Сигнатуры (магические байты) поддерживаемых форматов изображений
+IMAGE_SIGNATURES = [
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+    (b'BM', 'bmp'),
+    (b'II*\x00', 'tiff'),
+    (b'MM\x00*', 'tiff'),
+    (b'II+\x00', 'tiff'),  # BigTIFF
+    (b'MM\x00+', 'tiff'),
+]
+
 class InputValidator:
+    @staticmethod
+    def detect_image_format(header: bytes) -> Optional[str]:
+        """Определение формата изображения по первым байтам файла"""
+        for signature, image_format in IMAGE_SIGNATURES:
+            if header.startswith(signature):
+                return image_format
+        
+        if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+            return 'webp'
+        
+        return None
+    
     @staticmethod
     def validate_plant_image(file_data: bytes, filename: str) -> List[str]:
         """Валидация изображения растения"""
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк чтения истории чата и полнотекстового поиска на синтетической базе.
+
+Пример:
+    python benchmarks/bench_chat_history.py --rows 10000000 --sessions 200000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.agro_gpt import AgroDatabase
+from app.services.chat_partitions import current_month, shift_month
+
+QUESTIONS = [
+    "полив томатов в Чуйской области",
+    "чем подкормить картофель в июне",
+    "тля на капусте что делать",
+    "какие сорта яблок для Иссык-Куля",
+    "пожелтели листья огурцов",
+    "господдержка фермеров кредит",
+    "хранение моркови зимой",
+    "почвы Нарынской области",
+]
+
+ANSWERS = [
+    "💧 Капельный полив 2-3 л/растение в день, утром, под корень.",
+    "🌱 Калийные удобрения, зола, органические подкормки.",
+    "🐛 Мыльный раствор, настой табака, желтые ловушки.",
+    "🇰🇬 Сорта 'Апорт', 'Алма-Атинский' хорошо растут в высокогорье.",
+    "🏥 Симптомы указывают на недостаток питания.",
+]
+
+def generate(db_path: str, rows: int, sessions: int, months: int, batch_size: int = 50000):
+    """Заполнение месячных партиций синтетическими сообщениями (сквозные message_id по времени)"""
+    database = AgroDatabase(db_path)
+    partitions = database.partitions
+    rng = random.Random(42)
+    per_month = -(-rows // months)
+    
+    inserted = 0
+    with sqlite3.connect(db_path) as conn:
+        for offset in range(months - 1, -1, -1):
+            month = shift_month(current_month(), -offset)
+            path = partitions.ensure(conn, month)
+            conn.commit()
+            
+            with sqlite3.connect(path) as partition:
+                partition.execute("PRAGMA journal_mode = OFF")
+                partition.execute("PRAGMA synchronous = OFF")
+                
+                first_id = inserted + 1
+                target = min(rows, inserted + per_month)
+                while inserted < target:
+                    count = min(batch_size, target - inserted)
+                    batch = [
+                        (
+                            inserted + i + 1,
+                            f"session_{rng.randrange(sessions)}",
+                            f"{rng.choice(QUESTIONS)} #{inserted + i}",
+                            rng.choice(ANSWERS),
+                            "general",
+                            "{}",
+                            f"{month}-{1 + (i * 28) // count:02d} 12:00:00",
+                        )
+                        for i in range(count)
+                    ]
+                    partition.executemany(
+                        "INSERT INTO messages (message_id, session_id, user_message, bot_response, intent, entities, "
+                        "timestamp) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        batch
+                    )
+                    partition.commit()
+                    inserted += count
+                    print(f"\r📥 Вставлено {inserted:,}/{rows:,}", end="", flush=True)
+                partition.execute("ANALYZE")
+            
+            partitions.record_write(conn, month, first_id, inserted, inserted - first_id + 1)
+            conn.commit()
+    print()
+
+def measure(name: str, func, repeats: int):
+    """Замер задержки в миллисекундах"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"   {name:<40} p50={statistics.median(timings):8.3f} мс   p95={p95:8.3f} мс")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--sessions", type=int, default=200_000)
+    parser.add_argument("--months", type=int, default=12, help="На сколько месячных партиций разложить сообщения")
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--db", help="Путь к базе (по умолчанию временный файл)")
+    args = parser.parse_args()
+    
+    db_path = args.db or os.path.join(tempfile.mkdtemp(), "bench_agro_gpt.db")
+    
+    if not os.path.exists(db_path):
+        print(f"🛠️  Генерация {args.rows:,} сообщений в {db_path}")
+        start = time.perf_counter()
+        generate(db_path, args.rows, args.sessions, args.months)
+        print(f"⏱️  Генерация заняла {time.perf_counter() - start:.1f} с")
+    
+    database = AgroDatabase(db_path)
+    rng = random.Random(7)
+    
+    def first_page():
+        database.get_session_messages(f"session_{rng.randrange(args.sessions)}", limit=50)
+    
+    def cursor_page():
+        session_id = f"session_{rng.randrange(args.sessions)}"
+        page = database.get_session_messages(session_id, limit=10)
+        if page['next_cursor'] is not None:
+            database.get_session_messages(session_id, limit=10, before_id=page['next_cursor'])
+    
+    def search_common():
+        database.search_messages("полив томатов", limit=20)
+    
+    def search_rare():
+        database.search_messages(f"#{rng.randrange(args.rows)}", limit=20)
+    
+    def search_deep_page():
+        database.search_messages("картофель", limit=20, before_id=rng.randrange(1, args.rows))
+    
+    def save_message():
+        database.save_message(f"session_{rng.randrange(args.sessions)}", "полив томатов", ANSWERS[0], "watering",
+                              {"crops": ["томат"], "location": "чуйская"})
+    
+    print(f"📊 Задержки ({args.repeats} повторов):")
+    measure("история: первая страница (50)", first_page, args.repeats)
+    measure("история: две страницы по курсору", cursor_page, args.repeats)
+    measure("поиск: частые слова", search_common, args.repeats)
+    measure("поиск: редкий термин", search_rare, args.repeats)
+    measure("поиск: страница по курсору", search_deep_page, args.repeats)
+    measure("запись сообщения", save_message, args.repeats)
+
+if __name__ == "__main__":
+    main()
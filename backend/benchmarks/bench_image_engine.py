@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк движков анализа изображений: PIL (декодирование + float копии)
+против OpenCV (cv2.imdecode сразу в uint8, отпускает GIL) на пуле потоков.
+Пропускная способность измеряется для 1..N потоков.
+
+Пример:
+    python benchmarks/bench_image_engine.py --images 64 --threads 1 2 4 8
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.plant_analysis import PlantAnalysisService
+
+def make_jpeg(width: int, height: int, seed: int) -> bytes:
+    """Синтетический снимок растения на почве в формате JPEG"""
+    rng = np.random.default_rng(seed)
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[:] = (51, 84, 115)
+    image += rng.integers(0, 20, image.shape, dtype=np.uint8)
+    axes = (int(width * rng.uniform(0.15, 0.35)), int(height * rng.uniform(0.15, 0.35)))
+    cv2.ellipse(image, (width // 2, height // 2), axes, 0, 0, 360, (40, 150, 50), -1)
+    return cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=64)
+    parser.add_argument("--width", type=int, default=1600)
+    parser.add_argument("--height", type=int, default=1200)
+    parser.add_argument("--threads", type=int, nargs="+", default=None)
+    args = parser.parse_args()
+    
+    cores = os.cpu_count() or 1
+    threads = args.threads or sorted({1, 2, 4, cores})
+    
+    print(f"🖼️  Генерация {args.images} JPEG {args.width}×{args.height}...")
+    images = [make_jpeg(args.width, args.height, seed) for seed in range(args.images)]
+    
+    print(f"📊 Изображений в секунду (ядер: {cores}):")
+    for workers in threads:
+        line = f"   потоков {workers:<3}"
+        throughput = {}
+        for engine in ("pil", "opencv"):
+            service = PlantAnalysisService(engine=engine, workers=workers)
+            
+            # Прогрев: создание потоков пула и первая инициализация кодеков
+            list(service.executor.map(service.analyze_image_sync, images[:workers]))
+            
+            start = time.perf_counter()
+            list(service.executor.map(service.analyze_image_sync, images))
+            throughput[engine] = len(images) / (time.perf_counter() - start)
+            service.executor.shutdown()
+            
+            line += f"  {engine:>6} {throughput[engine]:7.1f}"
+        
+        print(f"{line}   (×{throughput['opencv'] / throughput['pil']:.2f})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк классификатора интентов против правил по ключевым словам:
+точность на размеченном корпусе (модель - на кросс-валидации, без
+примеров из обучения), точность связки модель + правила ниже порога
+уверенности и задержка одного сообщения и пакета.
+
+Пример:
+    python benchmarks/bench_intent_classifier.py --folds 5 --batch 256
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.agro_gpt import agro_gpt_service
+from app.utils.intent_classifier import out_of_fold_predictions, train_intent_classifier
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "intent_labels.jsonl")
+
+THRESHOLDS = [0.0, 0.3, 0.4, 0.5, 0.6, 0.7]
+
+def load_corpus(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def median_us(func, items: list, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        for item in items:
+            start = time.perf_counter()
+            func(item)
+            timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=256)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--verbose", action="store_true", help="Показать ошибки правил и модели")
+    args = parser.parse_args()
+    
+    corpus = load_corpus(args.corpus)
+    texts = [agro_gpt_service.normalizer.canonical_text(sample['text']) for sample in corpus]
+    labels = [sample['intent'] for sample in corpus]
+    print(f"📚 Корпус: {len(corpus)} сообщений, {len(set(labels))} интентов")
+    
+    rules = [agro_gpt_service._rule_intent(text).value for text in texts]
+    predictions = out_of_fold_predictions(texts, labels, args.folds)
+    
+    rules_accuracy = sum(r == label for r, label in zip(rules, labels)) / len(labels)
+    print(f"📏 Правила: точность {rules_accuracy:.1%}")
+    for threshold in THRESHOLDS:
+        hybrid = [
+            predicted if confidence >= threshold else rule
+            for (predicted, confidence), rule in zip(predictions, rules)
+        ]
+        accuracy = sum(h == label for h, label in zip(hybrid, labels)) / len(labels)
+        share = sum(confidence >= threshold for _, confidence in predictions) / len(predictions)
+        name = "модель" if threshold == 0 else f"модель ≥ {threshold:.1f}, иначе правила"
+        print(f"🤖 {name}: точность {accuracy:.1%} (решает модель: {share:.0%})")
+    
+    if args.verbose:
+        for sample, rule, (predicted, confidence) in zip(corpus, rules, predictions):
+            if rule != sample['intent'] or predicted != sample['intent']:
+                print(f"      {sample['text']!r} [{sample['intent']}]: правила {rule}, модель {predicted} ({confidence:.2f})")
+    
+    start = time.perf_counter()
+    classifier = train_intent_classifier(texts, labels)
+    train_ms = (time.perf_counter() - start) * 1000
+    
+    rules_us = median_us(agro_gpt_service._rule_intent, texts, args.repeats)
+    model_us = median_us(classifier.predict, texts, args.repeats)
+    batch = (texts * (args.batch // len(texts) + 1))[:args.batch]
+    start = time.perf_counter()
+    for _ in range(args.repeats):
+        classifier.predict_batch(batch)
+    batch_us = (time.perf_counter() - start) / (args.repeats * len(batch)) * 1e6
+    
+    print(f"⏱️  Обучение на всем корпусе: {train_ms:.0f} мс, веса {classifier.weights.nbytes / 1024 / 1024:.1f} МБ")
+    print(f"   правила: {rules_us:.1f} мкс, модель: {model_us:.1f} мкс на сообщение, "
+          f"пакет из {len(batch)}: {batch_us:.1f} мкс на сообщение")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк BM25 поиска по базе знаний: время построения индекса, размер
+разреженной матрицы и задержка top-k запроса на реальной базе и на базе,
+увеличенной синтетическими отрывками (перемешанные слова реальных отрывков).
+Для сравнения - наивный BM25 с перебором всех отрывков на Python.
+
+Пример:
+    python benchmarks/bench_kb_retrieval.py --scale 1 100 --queries 2000
+"""
+import argparse
+import math
+import os
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.agro_gpt import agro_gpt_service
+from app.utils.bm25 import BM25Index
+
+QUERIES = [
+    "фитофтороз на помидорах",
+    "как хранить картошку зимой",
+    "экспорт яблок в Казахстан",
+    "что такое кила капусты",
+    "вершинная гниль томатов",
+    "климат Нарынской области",
+    "мучнистая роса на огурцах",
+    "господдержка фермеров кредит",
+    "чем улучшить глинистую почву",
+    "совместные посадки моркови",
+]
+
+def synthetic_documents(documents: list, scale: int, seed: int = 0) -> list:
+    """Реальные отрывки + (scale - 1) копий каждого с перемешанными словами из общего словаря"""
+    rng = random.Random(seed)
+    vocabulary = [term for tokens in documents for term in tokens]
+    scaled = list(documents)
+    for _ in range(scale - 1):
+        for tokens in documents:
+            keep = rng.sample(tokens, k=max(1, len(tokens) // 2)) if tokens else []
+            scaled.append(keep + rng.choices(vocabulary, k=len(tokens) - len(keep)))
+    return scaled
+
+def naive_search(documents: list, query: list, k: int, k1: float = 1.5, b: float = 0.75) -> list:
+    """BM25 без индекса: проход по всем документам"""
+    counters = [Counter(tokens) for tokens in documents]
+    average_length = sum(len(tokens) for tokens in documents) / len(documents)
+    scores = []
+    for doc_id, counts in enumerate(counters):
+        score = 0.0
+        for term in set(query):
+            if term in counts:
+                df = sum(1 for other in counters if term in other)
+                idf = math.log1p((len(documents) - df + 0.5) / (df + 0.5))
+                tf = counts[term]
+                score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(documents[doc_id]) / average_length))
+        scores.append((score, doc_id))
+    return sorted(scores, reverse=True)[:k]
+
+def percentile_us(timings: list, q: float) -> float:
+    return float(np.percentile(timings, q)) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 100])
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+    
+    passages = agro_gpt_service.knowledge_base.passages()
+    analyzer = agro_gpt_service.retrieval_tokens
+    documents = [analyzer(f"{passage['title']} {passage['text']}") for passage in passages]
+    queries = [analyzer(query) for query in QUERIES]
+    
+    for scale in args.scale:
+        scaled = synthetic_documents(documents, scale)
+        
+        start = time.perf_counter()
+        index = BM25Index(scaled)
+        build_ms = (time.perf_counter() - start) * 1000
+        matrix = index.matrix
+        matrix_kb = (matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes) / 1024
+        
+        timings = []
+        for i in range(args.queries):
+            query = queries[i % len(queries)]
+            start = time.perf_counter()
+            index.search(query, args.k)
+            timings.append(time.perf_counter() - start)
+        
+        # Анализатор запроса (нормализация и стемминг) считается отдельно
+        analyze_timings = []
+        for i in range(args.queries):
+            start = time.perf_counter()
+            analyzer(QUERIES[i % len(QUERIES)])
+            analyze_timings.append(time.perf_counter() - start)
+        analyze_us = statistics.median(analyze_timings) * 1e6
+        
+        print(f"📚 Масштаб ×{scale}: {len(scaled)} отрывков, {len(index.vocabulary)} терминов, "
+              f"матрица {matrix.nnz} ненулевых ({matrix_kb:.0f} KB), построение {build_ms:.0f} мс")
+        print(f"   BM25 top-{args.k}: p50 {percentile_us(timings, 50):.1f} мкс, p99 {percentile_us(timings, 99):.1f} мкс"
+              f" (+ анализ запроса {analyze_us:.1f} мкс)")
+        
+        if len(scaled) <= 2000:
+            start = time.perf_counter()
+            for query in queries:
+                naive_search(scaled, query, args.k)
+            naive_us = (time.perf_counter() - start) / len(queries) * 1e6
+            print(f"   перебор на Python: {naive_us:,.0f} мкс на запрос")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк анализа ортофотоплана: скорость по фрагментам и пик памяти NumPy
+для растров разного размера (несжатый TIFF через memmap, тайловый TIFF с zlib).
+Пик памяти должен расти с шириной растра (одна полоса фрагментов), но не с высотой.
+
+Пример:
+    python benchmarks/bench_orthomosaic.py --sizes 4096 16384
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import tifffile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.orthomosaic import OrthomosaicAnalyzer
+from app.services.plant_analysis import PlantDiseaseClassifier
+
+TIFF_TILE = 256
+
+def write_raster(path: str, width: int, height: int, compression):
+    """
+    Синтетический ортофотоплан без сборки в памяти: несжатый пишется
+    непрерывно через memmap, сжатый - тайлами
+    """
+    rng = np.random.default_rng(0)
+    
+    def make_tile(y: int, x: int, h: int, w: int) -> np.ndarray:
+        tile = rng.integers(0, 60, size=(h, w, 3), dtype=np.uint8)
+        tile[:, :, 1] += np.uint8((x + y) // TIFF_TILE % 3 * 60)
+        return tile
+    
+    if compression is None:
+        raster = tifffile.memmap(path, shape=(height, width, 3), dtype=np.uint8, photometric='rgb')
+        for y in range(0, height, TIFF_TILE):
+            for x in range(0, width, TIFF_TILE):
+                h, w = min(TIFF_TILE, height - y), min(TIFF_TILE, width - x)
+                raster[y:y + h, x:x + w] = make_tile(y, x, h, w)
+        raster.flush()
+        del raster
+        return
+    
+    tiles = (make_tile(y, x, TIFF_TILE, TIFF_TILE) for y in range(0, height, TIFF_TILE) for x in range(0, width, TIFF_TILE))
+    tifffile.imwrite(path, tiles, shape=(height, width, 3), dtype=np.uint8,
+                     tile=(TIFF_TILE, TIFF_TILE), compression=compression)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[4096, 8192])
+    parser.add_argument("--width", type=int, default=None, help="фиксированная ширина (меняется только высота)")
+    parser.add_argument("--tile-size", type=int, default=512)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    
+    analyzer = OrthomosaicAnalyzer(PlantDiseaseClassifier(), tile_size=args.tile_size, workers=args.workers)
+    
+    print(f"📊 Фрагменты {args.tile_size}px, потоков: {args.workers}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in args.sizes:
+            width = args.width or size
+            for compression in (None, 'zlib'):
+                path = os.path.join(tmp_dir, f"raster_{size}_{compression}.tif")
+                write_raster(path, width, size, compression)
+                
+                tracemalloc.start()
+                start = time.perf_counter()
+                with open(path, 'rb') as f:
+                    events = list(analyzer.analyze(f, 'tiff'))
+                elapsed = time.perf_counter() - start
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                
+                meta, summary = events[0], events[-1]
+                print(f"   {width}×{size:<6} {meta['read_mode']:<9} "
+                      f"файл {os.path.getsize(path) / 2 ** 20:8.1f} MB   "
+                      f"{summary['tiles'] / elapsed:7.1f} фрагм/с   "
+                      f"пик NumPy {peak / 2 ** 20:7.1f} MB")
+                os.remove(path)
+
+if __name__ == "__main__":
+    main()
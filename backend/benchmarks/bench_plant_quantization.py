@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк int8 инференса AdvancedPlantModel: задержка float32 и динамически
+квантизованной модели на батчах 1, 32 и 256, размер весов и паритет выходов.
+
+Пример:
+    python benchmarks/bench_plant_quantization.py --threads 1
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.plant_analysis import AdvancedPlantModel
+from app.utils.model_loader import ModelLoader, check_quantization_parity
+
+def median_us(func, repeats: int) -> float:
+    """Медиана времени вызова в микросекундах"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(timings)
+
+def state_dict_kb(model: torch.nn.Module) -> float:
+    """Размер сериализованных весов в килобайтах"""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / 1024
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batches", type=int, nargs="+", default=[1, 32, 256])
+    parser.add_argument("--repeats", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=1, help="torch.set_num_threads")
+    args = parser.parse_args()
+    
+    torch.set_num_threads(args.threads)
+    torch.manual_seed(0)
+    
+    float_model = AdvancedPlantModel().eval()
+    quantized_model, parity = ModelLoader.build_quantized_plant_model(float_model)
+    num_features = float_model.classifier[0].in_features
+    
+    print(f"💾 Веса: float32 {state_dict_kb(float_model):.1f} KB, int8 {state_dict_kb(quantized_model):.1f} KB")
+    print(f"🎯 Паритет: {parity}")
+    print(f"📊 Медиана из {args.repeats} повторов, потоков torch: {args.threads}")
+    
+    for batch in args.batches:
+        inputs = torch.randn(batch, num_features)
+        
+        with torch.inference_mode():
+            float_us = median_us(lambda: float_model(inputs), args.repeats)
+            int8_us = median_us(lambda: quantized_model(inputs), args.repeats)
+        
+        batch_parity = check_quantization_parity(float_model, quantized_model, num_features, samples=batch)
+        print(f"   batch={batch:<4} float32 {float_us:8.1f} мкс   int8 {int8_us:8.1f} мкс   "
+              f"(×{float_us / int8_us:.2f}, max|Δp| {batch_parity['max_abs_diff']:.4f})")
+
+if __name__ == "__main__":
+    main()
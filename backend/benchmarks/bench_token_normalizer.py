@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк нормализации токенов: полнота и точность извлечения культур,
+вредителей и регионов на размеченном корпусе (словоформы, опечатки,
+транслит, кыргызские слова, отрицательные примеры) и пропускная
+способность в токенах в секунду без кэша и с прогретым LRU.
+
+Сравниваются только словарь словоформ и словарь + индекс опечаток SymSpell + транслит.
+
+Пример:
+    python benchmarks/bench_token_normalizer.py --repeats 200
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.agro_gpt import AGRO_LEXICON
+from app.utils.text_normalizer import TokenNormalizer
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "entity_recall.jsonl")
+
+def load_corpus(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def expected_entities(sample: dict) -> set:
+    expected = {('crop', crop) for crop in sample['crops']} | {('pest', pest) for pest in sample['pests']}
+    if sample['location']:
+        expected.add(('region', sample['location']))
+    return expected
+
+def evaluate(normalizer: TokenNormalizer, corpus: list, verbose: bool) -> dict:
+    true_positive = false_positive = false_negative = 0
+    for sample in corpus:
+        found = {
+            (category, canonical) for category, values in normalizer.entities(sample['text']).items()
+            if category != 'keyword' for canonical in values
+        }
+        expected = expected_entities(sample)
+        true_positive += len(found & expected)
+        false_positive += len(found - expected)
+        false_negative += len(expected - found)
+        if verbose and found != expected:
+            print(f"      {sample['text']!r}: лишние {sorted(found - expected)}, пропущены {sorted(expected - found)}")
+    
+    return {
+        'recall': true_positive / max(1, true_positive + false_negative),
+        'precision': true_positive / max(1, true_positive + false_positive)
+    }
+
+def tokens_per_second(normalizer: TokenNormalizer, texts: list, repeats: int, cold: bool) -> float:
+    tokens = sum(len(normalizer.tokenize(text)) for text in texts) * repeats
+    start = time.perf_counter()
+    for _ in range(repeats):
+        if cold:
+            normalizer.lookup.cache_clear()
+        for text in texts:
+            normalizer.normalize(text)
+    return tokens / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--verbose", action="store_true", help="Показать ошибки по примерам")
+    args = parser.parse_args()
+    
+    corpus = load_corpus(args.corpus)
+    texts = [sample['text'] for sample in corpus]
+    print(f"📚 Корпус: {len(corpus)} примеров, {sum(len(expected_entities(s)) for s in corpus)} сущностей")
+    
+    variants = {
+        'словарь': dict(max_edit_distance=0, transliteration=False),
+        'словарь+SymSpell+транслит': dict(),
+    }
+    for name, options in variants.items():
+        start = time.perf_counter()
+        normalizer = TokenNormalizer(AGRO_LEXICON, **options)
+        build_ms = (time.perf_counter() - start) * 1000
+        
+        quality = evaluate(normalizer, corpus, args.verbose)
+        cold = tokens_per_second(normalizer, texts, max(1, args.repeats // 10), cold=True)
+        warm = tokens_per_second(normalizer, texts, args.repeats, cold=False)
+        stats = normalizer.stats()
+        
+        print(f"🔤 {name}")
+        print(f"   полнота {quality['recall']:.1%}, точность {quality['precision']:.1%}")
+        print(f"   построение {build_ms:.0f} мс: {stats['forms']} словоформ, {stats['delete_index']} ключей индекса")
+        print(f"   токенов/с: без кэша {cold:,.0f}, с LRU {warm:,.0f}")
+
+if __name__ == "__main__":
+    main()
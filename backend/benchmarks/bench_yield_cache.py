@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк кэша прогнозов урожайности на трафике, похожем на слайдеры формы:
+входы колеблются вокруг нескольких типичных значений с шагом 0.01. Сравнивается
+задержка predict_yield без кэша и с кэшем, доля попаданий и сброс кэша при
+смене версии модели культуры.
+
+Пример:
+    python benchmarks/bench_yield_cache.py --requests 5000 --decimals 1
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.yield_prediction import YIELD_CROPS, AdvancedYieldModel, YieldPredictionService
+
+def slider_requests(count: int, seed: int = 0) -> list:
+    """Запросы вокруг типичных значений формы с мелкими отклонениями слайдеров"""
+    rng = random.Random(seed)
+    bases = [
+        (rng.choice(YIELD_CROPS), rng.uniform(4, 9), rng.uniform(40, 200), rng.uniform(12, 28), rng.uniform(1, 50))
+        for _ in range(50)
+    ]
+    requests = []
+    for _ in range(count):
+        crop, soil, rain, temp, area = rng.choice(bases)
+        requests.append({
+            'crop_type': crop,
+            'soil_quality': round(soil + rng.uniform(-0.05, 0.05), 2),
+            'rainfall': round(rain + rng.uniform(-0.05, 0.05), 2),
+            'temperature': round(temp + rng.uniform(-0.05, 0.05), 2),
+            'area': round(area + rng.uniform(-0.05, 0.05), 2),
+            'fertilizer_used': rng.random() < 0.5
+        })
+    return requests
+
+def timings_ms(service: YieldPredictionService, requests: list) -> list:
+    timings = []
+    for request in requests:
+        start = time.perf_counter()
+        service.predict_yield(**request)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--decimals", type=int, default=1)
+    parser.add_argument("--cache-size", type=int, default=4096)
+    args = parser.parse_args()
+    
+    requests = slider_requests(args.requests)
+    
+    uncached = YieldPredictionService(cache_size=0, cache_decimals=args.decimals)
+    cached = YieldPredictionService(cache_size=args.cache_size, cache_decimals=args.decimals)
+    cached.model = uncached.model
+    
+    base = timings_ms(uncached, requests[:500])
+    print(f"🐢 Без кэша: p50 {statistics.median(base):.2f} мс на прогноз")
+    
+    timings = timings_ms(cached, requests)
+    stats = cached.cache.stats()
+    print(f"⚡ С кэшем ({args.decimals} знак.): p50 {statistics.median(timings) * 1000:.1f} мкс, "
+          f"попаданий {stats['hit_rate']:.1%}, записей {stats['size']}")
+    
+    # Прогноз по округленным входам не зависит от того, какой запрос заполнил кэш
+    same = all(cached.predict_yield(**request) == uncached.predict_yield(**request) for request in requests[:200])
+    print(f"🎯 Совпадение с расчетом без кэша: {'да' if same else 'НЕТ'}")
+    
+    crop = requests[0]['crop_type']
+    cached.model.set_crop_model(crop, AdvancedYieldModel.build_synthetic_model(crop), 'bench-retrained')
+    size_before = cached.cache.stats()['size']
+    cached.predict_yield(**requests[0])
+    stats = cached.cache.stats()
+    print(f"🔄 Новая версия модели '{crop}': записей {size_before} → {stats['size']}, сбросов {stats['invalidations']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк интервалов прогноза: проход по деревьям леса (среднее, std, квантили)
+против одного вызова RandomForestRegressor.predict.
+
+Пример:
+    python benchmarks/bench_yield_intervals.py --batch 1000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.yield_prediction import AdvancedYieldModel
+
+def median_ms(func, repeats: int) -> float:
+    """Медиана времени вызова в миллисекундах"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--crop", default="пшеница")
+    args = parser.parse_args()
+    
+    print("🛠️  Обучение моделей урожайности...")
+    model = AdvancedYieldModel()
+    forest = model.crop_models[args.crop]
+    
+    rng = np.random.default_rng(0)
+    low = np.array([3, 30, 10, 0.5, 0])
+    high = np.array([10, 200, 30, 5, 1])
+    
+    print(f"📊 {args.crop}, {len(forest.estimators_)} деревьев, медиана из {args.repeats} повторов:")
+    for size in (1, args.batch):
+        features = rng.uniform(low, high, size=(size, 5))
+        features[:, 4] = np.round(features[:, 4])
+        
+        forest_ms = median_ms(lambda: forest.predict(features), args.repeats)
+        trees_ms = median_ms(lambda: model.predict_distribution(args.crop, features), args.repeats)
+        
+        distribution = model.predict_distribution(args.crop, features)
+        max_diff = float(np.max(np.abs(distribution['mean'] - forest.predict(features))))
+        
+        print(f"   batch={size:<6} forest.predict={forest_ms:7.2f} мс   "
+              f"деревья+квантили={trees_ms:7.2f} мс   "
+              f"(×{trees_ms / forest_ms:.2f}, расхождение среднего {max_diff:.1e})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк анализа сценариев урожайности: векторизованная сетка против
+последовательных вызовов прогноза на каждый сценарий.
+
+Пример:
+    python benchmarks/bench_yield_scenarios.py --steps 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.yield_prediction import YieldPredictionService
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=15, help="Шагов по каждой из трех осей")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--sequential-sample", type=int, default=200,
+                        help="Сколько сценариев прогнать по одному для сравнения")
+    args = parser.parse_args()
+    
+    print("🛠️  Обучение моделей урожайности...")
+    service = YieldPredictionService()
+    
+    base = dict(crop_type='пшеница', soil_quality=7, rainfall=100, temperature=20, area=2, fertilizer_used=True)
+    ranges = {
+        'soil_quality': (3, 10, args.steps),
+        'rainfall': (40, 200, args.steps),
+        'temperature': (10, 30, args.steps),
+    }
+    
+    timings = []
+    for _ in range(args.repeats):
+        start = time.perf_counter()
+        result = service.predict_scenarios(**base, ranges=ranges, fertilizer_options=[False, True])
+        timings.append((time.perf_counter() - start) * 1000)
+    
+    count = result['scenario_count']
+    vectorized_ms = statistics.median(timings)
+    print(f"📊 Векторизованно: {count:,} сценариев за {vectorized_ms:.1f} мс "
+          f"({count / vectorized_ms * 1000:,.0f} сценариев/с)")
+    
+    sample = args.sequential_sample
+    start = time.perf_counter()
+    for i in range(sample):
+        service.model.predict('пшеница', [7, 40 + i % 160, 20, 2, 1])
+    sequential_ms = (time.perf_counter() - start) * 1000
+    per_scenario = sequential_ms / sample
+    print(f"🐢 По одному: {per_scenario:.2f} мс на сценарий, "
+          f"оценка для {count:,} сценариев: {per_scenario * count / 1000:.1f} с")
+    print(f"🚀 Ускорение: ~{per_scenario * count / vectorized_ms:,.0f}×")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Построение таблиц суррогата урожайности: лес каждой культуры табулируется
+на плотной сетке (почва × осадки × температура × площадь × удобрения), таблица
+сохраняется в .npy для отображения в память, а ее ошибка относительно леса
+записывается в манифест. Таблица привязана к версии модели культуры и
+перестраивается после переобучения.
+
+Примеры:
+    python build_yield_surrogate.py
+    python build_yield_surrogate.py --crops пшеница рис --steps 37 69 41 19
+"""
+import argparse
+import logging
+import os
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.services.yield_prediction import YIELD_CROPS, YIELD_MODELS_DIR, AdvancedYieldModel
+from app.services.yield_surrogate import (
+    SURROGATE_GRID_STEPS, SURROGATE_VALIDATION_SAMPLES, YIELD_SURROGATE_DIR, SurrogateTable, save_surrogate_table
+)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--crops", nargs="*", default=YIELD_CROPS, help="Культуры (по умолчанию все)")
+    parser.add_argument("--models-dir", default=YIELD_MODELS_DIR, help="Каталог артефактов моделей")
+    parser.add_argument("--output", default=YIELD_SURROGATE_DIR, help="Каталог таблиц суррогата")
+    parser.add_argument("--steps", type=int, nargs=4, default=list(SURROGATE_GRID_STEPS),
+                        metavar=("SOIL", "RAIN", "TEMP", "AREA"), help="Узлов сетки по признакам")
+    parser.add_argument("--samples", type=int, default=SURROGATE_VALIDATION_SAMPLES,
+                        help="Случайных точек для оценки ошибки")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    if min(args.steps) < 2:
+        parser.error("по каждому признаку нужно не меньше 2 узлов")
+    
+    model = AdvancedYieldModel(args.models_dir)
+    
+    print(f"\n{'Культура':<12}{'Сборка, с':>10}{'МБ':>7}{'Макс. ошибка':>14}{'p99':>8}{'Средняя':>9}"
+          f"{'Лес, мкс':>10}{'Табл., мкс':>12}  Версия")
+    for crop in args.crops:
+        if crop not in model.crop_models:
+            print(f"⚠️  Нет модели для культуры {crop}")
+            continue
+        
+        start = time.perf_counter()
+        table = SurrogateTable.build(model, crop, args.steps)
+        build_seconds = time.perf_counter() - start
+        
+        table.report = {'build_seconds': round(build_seconds, 2), **table.evaluate(model, crop, args.samples)}
+        entry = save_surrogate_table(args.output, crop, table)
+        print(f"{crop:<12}{build_seconds:>10.1f}{entry['size_bytes'] / 1024 / 1024:>7.1f}"
+              f"{entry['max_abs_error']:>14.3f}{entry['p99_abs_error']:>8.3f}{entry['mean_abs_error']:>9.4f}"
+              f"{entry['forest_us_per_row']:>10.2f}{entry['table_us_per_row']:>12.2f}  {entry['version']}")
+    
+    print(f"\n✅ Таблицы суррогата: {os.path.abspath(args.output)} (ошибка в т/га относительно леса)")
+
+if __name__ == "__main__":
+    main()
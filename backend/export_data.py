@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Выгрузка журнала чата (messages) или журнала прогнозов урожайности
+(predictions) в Parquet для офлайн-аналитики и дообучения. Строки читаются
+кусками по message_id / prediction_id и пишутся группами строк, поэтому
+память не растет с объемом журнала.
+
+Примеры:
+    python export_data.py messages --db agro_gpt.db --since 2026-01-01 --until 2026-07-01
+    python export_data.py predictions --output exports/predictions.parquet
+"""
+import argparse
+import logging
+import os
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.services.agro_gpt import AgroDatabase
+from app.utils.parquet_export import (
+    EXPORT_CHUNK_SIZE, EXPORT_COMPRESSION, MESSAGES_SCHEMA, PREDICTIONS_SCHEMA, export_filename, export_parquet
+)
+
+def parse_date(value: str) -> str:
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"ожидается дата YYYY-MM-DD: {value}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dataset", choices=["messages", "predictions"])
+    parser.add_argument("--db", default="agro_gpt.db", help="База чата")
+    parser.add_argument("--output", default=None, help="Файл Parquet (по умолчанию <dataset>_<since>_<until>.parquet)")
+    parser.add_argument("--since", type=parse_date, default=None, help="Начало периода, включительно")
+    parser.add_argument("--until", type=parse_date, default=None, help="Конец периода, не включая")
+    parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE, help="Строк в группе строк")
+    parser.add_argument("--compression", default=EXPORT_COMPRESSION)
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    output = args.output or export_filename(args.dataset, args.since, args.until)
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    
+    database = AgroDatabase(args.db)
+    if args.dataset == "messages":
+        schema, chunks = MESSAGES_SCHEMA, database.iter_messages(args.chunk_size, args.since, args.until)
+    else:
+        schema, chunks = PREDICTIONS_SCHEMA, database.iter_predictions(args.chunk_size, args.since, args.until)
+    
+    report = export_parquet(chunks, schema, output, args.compression)
+    print(f"✅ {report['rows']:,} строк в {report['row_groups']} группах за {report['seconds']} с "
+          f"({report['rows_per_second'] or 0:,} строк/с): {os.path.abspath(output)}")
+    print(f"📦 Размер файла: {report['file_bytes'] / 1024 / 1024:.1f} MB, пик памяти процесса: {report['peak_rss_mb']} MB")
+
+if __name__ == "__main__":
+    main()
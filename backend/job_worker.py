@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Воркеры очереди фоновых задач (анализ изображений, сценарии и пакетный
+прогноз урожайности, выгрузка в Parquet). Несколько процессов на узле и
+несколько узлов работают с одним файлом очереди JOB_QUEUE_DB, в том числе
+на сетевой ФС с поддержкой POSIX-блокировок; задачи упавшего узла
+возвращаются в очередь по истечении аренды.
+
+Выгрузка (export) читает базу чата узла API по абсолютному пути из задачи:
+воркеры выгрузки запускаются на узле API (--kinds export) или видят базу
+и ее партиции по тем же путям; иначе задача завершается ошибкой.
+
+Примеры:
+    python job_worker.py
+    python job_worker.py --processes 4 --kinds plant_analysis
+    python job_worker.py --processes 1 --kinds export
+    python job_worker.py --db /mnt/shared/jobs.db --lease 120
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.services.job_queue import JOB_FILES_DIR, JOB_LEASE_SECONDS, JOB_QUEUE_DB, JobQueue
+from app.services.job_worker import JOB_HANDLERS, JobWorker
+from app.utils.prefork import available_cpus
+
+def run_worker(db_path: str, files_dir: str, kinds, lease_seconds: int, stop_event):
+    # Остановкой управляет родитель через stop_event: текущая задача дорабатывает
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    logging.basicConfig(level=logging.INFO)
+    JobWorker(JobQueue(db_path, files_dir), kinds, lease_seconds).run(stop_event)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=int(os.getenv("JOB_WORKERS", "0")),
+                        help="Число процессов (0 - по доступным ядрам)")
+    parser.add_argument("--kinds", nargs="+", choices=sorted(JOB_HANDLERS), default=None,
+                        help="Типы задач этих воркеров (по умолчанию все)")
+    parser.add_argument("--db", default=JOB_QUEUE_DB, help="Файл очереди задач")
+    parser.add_argument("--files-dir", default=JOB_FILES_DIR, help="Каталог файлов задач")
+    parser.add_argument("--lease", type=int, default=JOB_LEASE_SECONDS, help="Аренда задачи, с")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    
+    # Схема создается один раз до запуска процессов
+    queue = JobQueue(args.db, args.files_dir)
+    processes = args.processes or available_cpus()
+    print(f"🚀 Очередь: {os.path.abspath(args.db)}, процессов: {processes}, "
+          f"задачи: {', '.join(args.kinds or JOB_HANDLERS)}")
+    print(f"📊 Задачи по статусам: {queue.counts()}")
+    
+    # spawn: в каждом процессе свои соединения SQLite и модели, без унаследованных потоков
+    context = multiprocessing.get_context('spawn')
+    stop_event = context.Event()
+    stop_requested = []
+    
+    # Событие выставляет основной цикл: set() внутри обработчика сигнала может
+    # прервать stop_event.wait() и заблокироваться на его внутренней блокировке
+    def handle_stop(signum, frame):
+        if not stop_requested:
+            print(f"\n🛑 Получен сигнал {signal.Signals(signum).name}, воркеры завершают текущие задачи")
+            stop_requested.append(signum)
+    
+    signal.signal(signal.SIGTERM, handle_stop)
+    signal.signal(signal.SIGINT, handle_stop)
+    
+    def spawn():
+        process = context.Process(target=run_worker, daemon=False,
+                                  args=(args.db, queue.files_dir, args.kinds, args.lease, stop_event))
+        process.start()
+        return process
+    
+    workers = [spawn() for _ in range(processes)]
+    while not stop_requested:
+        time.sleep(1.0)
+        for index, process in enumerate(workers):
+            if not process.is_alive() and not stop_requested:
+                print(f"⚠️ Воркер {process.pid} завершился (код {process.exitcode}), перезапуск")
+                workers[index] = spawn()
+    
+    stop_event.set()
+    for process in workers:
+        process.join()
+    print("✅ Воркеры остановлены")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Продакшн-запуск API: модели загружаются один раз в мастере, после
+gc.freeze() воркеры форкаются и делят страницы моделей copy-on-write.
+Число воркеров по умолчанию - по ядру на воркер в пределах доступной памяти
+(WORKER_MEMORY_MB на воркер). Для разработки с автоперезагрузкой - run.py.
+
+Примеры:
+    python serve.py
+    python serve.py --workers 4 --port 8000
+"""
+import argparse
+import logging
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.utils.prefork import (
+    WORKER_MEMORY_MB, WORKER_REPORT_INTERVAL, PreforkLauncher, available_cpus, available_memory_bytes, size_workers
+)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WORKERS", "0")),
+                        help="Число воркеров (0 - по ядрам и памяти)")
+    parser.add_argument("--worker-memory-mb", type=int, default=WORKER_MEMORY_MB,
+                        help="Оценка собственной памяти воркера для расчета их числа")
+    parser.add_argument("--report-interval", type=int, default=WORKER_REPORT_INTERVAL,
+                        help="Период отчета о памяти воркеров, с (0 - только после старта)")
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "info").lower())
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    
+    cpus, memory = available_cpus(), available_memory_bytes()
+    workers = args.workers or size_workers(cpus, memory, args.worker_memory_mb)
+    print(f"🚀 Ядер: {cpus}, доступно памяти: {memory / 1024 ** 3:.1f} ГБ, воркеров: {workers}")
+    
+    PreforkLauncher("app.main:app", args.host, args.port, workers, args.log_level, args.report_interval).run()
+
+if __name__ == "__main__":
+    main()
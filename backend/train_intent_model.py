@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Обучение классификатора интентов чата на размеченных вручную примерах (JSONL).
+
+Интент в журнале сообщений (таблица messages) - это собственный ответ сервиса:
+срабатывания правил (включая ошибки) и предсказания самой модели. Обучение на
+нем закрепляет эти ошибки, поэтому по умолчанию журнал не используется.
+С --log-labels model добавляются только сообщения, где интент выбрала модель
+с уверенностью не ниже --min-confidence (псевдометки с весом 1); метки правил
+и записи без источника (до его журналирования) не берутся никогда. Как
+неразмеченный текст журнал бесполезен: словаря нет, признаки хешируются.
+Размеченные примеры имеют больший вес и заменяют псевдометки тех же текстов.
+
+Примеры:
+    python train_intent_model.py --labeled benchmarks/data/intent_labels.jsonl
+    python train_intent_model.py --labeled benchmarks/data/intent_labels.jsonl --db agro_gpt.db --log-labels model
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from collections import Counter
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.services.agro_gpt import INTENT_MODEL_PATH, AgroDatabase, Intent, agro_gpt_service
+from app.utils.intent_classifier import out_of_fold_predictions, train_intent_classifier
+
+def load_labeled(paths: list) -> dict:
+    labeled = {}
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    sample = json.loads(line)
+                    labeled[sample['text']] = sample['intent']
+    return labeled
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="agro_gpt.db", help="База чата с журналом сообщений (для --log-labels model)")
+    parser.add_argument("--labeled", nargs="*", default=[], help="JSONL файлы {\"text\", \"intent\"}")
+    parser.add_argument("--labeled-weight", type=float, default=3.0, help="Вес размеченного примера")
+    parser.add_argument("--log-labels", choices=["none", "model"], default="none",
+                        help="Метки из журнала: none - не брать; model - только уверенные предсказания модели")
+    parser.add_argument("--min-confidence", type=float, default=0.9,
+                        help="Минимальная уверенность модели для псевдометки из журнала")
+    parser.add_argument("--limit", type=int, default=None, help="Не больше N последних псевдометок журнала")
+    parser.add_argument("--folds", type=int, default=5, help="Фолды кросс-валидации (0 - без оценки)")
+    parser.add_argument("--output", default=INTENT_MODEL_PATH)
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    known = {intent.value for intent in Intent}
+    
+    labeled = load_labeled(args.labeled)
+    samples = {}
+    if args.log_labels == "model":
+        samples = {
+            message: (intent, 1.0)
+            for message, intent in AgroDatabase(args.db).get_labeled_messages(args.min_confidence, args.limit)
+            if intent in known and message.strip()
+        }
+    pseudo = len(samples)
+    samples.update({text: (intent, args.labeled_weight) for text, intent in labeled.items() if intent in known})
+    if not samples:
+        parser.error("нет примеров для обучения: задайте --labeled (и при необходимости --log-labels model)")
+    
+    # Модель видит тот же текст, что и при обслуживании: с каноническими формами сущностей
+    texts = [agro_gpt_service.normalizer.canonical_text(message) for message in samples]
+    labels = [intent for intent, _ in samples.values()]
+    weights = [weight for _, weight in samples.values()]
+    counts = Counter(labels)
+    print(f"📚 Примеров: {len(texts)} (размечено {len(labeled)}, псевдометок журнала {pseudo}), интентов: {len(counts)}")
+    
+    if args.folds and min(counts.values()) >= args.folds:
+        predictions = out_of_fold_predictions(texts, labels, args.folds, sample_weight=weights)
+        accuracy = sum(label == predicted for label, (predicted, _) in zip(labels, predictions)) / len(labels)
+        print(f"🎯 Точность на кросс-валидации ({args.folds} фолдов): {accuracy:.1%}")
+    elif args.folds:
+        print(f"⚠️  Кросс-валидация пропущена: у редких интентов меньше {args.folds} примеров")
+    
+    start = time.perf_counter()
+    classifier = train_intent_classifier(texts, labels, weights)
+    classifier.save(args.output)
+    print(f"✅ Модель обучена за {time.perf_counter() - start:.1f} с: {os.path.abspath(args.output)}")
+
+if __name__ == "__main__":
+    main()
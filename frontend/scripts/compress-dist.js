@@ -0,0 +1,41 @@
+// Предсжатие сборки: рядом с каждым текстовым файлом dist/ кладутся .br и .gz,
+// которые бэкенд отдает по Accept-Encoding без сжатия на каждый запрос
+import { readdirSync, readFileSync, statSync, writeFileSync } from 'node:fs'
+import { extname, join } from 'node:path'
+import { brotliCompressSync, constants, gzipSync } from 'node:zlib'
+
+const DIST_DIR = new URL('../dist/', import.meta.url).pathname
+const COMPRESSIBLE = new Set(['.html', '.js', '.mjs', '.css', '.json', '.svg', '.txt', '.map', '.webmanifest'])
+const MIN_SIZE = 1024
+
+let total = 0
+let brotliTotal = 0
+
+function walk(dir) {
+  for (const name of readdirSync(dir)) {
+    const path = join(dir, name)
+    if (statSync(path).isDirectory()) {
+      walk(path)
+      continue
+    }
+    if (!COMPRESSIBLE.has(extname(name))) continue
+
+    const source = readFileSync(path)
+    if (source.length < MIN_SIZE) continue
+
+    const brotli = brotliCompressSync(source, {
+      params: {
+        [constants.BROTLI_PARAM_QUALITY]: constants.BROTLI_MAX_QUALITY,
+        [constants.BROTLI_PARAM_SIZE_HINT]: source.length,
+      },
+    })
+    writeFileSync(`${path}.br`, brotli)
+    writeFileSync(`${path}.gz`, gzipSync(source, { level: 9 }))
+
+    total += source.length
+    brotliTotal += brotli.length
+  }
+}
+
+walk(DIST_DIR)
+console.log(`compressed dist: ${(total / 1024).toFixed(1)} KB -> ${(brotliTotal / 1024).toFixed(1)} KB brotli`)
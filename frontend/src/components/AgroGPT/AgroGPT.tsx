@@ -37,7 +37,7 @@ const AgroGPT: React.FC = () => {
     setLoading(true);
 
     try {
-      const response = await chatWithAgroGPT(inputMessage, messages);
+      const response = await chatWithAgroGPT(inputMessage);
       
       const assistantResponse = response?.response || "Извините, не удалось получить ответ. Попробуйте еще раз.";
       
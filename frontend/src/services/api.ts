@@ -1,7 +1,8 @@
 import axios from 'axios';
 import type { PlantAnalysisResponse, YieldPredictionRequest, YieldPredictionResponse } from '../types';
 
-const API_BASE_URL = 'http://localhost:8000';
+// В продакшне фронтенд раздается самим API (тот же origin), в разработке - отдельный бэкенд
+const API_BASE_URL = import.meta.env.VITE_API_BASE_URL ?? (import.meta.env.DEV ? 'http://localhost:8000' : '');
 
 const api = axios.create({
   baseURL: API_BASE_URL,
@@ -61,10 +62,20 @@ export const predictYield = async (data: YieldPredictionRequest): Promise<YieldP
   };
 };
 
-export const chatWithAgroGPT = async (message: string, conversationHistory: any[] = []) => {
+// Идентификатор сессии чата: история разговора хранится на сервере
+const getChatSessionId = (): string => {
+  let sessionId = sessionStorage.getItem('agro_chat_session');
+  if (!sessionId) {
+    sessionId = `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+    sessionStorage.setItem('agro_chat_session', sessionId);
+  }
+  return sessionId;
+};
+
+export const chatWithAgroGPT = async (message: string) => {
   const response = await api.post('/api/chat', {
     message,
-    conversation_history: conversationHistory,
+    session_id: getChatSessionId(),
   });
   
   // ФИКС: проверяем структуру ответа